@@ -0,0 +1,50 @@
+import argparse
+import logging
+import time
+from datetime import datetime, timezone
+from utils.backtest import DEFAULT_FEE_RATE, backtest_sma_crossover
+from utils.candles import read_candles_csv
+from utils.kline_store import KlineStore, DEFAULT_STORE_DIRECTORY
+
+
+def parse_date(value: str) -> datetime:
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Backtests a moving average crossover over stored candle history (see download_history.py).")
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument("--symbol", help="Trading pair symbol of the kline store (e.g., BTC-USDT)")
+    source_group.add_argument("--csv", help="CSV file of raw kline rows (e.g., BTC-USDT.csv)")
+    parser.add_argument("--interval", default="1hour", help="Kline interval of the kline store")
+    parser.add_argument("--store-dir", default=DEFAULT_STORE_DIRECTORY, help="Directory of the kline store")
+    parser.add_argument("--start", type=parse_date, default=None, help="Start date (YYYY-MM-DD), the first candle by default")
+    parser.add_argument("--end", type=parse_date, default=None, help="End date (YYYY-MM-DD, excluded), the last candle by default")
+    parser.add_argument("--fast", type=int, default=50, help="Window of the fast moving average, in candles")
+    parser.add_argument("--slow", type=int, default=200, help="Window of the slow moving average, in candles")
+    parser.add_argument("--fee", type=float, default=DEFAULT_FEE_RATE, help="Fee rate of an order")
+    parser.add_argument("--short", action="store_true", help="Go short below the slow average instead of flat")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    try:
+        arguments = parse_arguments()
+
+        load_start = time.perf_counter()
+        if arguments.csv:
+            candles = read_candles_csv(arguments.csv)
+        else:
+            candles = KlineStore(arguments.store_dir).load(arguments.symbol, arguments.interval)
+        candles = candles.slice(arguments.start, arguments.end)
+        logging.info(f"Loaded {len(candles)} candles in {time.perf_counter() - load_start:.2f}s")
+
+        backtest_start = time.perf_counter()
+        result = backtest_sma_crossover(candles, arguments.fast, arguments.slow, arguments.fee, arguments.short)
+        logging.info(f"Backtested in {time.perf_counter() - backtest_start:.2f}s\n{result.summary()}")
+
+    except KeyboardInterrupt:
+        logging.info("Interrupted by user.")
+    except Exception as e:
+        logging.error(f"Error: {e}")
@@ -0,0 +1,77 @@
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules imported by the entry points and the worker processes
+DEFAULT_MODULES = [
+    "services.config",
+    "services.websocket_management",
+    "services.kucoin_services",
+    "services.order_book",
+    "services.candle_builder",
+    "services.execution",
+    "strategies.triangle_scanner",
+    "strategies.sharded_scanner",
+    "strategies.basis_scanner",
+    "strategies.monitor",
+    "utils.backtest",
+    "utils.sweep",
+]
+# Modules that take hundreds of milliseconds to import, and must only be imported on first use
+HEAVY_MODULES = ("kucoin_universal_sdk", "pandas", "dotenv", "http.server")
+
+# Run in a fresh interpreter, so nothing is imported yet
+MEASURE_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+if {module!r}:
+    __import__({module!r})
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def measure_import(module: str, repeat: int) -> tuple:
+    """
+    Imports a module in `repeat` fresh interpreters.
+
+    Returns:
+        tuple: (median import time in seconds, heavy modules it imported).
+    """
+    import_times = []
+    heavy = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", MEASURE_SCRIPT.format(module=module, heavy=HEAVY_MODULES)],
+                                capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        measure = json.loads(result.stdout.strip().splitlines()[-1])
+        import_times.append(measure["seconds"])
+        heavy = measure["heavy"]
+    return statistics.median(import_times), heavy
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Measures the import time of the bot's modules, each in a fresh interpreter, "
+                                                 "and checks that none imports the SDK or pandas before using them.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="Modules to import")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module, the median is reported")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    try:
+        arguments = parse_arguments()
+        lines = [f"{'module':<34} {'import':>9}  heavy imports"]
+        for module in arguments.modules:
+            import_time, heavy = measure_import(module, arguments.repeat)
+            lines.append(f"{module:<34} {import_time * 1000:>7.1f}ms  {', '.join(heavy) or '-'}")
+        logging.info("Import times (median of %d runs):\n%s", arguments.repeat, "\n".join(lines))
+
+    except KeyboardInterrupt:
+        logging.info("Interrupted by user.")
+    except Exception as e:
+        logging.error(f"Error: {e}")
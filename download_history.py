@@ -0,0 +1,122 @@
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from services.config import configure_logging, get_kucoin_client, get_market_api
+from services.kucoin_services import KLINE_INTERVALS, PUBLIC_RATE_LIMIT_WEIGHT, PUBLIC_RATE_LIMIT_WINDOW, create_klines_rate_limiter, fetch_trading_symbols, sync_klines
+from utils.kline_store import KlineStore, DEFAULT_STORE_DIRECTORY
+
+PROGRESS_LOG_INTERVAL = 10
+
+
+class DownloadProgress:
+    """
+    Keeps track of the jobs, windows and candles downloaded, to report progress and throughput.
+    """
+    def __init__(self, total_jobs: int):
+        self.total_jobs = total_jobs
+        self.finished_jobs = 0
+        self.failed_jobs = 0
+        self.windows = 0
+        self.candles = 0
+        self.start_time = time.monotonic()
+
+    def on_window(self, candles: int):
+        self.windows += 1
+        self.candles += candles
+
+    def log(self):
+        elapsed = time.monotonic() - self.start_time
+        logging.info(f"[PROGRESS] {self.finished_jobs}/{self.total_jobs} jobs ({self.failed_jobs} failed), "
+                     f"{self.windows} requests ({self.windows / elapsed:.1f}/s), {self.candles} candles ({self.candles / elapsed:.0f}/s)")
+
+
+def parse_date(value: str) -> datetime:
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Downloads candle history for many symbols and intervals into the local kline store. "
+                                                 "Interrupted downloads resume where they stopped.")
+    symbols_group = parser.add_mutually_exclusive_group(required=True)
+    symbols_group.add_argument("--symbols", nargs="+", help="Trading pair symbols (e.g., BTC-USDT ETH-USDT)")
+    symbols_group.add_argument("--all-usdt", action="store_true", help="Every symbol currently trading against USDT")
+    parser.add_argument("--intervals", nargs="+", default=["1hour"], choices=list(KLINE_INTERVALS), help="Kline intervals")
+    parser.add_argument("--start", type=parse_date, default=datetime(2018, 1, 1, tzinfo=timezone.utc), help="Start date (YYYY-MM-DD)")
+    parser.add_argument("--end", type=parse_date, default=None, help="End date (YYYY-MM-DD), now by default")
+    parser.add_argument("--store-dir", default=DEFAULT_STORE_DIRECTORY, help="Directory of the kline store")
+    parser.add_argument("--jobs", type=int, default=4, help="Number of (symbol, interval) jobs running at the same time")
+    parser.add_argument("--workers", type=int, default=4, help="Requests in flight per job")
+    parser.add_argument("--rate-limit", type=float, default=PUBLIC_RATE_LIMIT_WEIGHT,
+                        help=f"Request weight allowed per {PUBLIC_RATE_LIMIT_WINDOW}s, shared by every job")
+    return parser.parse_args()
+
+
+async def download_history(market_api, store: KlineStore, symbols: list, intervals: list, start_time: datetime, end_time: datetime,
+                           max_jobs: int, max_workers: int, rate_limit: float):
+    """
+    Brings the store up to date for every (symbol, interval) pair.
+    All jobs share the same client and the same rate limiter, so the global request budget is respected.
+
+    Args:
+        market_api (MarketAPI): The market API client instance.
+        store (KlineStore): The local candle store.
+        symbols (list): Trading pair symbols.
+        intervals (list): Kline intervals.
+        start_time (datetime): Start time of the candles to hold.
+        end_time (datetime): End time of the candles to hold.
+        max_jobs (int): Number of jobs running at the same time.
+        max_workers (int): Requests in flight per job.
+        rate_limit (float): Request weight allowed per rate limit window.
+    """
+    rate_limiter = create_klines_rate_limiter(max_weight=rate_limit)
+    jobs_semaphore = asyncio.Semaphore(max_jobs)
+    jobs = [(symbol, interval) for symbol in symbols for interval in intervals]
+    progress = DownloadProgress(len(jobs))
+
+    async def run_job(symbol, interval):
+        async with jobs_semaphore:
+            try:
+                await sync_klines(market_api, store, symbol, interval, start_time, end_time,
+                                  max_workers=max_workers, rate_limiter=rate_limiter, on_window=progress.on_window)
+                # Merge the downloaded segments into the columns right away, on a thread as the REST calls
+                await asyncio.to_thread(store.load, symbol, interval)
+            except Exception as e:
+                progress.failed_jobs += 1
+                logging.error(f"Error downloading {symbol} {interval}: {e}")
+            finally:
+                progress.finished_jobs += 1
+
+    async def report_progress():
+        while True:
+            await asyncio.sleep(PROGRESS_LOG_INTERVAL)
+            progress.log()
+
+    logging.info(f"Downloading {len(jobs)} jobs ({len(symbols)} symbols x {len(intervals)} intervals) into {store.root_dir}")
+    reporter = asyncio.create_task(report_progress())
+    try:
+        await asyncio.gather(*(run_job(symbol, interval) for symbol, interval in jobs))
+    finally:
+        reporter.cancel()
+        progress.log()
+
+
+if __name__ == "__main__":
+    configure_logging()
+    try:
+        arguments = parse_arguments()
+
+        client = get_kucoin_client()
+        market_api = get_market_api(client)
+
+        symbols = fetch_trading_symbols(market_api, "USDT") if arguments.all_usdt else arguments.symbols
+        end_time = arguments.end or datetime.now(timezone.utc)
+
+        asyncio.run(download_history(market_api, KlineStore(arguments.store_dir), symbols, arguments.intervals, arguments.start, end_time,
+                                     arguments.jobs, arguments.workers, arguments.rate_limit))
+
+    except KeyboardInterrupt:
+        logging.info("Download interrupted by user. Run the same command again to resume.")
+    except Exception as e:
+        logging.error(f"Error: {e}")
@@ -1,8 +1,9 @@
 import logging
-from services.config import initialize_kucoin_client, get_market_api
-from services.kucoin_services import fetch_all_klines, fetch_klines
+from services.config import configure_logging, get_kucoin_client, get_market_api
+from services.kucoin_services import fetch_all_klines, fetch_all_klines_concurrent, fetch_klines, stream_klines, sync_klines
 from datetime import datetime, timezone
-from utils.statistics import save_data_to_csv
+from utils.kline_store import KlineStore
+from utils.candles import append_candles
 import asyncio
 
 # Configure logging
@@ -13,15 +14,26 @@ import asyncio
 # )
 
 if __name__ == "__main__":
+    configure_logging()
     try:
         # Initialize the Kucoin client
-        client = initialize_kucoin_client()
+        client = get_kucoin_client()
         market_api = get_market_api(client)
 
         # data = fetch_klines(market_api, "BTC-USDT", "1hour", datetime(2025, 2, 10, 15, 0, 0, tzinfo=timezone.utc), datetime(2025, 2, 22, 18, 0, 0, tzinfo=timezone.utc))
-        data = asyncio.run(fetch_all_klines(market_api, "BTC-USDT", "1hour", datetime(2018, 1, 1, 0, 0, 0, tzinfo=timezone.utc), datetime(2025, 2, 22, 18, 0, 0, tzinfo=timezone.utc)))
+        # data = asyncio.run(fetch_all_klines_concurrent(market_api, "BTC-USDT", "1hour", datetime(2018, 1, 1, 0, 0, 0, tzinfo=timezone.utc), datetime(2025, 2, 22, 18, 0, 0, tzinfo=timezone.utc)))
 
-        save_data_to_csv(data, "BTC-USDT.csv")
+        # Streaming variant, written batch by batch with bounded memory :
+        # async def download():
+        #     async for batch in stream_klines(market_api, "BTC-USDT", "1min", datetime(2018, 1, 1, 0, 0, 0, tzinfo=timezone.utc), datetime(2025, 2, 22, 18, 0, 0, tzinfo=timezone.utc)):
+        #         append_candles(batch, "data/BTC-USDT_1min")
+        # asyncio.run(download())
+
+        # Only the candles missing from the local store are requested
+        store = KlineStore()
+        asyncio.run(sync_klines(market_api, store, "BTC-USDT", "1hour", datetime(2018, 1, 1, 0, 0, 0, tzinfo=timezone.utc), datetime(2025, 2, 22, 18, 0, 0, tzinfo=timezone.utc)))
+        candles = store.load("BTC-USDT", "1hour")
+        logging.info(f"{len(candles)} candles available in {store.series_directory('BTC-USDT', '1hour')}")
 
     except KeyboardInterrupt:
         logging.info("Program interrupted by user.")
@@ -0,0 +1,50 @@
+import argparse
+import logging
+import threading
+import time
+from services.mock_kucoin import DEFAULT_MOCK_PORT, DEFAULT_MOCK_SYMBOLS, MockKucoinServer, MockMarket, generate_symbols
+
+STATS_LOG_INTERVAL = 10
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Runs a local stand-in for the KuCoin public REST and WebSocket APIs, for load and latency tests.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_MOCK_PORT, help="Port to listen on")
+    parser.add_argument("--rate", type=float, default=1000, help="WebSocket messages per second per connection")
+    parser.add_argument("--rest-latency", type=float, default=0.0, help="Seconds added before every REST response")
+    parser.add_argument("--ws-latency", type=float, default=0.0, help="Seconds between the timestamp of a WebSocket message and its sending")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of a REST request or a subscription failing")
+    parser.add_argument("--partial-fill-rate", type=float, default=0.0, help="Probability of an order being only partially filled")
+    parser.add_argument("--disconnect-interval", type=float, default=None, help="Drop a random WebSocket connection every N seconds")
+    parser.add_argument("--synthetic-currencies", type=int, default=0, help="Add N synthetic currencies traded against USDT, BTC and ETH")
+    parser.add_argument("--list", dest="new_listing", default=None, help="Symbol to list (with its announcement) after --list-after seconds")
+    parser.add_argument("--list-after", type=float, default=30, help="Seconds before listing --list")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the synthetic market")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    arguments = parse_arguments()
+
+    symbols = DEFAULT_MOCK_SYMBOLS + generate_symbols(arguments.synthetic_currencies)[2:] if arguments.synthetic_currencies else None
+    server = MockKucoinServer(arguments.host, arguments.port, MockMarket(symbols, seed=arguments.seed), arguments.rate,
+                              arguments.rest_latency, arguments.ws_latency, arguments.error_rate, arguments.disconnect_interval,
+                              arguments.partial_fill_rate)
+    server.start()
+    logging.info(f"Point the bot at it with : KUCOINBOT_SPOT_ENDPOINT={server.endpoint} KUCOINBOT_FUTURES_ENDPOINT={server.endpoint}")
+
+    if arguments.new_listing:
+        threading.Timer(arguments.list_after, server.market.list_symbol, (arguments.new_listing,)).start()
+
+    try:
+        previous_messages = 0
+        while True:
+            time.sleep(STATS_LOG_INTERVAL)
+            stats = dict(server.stats)
+            logging.info(f"[MOCK] {len(server.sessions)} connections, {(stats['ws_messages'] - previous_messages) / STATS_LOG_INTERVAL:.0f} messages/s, "
+                         f"{stats['rest_requests']} REST requests ({stats['rest_errors']} errors), {stats['ws_disconnects']} dropped connections")
+            previous_messages = stats["ws_messages"]
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,55 @@
+import argparse
+import asyncio
+import logging
+from services.config import configure_logging, get_kucoin_client, get_market_api, get_futures_market_api
+from services.symbol_metadata import SymbolMetadataCache, fetch_futures_contracts
+from strategies.basis_scanner import BasisScanner, DEFAULT_HOLDING_PERIOD
+from utils.latency import latency_metrics
+
+HOUR_MS = 3600 * 1000
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Streams the futures contracts and their spot pairs, and reports the pairs whose annualized "
+                                                 "carry (basis and funding, net of fees) crosses a threshold.")
+    parser.add_argument("--contracts", nargs="+", default=None, help="Futures contracts to scan (e.g., XBTUSDTM ETHUSDTM), every linear contract by default")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Annualized carry percentage over which a pair is reported")
+    parser.add_argument("--holding-hours", type=float, default=DEFAULT_HOLDING_PERIOD / HOUR_MS,
+                        help="Expected holding period of a perpetual position, over which its entry basis is amortized")
+    parser.add_argument("--no-reverse", action="store_true", help="Only score cash and carry, not the reverse trade which borrows the spot currency")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve the latency metrics on this port")
+    return parser.parse_args()
+
+
+async def scan_basis(contracts: list, threshold: float, holding_period: int, include_reverse: bool, metrics_port: int = None):
+    client = get_kucoin_client()
+    futures_market_api = get_futures_market_api(client)
+    symbol_metadata = SymbolMetadataCache(get_market_api(client))
+    await asyncio.to_thread(symbol_metadata.refresh)
+
+    futures_contracts = await asyncio.to_thread(fetch_futures_contracts, futures_market_api)
+    if contracts:
+        futures_contracts = [contract for contract in futures_contracts if contract.symbol in set(contracts)]
+    scanner = BasisScanner(futures_contracts, list(symbol_metadata.symbols), threshold, holding_period=holding_period,
+                           symbol_metadata=symbol_metadata, futures_market_api=futures_market_api, include_reverse=include_reverse)
+    if not scanner.contracts:
+        logging.error("No futures contract with a spot pair to scan")
+        return
+
+    if metrics_port is not None:
+        latency_metrics.enable()
+        latency_metrics.start_server(metrics_port)
+    await scanner.start()
+
+
+if __name__ == "__main__":
+    configure_logging()
+    try:
+        arguments = parse_arguments()
+        asyncio.run(scan_basis(arguments.contracts, arguments.threshold, int(arguments.holding_hours * HOUR_MS), not arguments.no_reverse,
+                               arguments.metrics_port))
+
+    except KeyboardInterrupt:
+        logging.info("Interrupted by user.")
+    except Exception as e:
+        logging.error(f"Error: {e}")
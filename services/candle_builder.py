@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+import numpy as np
+from services.kucoin_services import KLINE_INTERVALS
+from services.websocket_management import WebSocketSymbol
+from utils.candles import Candles, CANDLE_COLUMNS
+from utils.kline_store import KlineStore
+
+# Monthly candles follow calendar months, which fixed-size buckets cannot
+LIVE_INTERVALS = tuple(interval for interval in KLINE_INTERVALS if interval != "1month")
+# Weekly candles start on Monday, 4 days after the epoch (a Thursday)
+WEEK_OFFSET = 4 * 24 * 3600
+DEFAULT_CANDLE_CAPACITY = 200
+# Closed candles kept per interval : about 4 hours of 1min candles up to a year of weekly candles,
+# so following the whole market (about 1000 symbols) takes about 75MB
+DEFAULT_CANDLE_CAPACITIES = {"1min": 240, "3min": 160, "5min": 144, "15min": 96, "30min": 96, "1hour": 168, "2hour": 84, "4hour": 84,
+                             "6hour": 56, "8hour": 42, "12hour": 28, "1day": 90, "1week": 52}
+DEFAULT_LIVE_STORE_DIRECTORY = "data/live_klines"
+FLUSH_INTERVAL = 60
+
+
+class CandleSeries:
+    """
+    Rolling candles of one symbol and interval : the last `capacity` closed candles in a ring buffer,
+    and the candle in progress. Rows follow CANDLE_COLUMNS. With `keep_closed`, closed candles are also kept until taken
+    by take_closed. Updated from the WebSocket thread and read from the event loop, under a lock.
+    """
+    __slots__ = ("interval", "offset", "capacity", "rows", "count", "head", "current", "closed", "lock")
+
+    def __init__(self, interval: int, capacity: int = DEFAULT_CANDLE_CAPACITY, offset: int = 0, keep_closed: bool = False):
+        self.interval = interval
+        self.offset = offset
+        self.capacity = capacity
+        self.rows = np.zeros((capacity, len(CANDLE_COLUMNS)), dtype=np.float64)
+        self.count = 0
+        self.head = 0
+        self.current = None
+        self.closed = [] if keep_closed else None
+        self.lock = threading.Lock()
+
+    def start_of(self, timestamp: float) -> int:
+        return int(timestamp - (timestamp - self.offset) % self.interval)
+
+    def _close_current(self) -> None:
+        self.rows[self.head] = self.current
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        if self.closed is not None:
+            self.closed.append(self.current)
+        self.current = None
+
+    def update(self, timestamp: float, price: float, size: float) -> None:
+        """
+        Adds a trade of `size` at `price`, made at `timestamp` (seconds). Trades older than the candle in progress are ignored.
+        """
+        start = self.start_of(timestamp)
+        with self.lock:
+            current = self.current
+            if current is not None and start == current[0]:
+                # time, open, close, high, low, volume, turnover
+                current[2] = price
+                if price > current[3]:
+                    current[3] = price
+                elif price < current[4]:
+                    current[4] = price
+                current[5] += size
+                current[6] += price * size
+                return
+            if current is not None:
+                if start < current[0]:
+                    return
+                self._close_current()
+            self.current = [start, price, price, price, price, size, price * size]
+
+    def close_expired(self, now: float) -> None:
+        """
+        Closes the candle in progress if its interval is over, for symbols without any price update since.
+        """
+        with self.lock:
+            if self.current is not None and self.current[0] + self.interval <= now:
+                self._close_current()
+
+    def seed(self, candles: Candles, now: float) -> None:
+        """
+        Fills the ring buffer with the last stored candles closed before `now`. A stored candle of the current interval
+        is partial, so it is dropped : the candle in progress is only built from the live trades.
+        """
+        rows = np.column_stack([np.asarray(getattr(candles, column), dtype=np.float64) for column in CANDLE_COLUMNS])
+        rows = rows[rows[:, 0] < self.start_of(now)][-self.capacity:]
+        with self.lock:
+            self.rows[:len(rows)] = rows
+            self.count = len(rows)
+            self.head = len(rows) % self.capacity
+            self.current = None
+
+    def take_closed(self) -> list:
+        if self.closed is None:
+            return []
+        with self.lock:
+            closed, self.closed = self.closed, []
+        return closed
+
+    def candles(self, include_current: bool = True) -> Candles:
+        """
+        Returns a copy of the candles ordered by ascending time, the candle in progress last if `include_current`.
+        """
+        with self.lock:
+            if self.count < self.capacity:
+                rows = self.rows[:self.count]
+            else:
+                rows = np.roll(self.rows, -self.head, axis=0)
+            if include_current and self.current is not None:
+                rows = np.vstack((rows, self.current))
+            else:
+                rows = rows.copy()
+        columns = {column: rows[:, index] for index, column in enumerate(CANDLE_COLUMNS)}
+        columns["time"] = columns["time"].astype(np.int64)
+        return Candles(**columns)
+
+
+class CandleBuilder:
+    """
+    Aggregates the trades streamed into WebSocketSymbols into candles of every interval, so strategies read
+    up-to-the-second bars of the live feed with the recent history behind them, without any REST request.
+
+    Candles are built from the last trade (price and size) of each spot ticker event, at its matching time,
+    like the REST klines they are seeded with. The ticker is pushed at most every 100ms, so trades between two
+    pushes are missed and the live volume is a lower bound : live candles are flushed to their own store,
+    never to the REST history. Futures tickerV2 events carry no trade, so futures symbols are not aggregated.
+
+    Args:
+        symbols (list): WebSocketSymbols whose price updates are aggregated.
+        intervals (list): Kline intervals (see KLINE_INTERVALS) to build.
+        capacities (dict): Closed candles kept per symbol, by interval, DEFAULT_CANDLE_CAPACITY for the intervals missing.
+        seed_store (KlineStore): Store whose last candles seed the buffers (e.g. the one of download_history.py), None to start empty.
+        flush_store (KlineStore): Store the closed candles are appended to by flush, None to keep them in memory only.
+    """
+    def __init__(self, symbols: list, intervals: list = LIVE_INTERVALS, capacities: dict = DEFAULT_CANDLE_CAPACITIES,
+                 seed_store: KlineStore = None, flush_store: KlineStore = None):
+        self.intervals = list(intervals)
+        self.capacities = capacities
+        self.seed_store = seed_store
+        self.flush_store = flush_store
+        self.series = {}
+        self._symbol_series = {}
+        # Matching time of the last trade aggregated per symbol, as a ticker repeats it until the next trade
+        self._last_trade_times = {}
+        self.add_symbols(symbols)
+
+    def add_symbols(self, symbols: list) -> None:
+        """
+        Starts building the candles of new symbols, seeded from the seed store (blocking call).
+        """
+        now = time.time()
+        for symbol in symbols:
+            if symbol.type != "spot" or symbol.symbol in self._symbol_series:
+                continue
+            symbol_series = []
+            for interval in self.intervals:
+                interval_seconds = int(KLINE_INTERVALS[interval].total_seconds())
+                capacity = self.capacities.get(interval, DEFAULT_CANDLE_CAPACITY)
+                series = CandleSeries(interval_seconds, capacity, WEEK_OFFSET if interval == "1week" else 0, self.flush_store is not None)
+                if self.seed_store is not None:
+                    series.seed(self.seed_store.load(symbol.symbol, interval), now)
+                self.series[(symbol.symbol, interval)] = series
+                symbol_series.append(series)
+            self._symbol_series[symbol.symbol] = symbol_series
+            symbol.add_listener(self.on_price_update)
+
+    def on_price_update(self, symbol: WebSocketSymbol) -> None:
+        """
+        Called from the SDK's WebSocket thread once the price book is updated.
+        """
+        price_book = symbol.price_book
+        price = float(price_book.last_price[symbol.symbol_id])
+        if price <= 0:
+            return
+        # The exchange time of a spot ticker is the matching time of its last trade
+        exchange_time = int(price_book.exchange_time[symbol.symbol_id])
+        if exchange_time and exchange_time == self._last_trade_times.get(symbol.symbol):
+            return
+        self._last_trade_times[symbol.symbol] = exchange_time
+        timestamp = exchange_time / 1000 if exchange_time else time.time()
+        size = float(price_book.last_size[symbol.symbol_id])
+        for series in self._symbol_series[symbol.symbol]:
+            series.update(timestamp, price, size)
+
+    def candles(self, symbol: str, interval: str, include_current: bool = True) -> Candles:
+        """
+        Returns the candles of a symbol ordered by ascending time, the candle in progress last if `include_current`.
+        """
+        return self.series[(symbol, interval)].candles(include_current)
+
+    def flush(self) -> int:
+        """
+        Closes the candles whose interval is over and appends the closed candles to the flush store (blocking call).
+
+        Returns:
+            int: Number of candles written.
+        """
+        now = time.time()
+        written = 0
+        for (symbol, interval), series in self.series.items():
+            series.close_expired(now)
+            closed = series.take_closed()
+            if not closed:
+                continue
+            rows = np.array(closed, dtype=np.float64)
+            range_start = datetime.fromtimestamp(rows[0, 0], tz=timezone.utc)
+            range_end = datetime.fromtimestamp(rows[-1, 0] + series.interval, tz=timezone.utc)
+            self.flush_store.append(symbol, interval, rows, range_start, range_end)
+            written += len(rows)
+        return written
+
+    async def run_flush(self, interval: float = FLUSH_INTERVAL) -> None:
+        """
+        Flushes the closed candles every `interval` seconds, without blocking the event loop.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                written = await asyncio.to_thread(self.flush)
+                logging.debug(f"[CANDLES] Flushed {written} candles")
+            except Exception as e:
+                logging.error(f"[CANDLES] Error flushing the candles: {e}")
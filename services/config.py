@@ -1,19 +1,68 @@
+import atexit
 import logging
 import os
-from kucoin_universal_sdk.api.client import DefaultClient
-from kucoin_universal_sdk.model.client_option import ClientOptionBuilder
-from kucoin_universal_sdk.model.constants import GLOBAL_API_ENDPOINT
-from kucoin_universal_sdk.model.transport_option import TransportOptionBuilder
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
 from utils.utils import log_to_file
-from dotenv import load_dotenv, find_dotenv
 
-load_dotenv(find_dotenv())
+# Importing this module has no side effect : the settings are read on first use (see get_settings), logging is set up
+# by the entry point (see configure_logging), and the SDK, which takes seconds to import, is imported when the first
+# client is created. Workers that never call the API (replays, backtests, sweeps) start without it.
 
 LOG_WEBSOCKET_PRICES = False
 LOG_IN_FILE = True
 LOG_FILE_NAME = "app.log"
 LOGGER_LEVEL = logging.INFO
 
+# REST endpoints, the WebSocket endpoints are given by their bullet-public token.
+# Same as the SDK's GLOBAL_API_ENDPOINT and GLOBAL_FUTURES_API_ENDPOINT, which cannot be read without importing it.
+# Override them to point every client at another server, e.g. the local mock server (see run_mock_server.py) :
+# KUCOINBOT_SPOT_ENDPOINT=http://127.0.0.1:8765 KUCOINBOT_FUTURES_ENDPOINT=http://127.0.0.1:8765
+DEFAULT_SPOT_API_ENDPOINT = "https://api.kucoin.com"
+DEFAULT_FUTURES_API_ENDPOINT = "https://api-futures.kucoin.com"
+
+# Keep-alive connections kept per host by the REST client, also the number of threads running REST calls
+# (see services.rest_client), so every request in flight reuses a pooled connection
+REST_POOL_SIZE = 16
+REST_CONNECT_TIMEOUT = 5
+REST_READ_TIMEOUT = 10
+
+
+class Settings:
+    """
+    Configuration read from the environment, and from the .env file for the variables it does not set.
+
+    Args:
+        environ (dict): Environment variables, os.environ by default.
+    """
+    __slots__ = ("api_key", "api_secret", "api_passphrase", "spot_endpoint", "futures_endpoint", "log_level")
+
+    def __init__(self, environ: dict = None):
+        environ = os.environ if environ is None else environ
+        self.api_key = environ.get("KUCOINBOT_API_KEY", "")
+        self.api_secret = environ.get("KUCOINBOT_API_SECRET", "")
+        self.api_passphrase = environ.get("KUCOINBOT_API_PASSPHRASE", "")
+        self.spot_endpoint = environ.get("KUCOINBOT_SPOT_ENDPOINT", DEFAULT_SPOT_API_ENDPOINT)
+        self.futures_endpoint = environ.get("KUCOINBOT_FUTURES_ENDPOINT", DEFAULT_FUTURES_API_ENDPOINT)
+        self.log_level = environ.get("KUCOINBOT_LOG_LEVEL", logging.getLevelName(LOGGER_LEVEL)).upper()
+
+
+_settings = None
+_settings_lock = threading.Lock()
+
+def get_settings() -> Settings:
+    """
+    Returns the settings, read once per process.
+    """
+    global _settings
+    with _settings_lock:
+        if _settings is None:
+            from dotenv import load_dotenv, find_dotenv
+            load_dotenv(find_dotenv())
+            _settings = Settings()
+        return _settings
+
 # Formatter for the console (colors)
 class ColorFormatter(logging.Formatter):
     # Define colors for different log levels
@@ -32,32 +81,59 @@ class ColorFormatter(logging.Formatter):
         color = self.COLORS.get(levelname, self.RESET)
         return f"{color}{message}{self.RESET}"
 
-# Configure logging
-logger = logging.getLogger()
-logger.setLevel(LOGGER_LEVEL)
+class DeferredQueueHandler(QueueHandler):
+    """
+    Queue handler that leaves the message formatting to the listener thread.
+    The standard QueueHandler formats the record on the calling thread to make it picklable,
+    which is not needed since the queue never leaves the process.
+    """
+    def prepare(self, record):
+        return record
+
+_log_listener = None
+
+def configure_logging(level=None, log_in_file: bool = LOG_IN_FILE, log_file_name: str = LOG_FILE_NAME) -> None:
+    """
+    Sends the records of the root logger to the console, and to a log file if `log_in_file`.
+    Called once by the entry points, later calls do nothing.
+
+    Records are only put in a queue on the calling thread, a background listener formats and writes them,
+    so a slow disk or terminal never stalls the event loop.
+
+    Args:
+        level (int | str): Level of the root logger, the KUCOINBOT_LOG_LEVEL setting by default.
+        log_in_file (bool): Whether the records are also written to `log_file_name`.
+        log_file_name (str): Path of the log file.
+    """
+    global _log_listener
+    if _log_listener is not None:
+        return
+    logger = logging.getLogger()
+    logger.setLevel(level if level is not None else get_settings().log_level)
 
-if LOG_IN_FILE:
-    # Formatter for the file (no ANSI escape sequences)
-    file_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    log_handlers = []
 
-    default_file_handler = logging.FileHandler(LOG_FILE_NAME)  # For file output
-    default_file_handler.setFormatter(file_formatter)
-    logger.addHandler(default_file_handler)
+    if log_in_file:
+        # Add space between sessions in the log file
+        log_to_file("\n", log_file_name)
 
-    # Add space between sessions in the log file
-    log_to_file("\n", LOG_FILE_NAME)
+        # Formatter for the file (no ANSI escape sequences)
+        file_formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
 
+        default_file_handler = logging.FileHandler(log_file_name)  # For file output
+        default_file_handler.setFormatter(file_formatter)
+        log_handlers.append(default_file_handler)
 
-handler = logging.StreamHandler()
-handler.setFormatter(ColorFormatter("%(asctime)s - %(levelname)s - %(message)s"))
-logger.addHandler(handler)
+    handler = logging.StreamHandler()
+    handler.setFormatter(ColorFormatter("%(asctime)s - %(levelname)s - %(message)s"))
+    log_handlers.append(handler)
 
-# Test logging
-# logging.debug("This is a debug message.")
-# logging.info("This is an info message.")
-# logging.warning("This is a warning message.")
-# logging.error("This is an error message.")
-# logging.critical("This is a critical message.")
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(DeferredQueueHandler(log_queue))
+    _log_listener = QueueListener(log_queue, *log_handlers, respect_handler_level=True)
+    _log_listener.start()
+    # Pending records are written before the interpreter exits
+    atexit.register(_log_listener.stop)
 
 # KuCoin Client
 def initialize_kucoin_client():
@@ -67,28 +143,33 @@ def initialize_kucoin_client():
     Returns:
         DefaultClient: The initialized Kucoin client instance.
     """
-    # Retrieve API credentials from environment variables
+    from kucoin_universal_sdk.api.client import DefaultClient
+    from kucoin_universal_sdk.model.client_option import ClientOptionBuilder
+    from kucoin_universal_sdk.model.transport_option import TransportOptionBuilder
 
-    key = os.getenv("KUCOINBOT_API_KEY", "")
-    secret = os.getenv("KUCOINBOT_API_SECRET", "")
-    passphrase = os.getenv("KUCOINBOT_API_PASSPHRASE", "")
+    settings = get_settings()
 
     # Configure transport options
+    # The SDK passes max_pool_size as the connections kept per host and max_connection_per_pool as the number of hosts,
+    # both are set to the pool size
     http_transport_option = (
         TransportOptionBuilder()
         .set_keep_alive(True)
-        .set_max_pool_size(10)
-        .set_max_connection_per_pool(10)
+        .set_max_pool_size(REST_POOL_SIZE)
+        .set_max_connection_per_pool(REST_POOL_SIZE)
+        .set_connect_timeout(REST_CONNECT_TIMEOUT)
+        .set_read_timeout(REST_READ_TIMEOUT)
         .build()
     )
 
     # Configure client options
     client_option = (
         ClientOptionBuilder()
-        .set_key(key)
-        .set_secret(secret)
-        .set_passphrase(passphrase)
-        .set_spot_endpoint(GLOBAL_API_ENDPOINT)
+        .set_key(settings.api_key)
+        .set_secret(settings.api_secret)
+        .set_passphrase(settings.api_passphrase)
+        .set_spot_endpoint(settings.spot_endpoint)
+        .set_futures_endpoint(settings.futures_endpoint)
         .set_transport_option(http_transport_option)
         .build()
     )
@@ -97,6 +178,23 @@ def initialize_kucoin_client():
     client = DefaultClient(client_option)
     return client
 
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+def get_kucoin_client():
+    """
+    Returns the Kucoin client shared by the whole process, created on first use,
+    so every REST call reuses the same connection pools.
+
+    Returns:
+        DefaultClient: The shared Kucoin client instance.
+    """
+    global _shared_client
+    with _shared_client_lock:
+        if _shared_client is None:
+            _shared_client = initialize_kucoin_client()
+        return _shared_client
+
 def get_market_api(client):
     """
     Retrieves the Spot Market API service from the client.
@@ -107,4 +205,28 @@ def get_market_api(client):
     Returns:
         MarketAPI: The Spot Market API service.
     """
-    return client.rest_service().get_spot_service().get_market_api()
\ No newline at end of file
+    return client.rest_service().get_spot_service().get_market_api()
+
+def get_futures_market_api(client):
+    """
+    Retrieves the Futures Market API service from the client.
+
+    Args:
+        client (DefaultClient): The initialized Kucoin client instance.
+
+    Returns:
+        MarketAPI: The Futures Market API service.
+    """
+    return client.rest_service().get_futures_service().get_market_api()
+
+def get_order_api(client):
+    """
+    Retrieves the Spot Order API service from the client.
+
+    Args:
+        client (DefaultClient): The initialized Kucoin client instance.
+
+    Returns:
+        OrderAPI: The Spot Order API service.
+    """
+    return client.rest_service().get_spot_service().get_order_api()
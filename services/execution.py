@@ -0,0 +1,506 @@
+import asyncio
+import itertools
+import logging
+import math
+import threading
+import time
+from typing import TYPE_CHECKING
+from services.config import get_order_api, get_market_api
+from services.price_book import PriceBook
+from services.rest_client import run_rest
+from services.symbol_metadata import SymbolMetadataCache
+from services.websocket_management import initialize_websocket
+from utils.latency import latency_metrics
+from utils.utils import get_signal_writer
+
+# The SDK is imported on first use, see services.config
+if TYPE_CHECKING:
+    from kucoin_universal_sdk.generate.spot.order.model_add_order_req import AddOrderReq
+    from kucoin_universal_sdk.generate.spot.spot_private.model_order_v2_event import OrderV2Event
+
+EXECUTION_MODES = ("concurrent", "sequential")
+# Seconds to wait for the private order events of an order before querying it
+FILL_TIMEOUT = 5
+# Keep-alive connections opened before the first order, one per leg sent at once
+WARM_CONNECTIONS = 3
+# Unwind rounds, each one trading what the partial fills of the previous one left
+UNWIND_ATTEMPTS = 3
+
+
+def round_down(value: float, increment: float) -> float:
+    # The epsilon avoids losing an increment to floating point errors (e.g. 0.3 / 0.1)
+    return math.floor(value / increment + 1e-9) * increment if increment > 0 else value
+
+
+def round_up(value: float, increment: float) -> float:
+    return math.ceil(value / increment - 1e-9) * increment if increment > 0 else value
+
+
+def format_amount(value: float, increment: float) -> str:
+    decimals = max(0, -math.floor(math.log10(increment))) if increment > 0 else 8
+    return f"{value:.{decimals}f}"
+
+
+class LegTemplate:
+    """
+    Order of one leg of a cycle, built once : a market order request of which only the client id and the amount
+    change when it is sent, with the trading rules needed to size it.
+    """
+    __slots__ = ("symbol", "base_currency", "quote_currency", "sells", "fee", "base_increment", "quote_increment", "min_amount",
+                 "book_id", "request")
+
+    def __init__(self, symbol: str, sells: bool, symbol_metadata: SymbolMetadataCache, book_id: int):
+        from kucoin_universal_sdk.generate.spot.order.model_add_order_req import AddOrderReq, AddOrderReqBuilder
+        metadata = symbol_metadata.get(symbol)
+        self.symbol = symbol
+        self.base_currency, self.quote_currency = symbol.split("-")
+        self.sells = sells
+        self.fee = symbol_metadata.taker_fee(symbol)
+        self.base_increment = metadata.base_increment if metadata else 0.0
+        self.quote_increment = metadata.quote_increment if metadata else 0.0
+        # Selling is sized in base currency, buying in quote funds
+        if metadata is None:
+            self.min_amount = 0.0
+        else:
+            self.min_amount = metadata.base_min_size if sells else metadata.min_quote_amount()
+        self.book_id = book_id
+        self.request = (AddOrderReqBuilder()
+                        .set_symbol(symbol)
+                        .set_side(AddOrderReq.SideEnum.SELL if sells else AddOrderReq.SideEnum.BUY)
+                        .set_type(AddOrderReq.TypeEnum.MARKET)
+                        .build())
+
+    @property
+    def side(self) -> str:
+        return "sell" if self.sells else "buy"
+
+    @property
+    def spent_currency(self) -> str:
+        return self.base_currency if self.sells else self.quote_currency
+
+    @property
+    def received_currency(self) -> str:
+        return self.quote_currency if self.sells else self.base_currency
+
+    def order_amount(self, amount: float) -> float:
+        """
+        Rounds an amount of the spent currency down to the increment of the order, 0 if under the minimum order size.
+        """
+        amount = round_down(amount, self.base_increment if self.sells else self.quote_increment)
+        return amount if amount >= self.min_amount and amount > 0 else 0.0
+
+    def expected_output(self, amount: float, bid: float, ask: float) -> float:
+        return (amount * bid if self.sells else amount / ask) * (1 - self.fee)
+
+    def build_request(self, client_oid: str, amount: float) -> "AddOrderReq":
+        if self.sells:
+            update = {"client_oid": client_oid, "size": format_amount(amount, self.base_increment)}
+        else:
+            update = {"client_oid": client_oid, "funds": format_amount(amount, self.quote_increment)}
+        return self.request.model_copy(update=update)
+
+
+class CycleTemplate:
+    """
+    The three legs of a cycle, starting from `currencies[0]`.
+    """
+    __slots__ = ("cycle_index", "currencies", "legs")
+
+    def __init__(self, cycle_index: int, currencies: tuple, legs: list):
+        self.cycle_index = cycle_index
+        self.currencies = currencies
+        self.legs = legs
+
+    def __str__(self):
+        return " -> ".join(self.currencies + (self.currencies[0],))
+
+    def leg_to_start(self, currency: str) -> LegTemplate:
+        """
+        Returns the leg trading `currency` against the start currency, every currency of a triangle having one.
+        """
+        start_currency = self.currencies[0]
+        for leg in self.legs:
+            if {leg.base_currency, leg.quote_currency} == {currency, start_currency}:
+                return leg
+        return None
+
+
+class OrderState:
+    """
+    An order sent by the engine, filled in by the private order events (or by a query if they are late).
+    """
+    __slots__ = ("client_oid", "symbol", "side", "amount", "send_time", "ack_time", "fill_time", "order_id", "filled_size",
+                 "filled_funds", "done", "error", "_done_event")
+
+    def __init__(self, client_oid: str, symbol: str, side: str, amount: str):
+        self.client_oid = client_oid
+        self.symbol = symbol
+        self.side = side
+        self.amount = amount
+        self.send_time = None
+        self.ack_time = None
+        self.fill_time = None
+        self.order_id = None
+        self.filled_size = 0.0
+        self.filled_funds = 0.0
+        self.done = False
+        self.error = None
+        self._done_event = asyncio.Event()
+
+    def describe(self, decision_time: int) -> str:
+        if self.error is not None:
+            return f"{self.side} {self.symbol} {self.amount} : rejected ({self.error})"
+        latencies = f"sent {(self.send_time - decision_time) / 1000:.0f}us after the decision"
+        if self.ack_time is not None:
+            latencies += f", acknowledged in {(self.ack_time - self.send_time) / 1000:.0f}us"
+        if self.fill_time is not None:
+            latencies += f", done in {(self.fill_time - self.send_time) / 1000:.0f}us"
+        return f"{self.side} {self.symbol} {self.amount} : filled {self.filled_size:g} for {self.filled_funds:g} ({latencies})"
+
+
+class OrderTracker:
+    """
+    Follows the orders of the engine through the private order channel (order_v2 topic of the spot private WebSocket).
+    Events are handled on the SDK's WebSocket thread and complete the orders on the event loop.
+    """
+    def __init__(self, ws_service_factory=initialize_websocket):
+        self.ws_service_factory = ws_service_factory
+        self.orders = {}
+        self.ws = None
+        self._lock = threading.Lock()
+        self._loop = None
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """
+        Connects to the private order channel (blocking call).
+        """
+        self._loop = loop
+        self.ws = self.ws_service_factory().new_spot_private_ws()
+        self.ws.start()
+        self.ws.order_v2(self._on_order_event)
+        logging.info("[EXECUTION] Subscribed to the private order events")
+
+    def stop(self) -> None:
+        if self.ws is not None:
+            self.ws.stop()
+            self.ws = None
+
+    def track(self, state: OrderState) -> None:
+        # Registered before sending, the events can arrive before the response
+        with self._lock:
+            self.orders[state.client_oid] = state
+
+    def forget(self, state: OrderState) -> None:
+        with self._lock:
+            self.orders.pop(state.client_oid, None)
+
+    def _on_order_event(self, topic: str, subject: str, data: "OrderV2Event") -> None:
+        from kucoin_universal_sdk.generate.spot.spot_private.model_order_v2_event import OrderV2Event
+        with self._lock:
+            state = self.orders.get(data.client_oid)
+        if state is None or state.done:
+            return
+        if data.type == OrderV2Event.TypeEnum.MATCH and data.match_size:
+            state.filled_funds += float(data.match_price) * float(data.match_size)
+        if data.status == OrderV2Event.StatusEnum.DONE:
+            state.filled_size = float(data.filled_size or 0)
+            state.fill_time = time.time_ns()
+            state.done = True
+            self._loop.call_soon_threadsafe(state._done_event.set)
+
+    async def wait(self, state: OrderState, order_api, timeout: float = FILL_TIMEOUT) -> None:
+        """
+        Waits until an order is done. Without its events after `timeout` seconds, the order is queried instead.
+        """
+        try:
+            await asyncio.wait_for(state._done_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"[EXECUTION] No event for order {state.client_oid} after {timeout}s, querying it")
+            from kucoin_universal_sdk.generate.spot.order.model_get_order_by_client_oid_req import GetOrderByClientOidReqBuilder
+            request = GetOrderByClientOidReqBuilder().set_client_oid(state.client_oid).set_symbol(state.symbol).build()
+            order = await run_rest("orders", order_api.get_order_by_client_oid, request)
+            if not state.done:
+                state.filled_size = float(order.deal_size or 0)
+                state.filled_funds = float(order.deal_funds or 0)
+                state.fill_time = time.time_ns()
+                state.done = not order.active
+        finally:
+            self.forget(state)
+
+
+class ExecutionReport:
+    """
+    Outcome of the execution of a cycle : its orders, the unwind orders of partial fills, and the change of each currency.
+    """
+    __slots__ = ("cycle", "mode", "amount", "decision_time", "orders", "unwind_orders", "balance_changes")
+
+    def __init__(self, cycle: CycleTemplate, mode: str, amount: float, decision_time: int):
+        self.cycle = cycle
+        self.mode = mode
+        self.amount = amount
+        self.decision_time = decision_time
+        self.orders = []
+        self.unwind_orders = []
+        self.balance_changes = {}
+
+    @property
+    def profit(self) -> float:
+        """
+        Percentage change of the start currency, once the other currencies are unwound.
+        """
+        return self.balance_changes.get(self.cycle.currencies[0], 0.0) / self.amount * 100
+
+    def summary(self) -> str:
+        lines = [f"[EXECUTION] {self.cycle} ({self.mode}) with {self.amount:g} {self.cycle.currencies[0]} : {self.profit:.3f}%"]
+        lines += [f"  leg {state.describe(self.decision_time)}" for state in self.orders]
+        lines += [f"  unwind {state.describe(self.decision_time)}" for state in self.unwind_orders]
+        residuals = {currency: change for currency, change in self.balance_changes.items() if currency != self.cycle.currencies[0] and change}
+        if residuals:
+            lines.append("  residual " + ", ".join(f"{change:+g} {currency}" for currency, change in residuals.items()))
+        return "\n".join(lines)
+
+
+class ExecutionEngine:
+    """
+    Sends the orders of profitable triangular cycles, and unwinds what partial fills leave in the other currencies.
+
+    Orders go through the shared REST client (services.config.get_kucoin_client), whose keep-alive connections are
+    opened beforehand by start, from market order templates built once per cycle. Legs are sent together
+    ("concurrent", which needs a balance in every currency of the cycle) or one after the other ("sequential",
+    each leg trading what the previous one received). Fills are followed through the private order events.
+    The decision-to-send, send-to-acknowledgement and send-to-fill latencies of each order are recorded in
+    utils.latency.latency_metrics.
+
+    Args:
+        client (DefaultClient): Client sending the orders, see services.config.get_kucoin_client.
+        symbol_metadata (SymbolMetadataCache): Trading rules of the symbols, to size the orders.
+        mode (str): "concurrent" or "sequential".
+        tracker (OrderTracker): Tracker of the private order events, a new one if None.
+        fill_timeout (float): Seconds to wait for the events of an order before querying it.
+        signal_file (str): File the report of each executed cycle is written to.
+    """
+    def __init__(self, client, symbol_metadata: SymbolMetadataCache, mode: str = "concurrent", tracker: OrderTracker = None,
+                 fill_timeout: float = FILL_TIMEOUT, signal_file: str = "important.log"):
+        if mode not in EXECUTION_MODES:
+            raise ValueError(f"Unknown execution mode {mode}, expected one of {', '.join(EXECUTION_MODES)}")
+        self.order_api = get_order_api(client)
+        self.market_api = get_market_api(client)
+        self.symbol_metadata = symbol_metadata
+        self.mode = mode
+        self.tracker = tracker if tracker is not None else OrderTracker()
+        self.fill_timeout = fill_timeout
+        self.templates = {}
+        self._unwind_legs = {}
+        self.busy = False
+        self.reports = []
+        self.signal_writer = get_signal_writer(signal_file)
+        self._client_oids = itertools.count()
+        self._client_oid_prefix = f"kb{int(time.time()):x}"
+
+    async def start(self) -> None:
+        """
+        Connects the order tracker and opens the keep-alive connections of the orders.
+        """
+        await asyncio.to_thread(self.tracker.start, asyncio.get_running_loop())
+        await asyncio.gather(*(run_rest("orders", self.market_api.get_server_time) for _ in range(WARM_CONNECTIONS)))
+
+    def stop(self) -> None:
+        self.tracker.stop()
+
+    def prepare(self, scanner, cycle_index: int, start_currency: str) -> CycleTemplate:
+        """
+        Returns the template of a cycle of a TriangleScanner starting from `start_currency`, built on first use.
+        """
+        key = (cycle_index, start_currency)
+        template = self.templates.get(key)
+        if template is None:
+            currencies = scanner.cycle_currencies[cycle_index]
+            start = currencies.index(start_currency)
+            legs = [LegTemplate(scanner.symbols[symbol_index], bool(sells), self.symbol_metadata, int(book_id))
+                    for symbol_index, sells, book_id in zip(scanner.leg_symbols[cycle_index], scanner.leg_sells[cycle_index],
+                                                            scanner.leg_book_ids[cycle_index])]
+            template = self.templates[key] = CycleTemplate(cycle_index, currencies[start:] + currencies[:start], legs[start:] + legs[:start])
+        return template
+
+    def prepare_cycles(self, scanner, trade_amounts: dict) -> None:
+        """
+        Builds the templates of every cycle of a scanner going through a currency with a trade amount.
+        """
+        for cycle_index, currencies in enumerate(scanner.cycle_currencies):
+            for currency in trade_amounts:
+                if currency in currencies:
+                    self.prepare(scanner, cycle_index, currency)
+                    break
+        logging.info(f"[EXECUTION] {len(self.templates)} cycle templates ready")
+
+    def _new_order(self, leg: LegTemplate, amount: float):
+        client_oid = f"{self._client_oid_prefix}{next(self._client_oids):x}"
+        request = leg.build_request(client_oid, amount)
+        state = OrderState(client_oid, leg.symbol, leg.side, request.size if leg.sells else request.funds)
+        return request, state
+
+    def _send(self, request: "AddOrderReq", state: OrderState) -> None:
+        # Runs on the REST thread pool : the send time is taken right before the request is written
+        state.send_time = time.time_ns()
+        response = self.order_api.add_order(request)
+        state.ack_time = time.time_ns()
+        state.order_id = response.order_id
+
+    async def _place(self, leg: LegTemplate, amount: float) -> OrderState:
+        """
+        Sends a market order and waits until it is done.
+        """
+        request, state = self._new_order(leg, amount)
+        self.tracker.track(state)
+        try:
+            await run_rest("orders", self._send, request, state)
+        except Exception as e:
+            state.error = e
+            state.send_time = state.send_time or time.time_ns()
+            self.tracker.forget(state)
+            return state
+        await self.tracker.wait(state, self.order_api, self.fill_timeout)
+        return state
+
+    def _record(self, report: ExecutionReport, leg: LegTemplate, state: OrderState, at_decision: bool = False) -> None:
+        """
+        Adds the currencies an order spent and received to the balance changes of a report.
+        Fees are taken from the received currency. Only the orders sent `at_decision` (every concurrent leg,
+        the first sequential one) measure the decision-to-send latency, the others waited for a previous fill.
+        """
+        changes = report.balance_changes
+        if leg.sells:
+            spent, received = state.filled_size, state.filled_funds * (1 - leg.fee)
+        else:
+            spent, received = state.filled_funds, state.filled_size * (1 - leg.fee)
+        changes[leg.spent_currency] = changes.get(leg.spent_currency, 0.0) - spent
+        changes[leg.received_currency] = changes.get(leg.received_currency, 0.0) + received
+        if latency_metrics.enabled:
+            latency_metrics.record_order(report.decision_time if at_decision else None, state.send_time, state.ack_time, state.fill_time)
+
+    async def execute(self, template: CycleTemplate, amount: float, decision_time: int, price_book: PriceBook):
+        """
+        Executes a cycle with `amount` of its start currency.
+
+        Args:
+            template (CycleTemplate): The cycle, see prepare.
+            amount (float): Amount of the start currency to trade.
+            decision_time (int): time.time_ns() when the cycle was found profitable.
+            price_book (PriceBook): Best prices of the symbols, to size the concurrent legs and the unwind orders.
+
+        Returns:
+            ExecutionReport: The orders and balance changes, None if an order would be under the minimum size.
+        """
+        # Each leg is sized from the expected output of the previous one, the cycle is skipped if one is under its minimum
+        bid, ask = price_book.snapshot()
+        amounts = []
+        leg_amount = amount
+        for leg in template.legs:
+            leg_amount = leg.order_amount(leg_amount)
+            if not leg_amount:
+                return None
+            amounts.append(leg_amount)
+            leg_amount = leg.expected_output(leg_amount, bid[leg.book_id], ask[leg.book_id])
+
+        report = ExecutionReport(template, self.mode, amount, decision_time)
+        if self.mode == "concurrent":
+            report.orders = list(await asyncio.gather(*(self._place(leg, leg_amount) for leg, leg_amount in zip(template.legs, amounts))))
+            for leg, state in zip(template.legs, report.orders):
+                self._record(report, leg, state, at_decision=True)
+        else:
+            leg_amount = amounts[0]
+            for index, leg in enumerate(template.legs):
+                state = await self._place(leg, leg_amount)
+                report.orders.append(state)
+                self._record(report, leg, state, at_decision=index == 0)
+                if index == len(template.legs) - 1 or state.error is not None:
+                    break
+                # The next leg trades what this one actually received
+                leg_amount = template.legs[index + 1].order_amount(report.balance_changes.get(leg.received_currency, 0.0))
+                if not leg_amount:
+                    break
+
+        for _ in range(UNWIND_ATTEMPTS):
+            if not await self._unwind(report, price_book):
+                break
+        return report
+
+    def _unwind_leg(self, leg: LegTemplate, sells: bool) -> LegTemplate:
+        key = (leg.symbol, sells)
+        unwind_leg = self._unwind_legs.get(key)
+        if unwind_leg is None:
+            unwind_leg = self._unwind_legs[key] = LegTemplate(leg.symbol, sells, self.symbol_metadata, leg.book_id)
+        return unwind_leg
+
+    async def _unwind(self, report: ExecutionReport, price_book: PriceBook) -> bool:
+        """
+        Trades back to the start currency what the fills left in the other currencies : the excess is sold,
+        the shortfall bought back, when above the minimum order size.
+
+        Returns:
+            bool: Whether an unwind order was sent.
+        """
+        template = report.cycle
+        orders = []
+        dust = []
+        for currency in template.currencies[1:]:
+            residual = report.balance_changes.get(currency, 0.0)
+            leg = template.leg_to_start(currency)
+            if not residual or leg is None:
+                continue
+            # The unwind order trades the symbol of the leg, in one direction or the other
+            unwind_leg = self._unwind_leg(leg, (leg.base_currency == currency) == (residual > 0))
+            if residual > 0:
+                # Spends the excess currency
+                amount = unwind_leg.order_amount(residual)
+            else:
+                # Spends the start currency to buy the shortfall back, with a margin for the fee
+                bid, ask = (float(price[0]) for price in price_book.snapshot([leg.book_id]))
+                needed = -residual / (1 - unwind_leg.fee)
+                if unwind_leg.sells:
+                    amount = round_up(needed / bid, unwind_leg.base_increment) if bid > 0 else 0.0
+                else:
+                    amount = round_up(needed * ask, unwind_leg.quote_increment) if ask > 0 else 0.0
+                amount = amount if amount >= unwind_leg.min_amount else 0.0
+            if not amount:
+                dust.append(f"{residual:+g} {currency}")
+                continue
+            orders.append((unwind_leg, amount))
+        if not orders:
+            if dust:
+                logging.info(f"[EXECUTION] {', '.join(dust)} left, under the minimum order size")
+            return False
+
+        states = await asyncio.gather(*(self._place(unwind_leg, amount) for unwind_leg, amount in orders))
+        for (unwind_leg, _), state in zip(orders, states):
+            report.unwind_orders.append(state)
+            self._record(report, unwind_leg, state)
+        return True
+
+    async def execute_cycle(self, scanner, cycle_index: int, decision_time: int):
+        """
+        Executes a cycle of a TriangleScanner with the trade amount of its first currency having one.
+        A single cycle is executed at a time, the others are skipped meanwhile.
+
+        Returns:
+            ExecutionReport: The report, None if skipped.
+        """
+        if self.busy:
+            return None
+        currencies = scanner.cycle_currencies[cycle_index]
+        start_currency = next((currency for currency in scanner.trade_amounts if currency in currencies), None)
+        if start_currency is None:
+            return None
+        self.busy = True
+        try:
+            template = self.prepare(scanner, cycle_index, start_currency)
+            report = await self.execute(template, scanner.trade_amounts[start_currency], decision_time, scanner.price_book)
+        except Exception as e:
+            logging.error(f"[EXECUTION] Error executing {scanner.describe_cycle(cycle_index)}: {e}")
+            return None
+        finally:
+            self.busy = False
+        if report is not None:
+            self.reports.append(report)
+            self.signal_writer.write(report.summary())
+        return report
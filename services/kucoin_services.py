@@ -1,10 +1,59 @@
-from kucoin_universal_sdk.generate.spot.market.api_market import MarketAPI
-from kucoin_universal_sdk.generate.spot.market.model_get_klines_req import GetKlinesReqBuilder
 import logging
 from datetime import datetime, timezone, timedelta
 import asyncio
+from typing import TYPE_CHECKING
+from utils.rate_limiter import TokenBucket
+from utils.kline_store import KlineStore
+from utils.candles import parse_klines
+from services.rest_client import run_rest
 
-def fetch_klines(api: MarketAPI, symbol: str, interval: str, start: datetime, end: datetime):
+# The request builders of the SDK are imported on first use, see services.config
+if TYPE_CHECKING:
+    from kucoin_universal_sdk.generate.spot.market.api_market import MarketAPI
+
+# Duration of one candle for each interval supported by the klines endpoint
+KLINE_INTERVALS = {
+    "1min": timedelta(minutes=1),
+    "3min": timedelta(minutes=3),
+    "5min": timedelta(minutes=5),
+    "15min": timedelta(minutes=15),
+    "30min": timedelta(minutes=30),
+    "1hour": timedelta(hours=1),
+    "2hour": timedelta(hours=2),
+    "4hour": timedelta(hours=4),
+    "6hour": timedelta(hours=6),
+    "8hour": timedelta(hours=8),
+    "12hour": timedelta(hours=12),
+    "1day": timedelta(days=1),
+    "1week": timedelta(days=7),
+    "1month": timedelta(days=30)
+}
+
+# Maximum number of candles returned by a single klines request
+KLINE_BATCH_SIZE = 1500
+
+# KuCoin public resource pool : 2000 weight per 30 seconds per IP, a klines request weighs 3
+PUBLIC_RATE_LIMIT_WEIGHT = 2000
+PUBLIC_RATE_LIMIT_WINDOW = 30
+KLINES_REQUEST_WEIGHT = 3
+
+def fetch_trading_symbols(api: "MarketAPI", quote_currency: str = "USDT"):
+    """
+    Fetches every symbol currently trading against a quote currency.
+
+    Args:
+        api (MarketAPI): The market API client instance.
+        quote_currency (str): The quote currency (e.g., 'USDT').
+
+    Returns:
+        list: Sorted list of trading pair symbols (e.g., ['ADA-USDT', 'BTC-USDT', ...]).
+    """
+    from kucoin_universal_sdk.generate.spot.market.model_get_all_symbols_req import GetAllSymbolsReqBuilder
+    symbols_resp = api.get_all_symbols(GetAllSymbolsReqBuilder().build())
+    return sorted(symbol_data.symbol for symbol_data in symbols_resp.data
+                  if symbol_data.quote_currency == quote_currency and symbol_data.enable_trading)
+
+def fetch_klines(api: "MarketAPI", symbol: str, interval: str, start: datetime, end: datetime):
     """
     # DEPRECATED : USE FETCH_ALL_KLINES INSTEAD
     Fetches historical kline data for a specific symbol.
@@ -19,6 +68,7 @@ def fetch_klines(api: MarketAPI, symbol: str, interval: str, start: datetime, en
     Returns:
         list: List of kline data (open, high, low, close, volume).
     """
+    from kucoin_universal_sdk.generate.spot.market.model_get_klines_req import GetKlinesReqBuilder
     get_kline_req = (
         GetKlinesReqBuilder()
         .set_symbol(symbol)
@@ -34,7 +84,7 @@ def fetch_klines(api: MarketAPI, symbol: str, interval: str, start: datetime, en
     logging.info(f"Received {len(data)} candles for {symbol} from {real_start} to {real_end}")
     return data
 
-async def fetch_all_klines(api: MarketAPI, symbol: str, interval: str, start_time: datetime, end_time: datetime):
+async def fetch_all_klines(api: "MarketAPI", symbol: str, interval: str, start_time: datetime, end_time: datetime):
     """
     ### Fetches all kline data for a specific symbol in batches (currently 1500 candles max).
     Order is inversed, only last 1500 candles are returned, so the end time changes at each iteration
@@ -51,23 +101,8 @@ async def fetch_all_klines(api: MarketAPI, symbol: str, interval: str, start_tim
     """
     all_data = []
 
-    deltat_dict = {
-        "1min": timedelta(minutes=1),
-        "3min": timedelta(minutes=3),
-        "5min": timedelta(minutes=5),
-        "15min": timedelta(minutes=15),
-        "30min": timedelta(minutes=30),
-        "1hour": timedelta(hours=1),
-        "2hour": timedelta(hours=2),
-        "4hour": timedelta(hours=4),
-        "6hour": timedelta(hours=6),
-        "8hour": timedelta(hours=8),
-        "12hour": timedelta(hours=12),
-        "1day": timedelta(days=1),
-        "1week": timedelta(days=7),
-        "1month": timedelta(days=30)
-    }
-    deltat = deltat_dict[interval]
+    from kucoin_universal_sdk.generate.spot.market.model_get_klines_req import GetKlinesReqBuilder
+    deltat = KLINE_INTERVALS[interval]
 
     # End time candle is not fetched (ex : if end_time is 15:00, the last candle will be 14:00 in H1)
     current_end_time = end_time + deltat
@@ -84,7 +119,7 @@ async def fetch_all_klines(api: MarketAPI, symbol: str, interval: str, start_tim
                 .set_end_at(int(current_end_time.timestamp()))
                 .build()
             )
-            kline_resp = api.get_klines(get_kline_req)
+            kline_resp = await run_rest("klines", api.get_klines, get_kline_req)
 
             # Append the batch to the full dataset
             all_data.extend(kline_resp.data)
@@ -105,4 +140,277 @@ async def fetch_all_klines(api: MarketAPI, symbol: str, interval: str, start_tim
     real_start = datetime.fromtimestamp(int(all_data[-1][0]), tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
     logging.info(f"Received {len(all_data)} candles for {symbol} from {real_start} to {real_end}")
 
-    return all_data
\ No newline at end of file
+    return all_data
+
+
+def compute_kline_windows(interval: str, start_time: datetime, end_time: datetime, batch_size: int = KLINE_BATCH_SIZE):
+    """
+    Splits [start_time, end_time] into consecutive windows of at most `batch_size` candles.
+    Like fetch_all_klines, the end_time candle is included.
+
+    Args:
+        interval (str): The kline interval (e.g., '1min', '1hour').
+        start_time (datetime): Start time of the first window.
+        end_time (datetime): Time of the last candle to fetch.
+        batch_size (int): Number of candles per window.
+
+    Returns:
+        list: List of (window_start, window_end) tuples, window_end being exclusive.
+    """
+    deltat = KLINE_INTERVALS[interval]
+    window_span = deltat * batch_size
+    final_end_time = end_time + deltat
+
+    windows = []
+    window_start = start_time
+    while window_start < final_end_time:
+        window_end = min(window_start + window_span, final_end_time)
+        windows.append((window_start, window_end))
+        window_start = window_end
+    return windows
+
+
+def fetch_kline_window(api: "MarketAPI", symbol: str, interval: str, window_start: datetime, window_end: datetime):
+    """
+    Fetches the candles of a single window (blocking call).
+
+    Args:
+        api (MarketAPI): The market API client instance.
+        symbol (str): The trading pair symbol (e.g., 'BTC-USDT').
+        interval (str): The kline interval (e.g., '1hour').
+        window_start (datetime): Start time of the window (inclusive).
+        window_end (datetime): End time of the window (exclusive).
+
+    Returns:
+        list: List of kline data, newest candle first.
+    """
+    from kucoin_universal_sdk.generate.spot.market.model_get_klines_req import GetKlinesReqBuilder
+    get_kline_req = (
+        GetKlinesReqBuilder()
+        .set_symbol(symbol)
+        .set_type(interval)
+        .set_start_at(int(window_start.timestamp()))
+        .set_end_at(int(window_end.timestamp()))
+        .build()
+    )
+    return api.get_klines(get_kline_req).data or []
+
+
+def merge_kline_batches(batches):
+    """
+    Stitches batches of candles together, removing duplicated timestamps.
+
+    Args:
+        batches (list): List of kline data lists.
+
+    Returns:
+        list: List of kline data ordered newest first, like the klines endpoint.
+    """
+    candles_by_timestamp = {}
+    for batch in batches:
+        for candle in batch:
+            candles_by_timestamp[int(candle[0])] = candle
+    return [candles_by_timestamp[timestamp] for timestamp in sorted(candles_by_timestamp, reverse=True)]
+
+
+def create_klines_rate_limiter(max_weight: float = PUBLIC_RATE_LIMIT_WEIGHT, window: float = PUBLIC_RATE_LIMIT_WINDOW, burst: float = 30 * KLINES_REQUEST_WEIGHT):
+    """
+    Creates a token bucket matching KuCoin's public rate limit, counted in request weight.
+
+    Args:
+        max_weight (float): Weight allowed per window.
+        window (float): Window duration in seconds.
+        burst (float): Maximum weight that can be spent at once.
+
+    Returns:
+        TokenBucket: The rate limiter.
+    """
+    return TokenBucket(max_weight / window, burst)
+
+
+async def iter_kline_windows(api: "MarketAPI", symbol: str, interval: str, windows, max_workers: int = 8,
+                             rate_limiter: TokenBucket = None, max_retries: int = 3, retry_delay: float = 31):
+    """
+    Fetches windows of candles concurrently and yields each one as soon as it is received.
+    Requests run on the shared REST thread pool (see services.rest_client), throttled by a token bucket to respect KuCoin's public rate limit.
+
+    Args:
+        api (MarketAPI): The market API client instance.
+        symbol (str): The trading pair symbol (e.g., 'BTC-USDT').
+        interval (str): The kline interval (e.g., '1min', '1hour').
+        windows (list): List of (window_start, window_end) tuples, see compute_kline_windows.
+        max_workers (int): Maximum number of requests in flight.
+        rate_limiter (TokenBucket): Shared rate limiter. A new one matching the public limit is created if None.
+        max_retries (int): Number of retries for a failing window before giving up on it.
+        retry_delay (float): Seconds to wait before retrying a failing window (a rate limit window is 30s).
+
+    Yields:
+        tuple: (window_start, window_end, data), data being None if the window could not be fetched.
+    """
+    if rate_limiter is None:
+        rate_limiter = create_klines_rate_limiter()
+    requests_semaphore = asyncio.Semaphore(max_workers)
+
+    async def fetch_window(window_start, window_end):
+        for attempt in range(max_retries + 1):
+            await rate_limiter.acquire(KLINES_REQUEST_WEIGHT)
+            try:
+                async with requests_semaphore:
+                    data = await run_rest("klines", fetch_kline_window, api, symbol, interval, window_start, window_end)
+                return window_start, window_end, data
+            except Exception as e:
+                logging.error(f"Error fetching klines for {symbol} from {window_start.strftime('%Y-%m-%d %H:%M:%S')} (attempt {attempt + 1}/{max_retries + 1}): {e}")
+                if attempt < max_retries:
+                    await asyncio.sleep(retry_delay)
+        return window_start, window_end, None
+
+    tasks = [asyncio.ensure_future(fetch_window(window_start, window_end)) for window_start, window_end in windows]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def fetch_all_klines_concurrent(api: "MarketAPI", symbol: str, interval: str, start_time: datetime, end_time: datetime,
+                                      max_workers: int = 8, rate_limiter: TokenBucket = None, max_retries: int = 3, retry_delay: float = 31):
+    """
+    ### Fetches all kline data for a specific symbol by fetching precomputed windows concurrently.
+    Same result as fetch_all_klines, but windows are requested in parallel by a thread pool,
+    throttled by a token bucket to respect KuCoin's public rate limit.
+
+    Args:
+        api (MarketAPI): The market API client instance.
+        symbol (str): The trading pair symbol (e.g., 'BTC-USDT').
+        interval (str): The kline interval (e.g., '1min', '1hour').
+        start_time (datetime): Start time of the candles to fetch.
+        end_time (datetime): End time of the candles to fetch (included).
+        max_workers (int): Maximum number of requests in flight.
+        rate_limiter (TokenBucket): Shared rate limiter. A new one matching the public limit is created if None.
+        max_retries (int): Number of retries for a failing window before giving up on it.
+        retry_delay (float): Seconds to wait before retrying a failing window (a rate limit window is 30s).
+
+    Returns:
+        list: List of all kline data, newest candle first.
+    """
+    windows = compute_kline_windows(interval, start_time, end_time)
+    logging.info(f"Fetching {len(windows)} windows of {interval} candles for {symbol} with {max_workers} workers")
+
+    batches = []
+    async for _, _, data in iter_kline_windows(api, symbol, interval, windows, max_workers, rate_limiter, max_retries, retry_delay):
+        if data is not None:
+            batches.append(data)
+
+    all_data = merge_kline_batches(batches)
+    if not all_data:
+        logging.warning(f"No candles received for {symbol}")
+        return all_data
+
+    real_end = datetime.fromtimestamp(int(all_data[0][0]), tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    real_start = datetime.fromtimestamp(int(all_data[-1][0]), tz=timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+    logging.info(f"Received {len(all_data)} candles for {symbol} from {real_start} to {real_end}")
+
+    return all_data
+
+
+async def stream_klines(api: "MarketAPI", symbol: str, interval: str, start_time: datetime, end_time: datetime,
+                        rate_limiter: TokenBucket = None, max_retries: int = 3, retry_delay: float = 31):
+    """
+    ### Streams kline data for a specific symbol, one parsed batch at a time.
+    Windows are fetched from the newest to the oldest like fetch_all_klines, but each batch is yielded
+    as typed columns (see utils.candles) as soon as it arrives instead of being accumulated,
+    so callers can pipe it into a file writer (e.g. utils.candles.append_candles) with bounded memory.
+
+    Args:
+        api (MarketAPI): The market API client instance.
+        symbol (str): The trading pair symbol (e.g., 'BTC-USDT').
+        interval (str): The kline interval (e.g., '1min', '1hour').
+        start_time (datetime): Start time of the candles to fetch.
+        end_time (datetime): End time of the candles to fetch (included).
+        rate_limiter (TokenBucket): Shared rate limiter. A new one matching the public limit is created if None.
+        max_retries (int): Number of retries for a failing window before skipping it.
+        retry_delay (float): Seconds to wait before retrying a failing window (a rate limit window is 30s).
+
+    Yields:
+        Candles: The candles of each window, ordered by ascending time.
+    """
+    if rate_limiter is None:
+        rate_limiter = create_klines_rate_limiter()
+
+    for window_start, window_end in reversed(compute_kline_windows(interval, start_time, end_time)):
+        for attempt in range(max_retries + 1):
+            await rate_limiter.acquire(KLINES_REQUEST_WEIGHT)
+            try:
+                # The blocking request runs on the REST thread pool so the event loop keeps running
+                data = await run_rest("klines", fetch_kline_window, api, symbol, interval, window_start, window_end)
+                break
+            except Exception as e:
+                logging.error(f"Error fetching klines for {symbol} from {window_start.strftime('%Y-%m-%d %H:%M:%S')} (attempt {attempt + 1}/{max_retries + 1}): {e}")
+                if attempt < max_retries:
+                    await asyncio.sleep(retry_delay)
+        else:
+            logging.error(f"Skipping window starting at {window_start.strftime('%Y-%m-%d %H:%M:%S')} for {symbol}")
+            continue
+
+        batch = parse_klines(data)
+        logging.info(f"Received {len(batch)} candles for {symbol}. Current end time: {window_start.strftime('%Y-%m-%d %H:%M:%S')}")
+        yield batch
+
+
+async def sync_klines(api: "MarketAPI", store: KlineStore, symbol: str, interval: str, start_time: datetime, end_time: datetime,
+                      max_workers: int = 8, rate_limiter: TokenBucket = None, max_retries: int = 3, retry_delay: float = 31,
+                      on_window=None):
+    """
+    ### Brings the local store up to date for [start_time, end_time], only requesting the missing ranges.
+    New candles at the head and holes left by failed requests are fetched and appended to the store.
+    Candles that are not closed yet are not stored, so they are fetched again on the next sync.
+
+    Args:
+        api (MarketAPI): The market API client instance.
+        store (KlineStore): The local candle store.
+        symbol (str): The trading pair symbol (e.g., 'BTC-USDT').
+        interval (str): The kline interval (e.g., '1min', '1hour').
+        start_time (datetime): Start time of the candles to hold.
+        end_time (datetime): End time of the candles to hold (included).
+        max_workers (int): Maximum number of requests in flight.
+        rate_limiter (TokenBucket): Shared rate limiter. A new one matching the public limit is created if None.
+        max_retries (int): Number of retries for a failing window before giving up on it.
+        retry_delay (float): Seconds to wait before retrying a failing window (a rate limit window is 30s).
+        on_window (callable): Optional callback called with the number of stored candles after each successful window.
+
+    Returns:
+        int: The number of candles added to the store.
+    """
+    deltat = KLINE_INTERVALS[interval]
+    missing_ranges = store.missing_ranges(symbol, interval, start_time, end_time + deltat)
+
+    windows = []
+    for range_start, range_end in missing_ranges:
+        windows.extend(compute_kline_windows(interval, range_start, range_end - deltat))
+    if not windows:
+        logging.info(f"{symbol} {interval} is already up to date")
+        return 0
+
+    logging.info(f"Fetching {len(windows)} missing windows of {interval} candles for {symbol} ({len(missing_ranges)} gaps)")
+
+    added = 0
+    failed = 0
+    async for window_start, window_end, data in iter_kline_windows(api, symbol, interval, windows, max_workers, rate_limiter, max_retries, retry_delay):
+        if data is None:
+            failed += 1
+            continue
+
+        # Only closed candles are kept : the candle in progress must be fetched again later
+        last_closed_time = datetime.now(timezone.utc) - deltat
+        closed_data = [candle for candle in data if int(candle[0]) <= last_closed_time.timestamp()]
+        # Written on a thread, so the other jobs keep running during the disk I/O
+        await asyncio.to_thread(store.append, symbol, interval, closed_data, window_start, min(window_end, last_closed_time))
+        added += len(closed_data)
+        if on_window is not None:
+            on_window(len(closed_data))
+
+    if failed:
+        logging.warning(f"{failed} windows could not be fetched for {symbol} {interval}, they will be retried on the next sync")
+    logging.info(f"Stored {added} new candles for {symbol} {interval}")
+    return added
\ No newline at end of file
@@ -0,0 +1,764 @@
+import base64
+import hashlib
+import json
+import logging
+import math
+import random
+import socket
+import struct
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from services.kucoin_services import KLINE_INTERVALS, KLINE_BATCH_SIZE
+
+DEFAULT_MOCK_PORT = 8765
+MOCK_TOKEN = "mock-public-token"
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+DEFAULT_MOCK_SYMBOLS = ["BTC-USDT", "ETH-USDT", "ETH-BTC", "SOL-USDT", "SOL-BTC", "SOL-ETH",
+                        "XRP-USDT", "XRP-BTC", "KCS-USDT", "KCS-BTC", "KCS-ETH"]
+DEFAULT_MOCK_FUTURES_SYMBOLS = ["XBTUSDTM", "ETHUSDTM", "SOLUSDTM"]
+# Reference prices in USDT, currencies not listed here get a random one
+CURRENCY_PRICES = {"USDT": 1.0, "BTC": 60000.0, "ETH": 3000.0, "SOL": 150.0, "XRP": 0.6, "KCS": 10.0}
+# Futures contracts use their own code for some base currencies
+FUTURES_CURRENCY_ALIASES = {"XBT": "BTC"}
+
+# Price model : each currency follows a mean-reverting random walk in USDT, and each quote adds its own noise around
+# the cross rate, so triangles are mostly closed with occasional opportunities
+PRICE_VOLATILITY = 0.00002
+MEAN_REVERSION = 0.001
+CROSS_RATE_NOISE = 0.0005
+SPREAD = 0.0002
+FUTURES_BASIS = 0.0005
+# Funding of the perpetual contracts, per FUNDING_INTERVAL milliseconds
+FUNDING_FEE_RATE = 0.0001
+FUNDING_INTERVAL = 8 * 3600 * 1000
+ORDER_BOOK_TICK = 0.0001
+
+# The streamer sends the messages due every STREAM_INTERVAL seconds, in one write per connection,
+# and never catches up more than MAX_STREAM_BURST seconds of messages after a stall
+STREAM_INTERVAL = 0.005
+MAX_STREAM_BURST = 0.1
+PING_INTERVAL = 18000
+PING_TIMEOUT = 10000
+
+
+def generate_symbols(count: int, quote_currencies: tuple = ("USDT", "BTC", "ETH")) -> list:
+    """
+    Generates the symbols of `count` synthetic currencies, each traded against every quote currency,
+    to load test the bot with a market as large as the real one.
+    """
+    symbols = []
+    for quote_currency in quote_currencies[1:]:
+        symbols.append(f"{quote_currency}-{quote_currencies[0]}")
+    for index in range(count):
+        symbols.extend(f"C{index:04d}-{quote_currency}" for quote_currency in quote_currencies)
+    return symbols
+
+
+class MockMarket:
+    """
+    Synthetic market state behind the mock server : symbols, prices, sequences and announcements.
+    Prices only move when the streamer ticks a symbol, so the REST endpoints return the last streamed quotes.
+
+    Args:
+        symbols (list): Spot trading pair symbols.
+        futures_symbols (list): Futures contract symbols (e.g., 'XBTUSDTM').
+        seed (int): Seed of the random generator, for reproducible streams.
+    """
+    def __init__(self, symbols: list = None, futures_symbols: list = None, seed: int = None):
+        self.random = random.Random(seed)
+        self.spot_symbols = []
+        self.futures_symbols = list(futures_symbols if futures_symbols is not None else DEFAULT_MOCK_FUTURES_SYMBOLS)
+        self.currency_prices = dict(CURRENCY_PRICES)
+        self.reference_prices = dict(CURRENCY_PRICES)
+        self.sequences = {}
+        self.l2_sequences = {}
+        self.last_quotes = {}
+        self.announcements = []
+        for symbol in symbols if symbols is not None else DEFAULT_MOCK_SYMBOLS:
+            self.add_symbol(symbol)
+        for symbol in self.futures_symbols:
+            self.sequences[symbol] = 1
+            self.last_quotes[symbol] = self._quote(symbol)
+
+    def add_symbol(self, symbol: str) -> None:
+        if symbol in self.sequences:
+            return
+        for currency in symbol.split("-"):
+            if currency not in self.currency_prices:
+                self.currency_prices[currency] = self.reference_prices[currency] = 10 ** self.random.uniform(-2, 3)
+        self.spot_symbols.append(symbol)
+        self.sequences[symbol] = 1
+        self.l2_sequences[symbol] = 1
+        self.last_quotes[symbol] = self._quote(symbol)
+
+    def list_symbol(self, symbol: str) -> None:
+        """
+        Lists a new spot symbol, and publishes its new listing announcement.
+        """
+        self.add_symbol(symbol)
+        base_currency = symbol.split("-")[0]
+        self.announcements.insert(0, {
+            "annId": len(self.announcements) + 1,
+            "annTitle": f"KuCoin Gets {base_currency} ({base_currency}) Listed!",
+            "annType": ["latest-announcements", "new-listings"],
+            "annDesc": f"Trading: {symbol}",
+            "cTime": int(time.time() * 1000),
+            "language": "en_US",
+            "annUrl": f"https://www.kucoin.com/announcement/{base_currency.lower()}-listed",
+        })
+        logging.info(f"[MOCK] Listed {symbol}")
+
+    def market_of(self, symbol: str) -> str:
+        quote_currency = symbol.split("-")[1]
+        return "USDS" if quote_currency == "USDT" else quote_currency
+
+    def base_quote(self, symbol: str):
+        if "-" in symbol:
+            return symbol.split("-")
+        # Linear futures contracts : <base>USDTM
+        base_currency = symbol[:-5]
+        return FUTURES_CURRENCY_ALIASES.get(base_currency, base_currency), "USDT"
+
+    def _mid_price(self, symbol: str, prices: dict = None) -> float:
+        prices = prices if prices is not None else self.currency_prices
+        base_currency, quote_currency = self.base_quote(symbol)
+        mid_price = prices.get(base_currency, 1.0) / prices.get(quote_currency, 1.0)
+        if "-" not in symbol:
+            mid_price *= 1 + FUTURES_BASIS
+        return mid_price
+
+    def _quote(self, symbol: str):
+        mid_price = self._mid_price(symbol) * (1 + self.random.gauss(0, CROSS_RATE_NOISE))
+        return (mid_price * (1 - SPREAD / 2), mid_price * (1 + SPREAD / 2),
+                round(self.random.uniform(0.1, 10), 4), round(self.random.uniform(0.1, 10), 4))
+
+    def tick(self, symbol: str):
+        """
+        Moves the market and returns the new quote of a symbol.
+
+        Returns:
+            tuple: (bid, ask, bid_size, ask_size, sequence).
+        """
+        base_currency, _ = self.base_quote(symbol)
+        if base_currency in self.currency_prices:
+            price = self.currency_prices[base_currency] * (1 + self.random.gauss(0, PRICE_VOLATILITY))
+            self.currency_prices[base_currency] = price + (self.reference_prices[base_currency] - price) * MEAN_REVERSION
+        self.sequences[symbol] += 1
+        quote = self._quote(symbol)
+        self.last_quotes[symbol] = quote
+        return quote + (self.sequences[symbol],)
+
+    def l2_change(self, symbol: str):
+        """
+        Returns the next level-2 change of a symbol : one level set to a new size (or removed).
+        Levels sit on a fixed grid around the reference price, so the book never crosses.
+
+        Returns:
+            tuple: (is_ask, price, size, sequence).
+        """
+        self.l2_sequences[symbol] += 1
+        is_ask = self.random.random() < 0.5
+        level = self.random.randint(1, 20)
+        mid_price = self._mid_price(symbol, self.reference_prices)
+        price = mid_price * (1 + level * ORDER_BOOK_TICK) if is_ask else mid_price * (1 - level * ORDER_BOOK_TICK)
+        size = 0.0 if self.random.random() < 0.2 else round(self.random.uniform(0.1, 10), 4)
+        return is_ask, price, size, self.l2_sequences[symbol]
+
+    def order_book(self, symbol: str, depth: int):
+        """
+        Returns a synthetic snapshot at the current level-2 sequence.
+        Sizes are drawn again, only the price grid and the sequence numbers are consistent with the increments.
+        """
+        mid_price = self._mid_price(symbol, self.reference_prices)
+        bids = [[format_price(mid_price * (1 - level * ORDER_BOOK_TICK)), str(round(self.random.uniform(0.1, 10), 4))] for level in range(1, depth + 1)]
+        asks = [[format_price(mid_price * (1 + level * ORDER_BOOK_TICK)), str(round(self.random.uniform(0.1, 10), 4))] for level in range(1, depth + 1)]
+        return self.l2_sequences[symbol], bids, asks
+
+    def klines(self, symbol: str, interval: str, start_at: int, end_at: int) -> list:
+        """
+        Returns deterministic candles starting in [start_at, end_at), newest first, like the klines endpoint.
+        The same candle is always returned for the same symbol, interval and time.
+        """
+        step = int(KLINE_INTERVALS[interval].total_seconds())
+        end_at = min(end_at, int(time.time()) + 1)
+        first_time = -(-start_at // step) * step
+        # Like the real endpoint, a window longer than a batch returns its newest candles
+        times = range(first_time, end_at, step)[-KLINE_BATCH_SIZE:]
+        reference_price = self._mid_price(symbol, self.reference_prices)
+        phase = int.from_bytes(hashlib.md5(symbol.encode()).digest()[:4], "little") / 2 ** 32 * 2 * math.pi
+
+        def price_at(t):
+            return reference_price * math.exp(0.1 * math.sin(t / (86400 * 30) + phase) + 0.01 * math.sin(t / 3600 + phase))
+
+        rows = []
+        for candle_time in reversed(times):
+            candle_random = random.Random(f"{symbol}/{interval}/{candle_time}")
+            open_price = price_at(candle_time)
+            close_price = price_at(candle_time + step)
+            high_price = max(open_price, close_price) * (1 + candle_random.uniform(0, 0.002))
+            low_price = min(open_price, close_price) * (1 - candle_random.uniform(0, 0.002))
+            volume = candle_random.uniform(1, 1000) * step / 60
+            rows.append([str(candle_time), format_price(open_price), format_price(close_price), format_price(high_price),
+                         format_price(low_price), f"{volume:.4f}", f"{volume * close_price:.4f}"])
+        return rows
+
+
+def format_price(price: float) -> str:
+    return f"{price:.10g}"
+
+
+def encode_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    """
+    Encodes a final, unmasked WebSocket frame (server to client frames are never masked).
+    """
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def read_frame(rfile):
+    """
+    Reads one WebSocket frame sent by a client.
+
+    Returns:
+        tuple: (fin, opcode, payload), or None if the connection was closed.
+    """
+    header = rfile.read(2)
+    if len(header) < 2:
+        return None
+    fin = bool(header[0] & 0x80)
+    opcode = header[0] & 0x0F
+    masked = header[1] & 0x80
+    length = header[1] & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", rfile.read(8))[0]
+    mask = rfile.read(4) if masked else None
+    payload = rfile.read(length)
+    if len(payload) < length:
+        return None
+    if mask and length:
+        # Unmask the whole payload with a single integer XOR
+        key = (mask * (length // 4 + 1))[:length]
+        payload = (int.from_bytes(payload, "little") ^ int.from_bytes(key, "little")).to_bytes(length, "little")
+    return fin, opcode, payload
+
+
+class WebSocketSession:
+    """
+    One client WebSocket connection : its subscriptions and the messages waiting for their injected latency.
+    Writes come from the request thread (acks, pongs) and the streamer thread, so they go through a lock.
+    """
+    def __init__(self, connection: socket.socket, connect_id: str):
+        self.connection = connection
+        self.connect_id = connect_id
+        self.subscriptions = []
+        # Subscribed to the private order events
+        self.order_events = False
+        self.pending = deque()
+        self.stream_start = time.monotonic()
+        self.generated = 0
+        self.sent = 0
+        self.closed = False
+        self._send_lock = threading.Lock()
+
+    def send(self, data: bytes) -> bool:
+        with self._send_lock:
+            if self.closed:
+                return False
+            try:
+                self.connection.sendall(data)
+                return True
+            except OSError:
+                self.closed = True
+                return False
+
+    def send_json(self, message: dict) -> bool:
+        return self.send(encode_frame(json.dumps(message, separators=(",", ":")).encode()))
+
+    def close(self) -> None:
+        with self._send_lock:
+            if self.closed:
+                return
+            self.closed = True
+            try:
+                self.connection.sendall(encode_frame(b"", 0x8))
+                self.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class MockKucoinServer:
+    """
+    Local stand-in for the KuCoin public REST and WebSocket APIs, to load test the bot without the exchange.
+    Serves the klines, currencies, symbols, ticker, order book, announcements and bullet-public endpoints,
+    and streams synthetic ticker, futures ticker and level-2 messages to the WebSocket subscribers,
+    `rate` messages per second per connection. REST and WebSocket share the same port.
+    Spot HF orders are filled at once against the last quote (unlimited balances, no authentication), and their
+    events are pushed to the private order channel subscribers, to test the execution engine.
+
+    Point the clients at it with KUCOINBOT_SPOT_ENDPOINT and KUCOINBOT_FUTURES_ENDPOINT (see services.config).
+
+    Args:
+        host (str): Interface to listen on.
+        port (int): Port to listen on, 0 for a free one.
+        market (MockMarket): The synthetic market, a default one if None.
+        rate (float): Messages per second streamed to each connection.
+        rest_latency (float): Seconds added before every REST response.
+        ws_latency (float): Seconds between the exchange timestamp of a message and its sending.
+        error_rate (float): Probability of a REST request failing with a rate limit error (HTTP 429),
+                            and of a subscription being rejected.
+        disconnect_interval (float): If set, a random WebSocket connection is dropped every disconnect_interval seconds.
+        partial_fill_rate (float): Probability of an order being only partially filled, the rest being canceled.
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = DEFAULT_MOCK_PORT, market: MockMarket = None, rate: float = 1000,
+                 rest_latency: float = 0.0, ws_latency: float = 0.0, error_rate: float = 0.0, disconnect_interval: float = None,
+                 partial_fill_rate: float = 0.0):
+        self.market = market if market is not None else MockMarket()
+        self.rate = rate
+        self.rest_latency = rest_latency
+        self.ws_latency = ws_latency
+        self.error_rate = error_rate
+        self.disconnect_interval = disconnect_interval
+        self.partial_fill_rate = partial_fill_rate
+        self.orders = {}
+        self.random = random.Random()
+        self.sessions = set()
+        self._sessions_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.stats = {"rest_requests": 0, "rest_errors": 0, "ws_connections": 0, "ws_messages": 0, "ws_disconnects": 0, "orders": 0}
+        self._stopped = threading.Event()
+
+        self.http_server = ThreadingHTTPServer((host, port), _make_request_handler(self))
+        self.http_server.daemon_threads = True
+        self.host, self.port = self.http_server.server_address[:2]
+        self._threads = []
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> None:
+        """
+        Starts serving and streaming on background threads.
+        """
+        for target, name in ((self.http_server.serve_forever, "mock-http"), (self._stream, "mock-stream")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logging.info(f"[MOCK] KuCoin mock server listening on {self.endpoint} ({len(self.market.spot_symbols)} spot symbols, "
+                     f"{len(self.market.futures_symbols)} futures symbols, {self.rate:.0f} messages/s per connection)")
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.http_server.shutdown()
+        self.http_server.server_close()
+        with self._sessions_lock:
+            sessions = list(self.sessions)
+        for session in sessions:
+            session.close()
+
+    def count(self, stat: str, value: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[stat] += value
+
+    # REST
+
+    def handle_rest(self, method: str, path: str, query: dict, body: dict = None):
+        """
+        Returns (HTTP status, response body) for a REST request. The fields of a JSON body are merged into the query.
+        """
+        if body:
+            query = {**query, **body}
+        self.count("rest_requests")
+        if self.rest_latency:
+            time.sleep(self.rest_latency)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.count("rest_errors")
+            return 429, {"code": "429000", "msg": "Too Many Requests"}
+
+        route = REST_ROUTES.get((method, path))
+        if route is None and path.startswith("/api/v1/market/orderbook/level2_"):
+            route = MockKucoinServer._order_book
+        if route is None and method == "GET" and path.startswith("/api/v1/hf/orders/client-order/"):
+            route = MockKucoinServer._order_by_client_oid
+        if route is None:
+            return 404, {"code": "404000", "msg": f"Url Not Found: {path}"}
+        try:
+            return 200, {"code": "200000", "data": route(self, path, query)}
+        except (KeyError, ValueError) as e:
+            return 400, {"code": "400100", "msg": f"Invalid parameter: {e}"}
+
+    def _bullet_public(self, path, query):
+        return {"token": MOCK_TOKEN, "instanceServers": [{"endpoint": f"ws://{self.host}:{self.port}/ws", "encrypt": False,
+                                                          "protocol": "websocket", "pingInterval": PING_INTERVAL, "pingTimeout": PING_TIMEOUT}]}
+
+    def _klines(self, path, query):
+        symbol = query["symbol"]
+        if symbol not in self.market.sequences:
+            return []
+        start_at = int(query.get("startAt", 0))
+        end_at = int(query.get("endAt", 0)) or int(time.time())
+        return self.market.klines(symbol, query["type"], start_at, end_at)
+
+    def _currencies(self, path, query):
+        currencies = sorted({currency for symbol in self.market.spot_symbols for currency in symbol.split("-")})
+        return [{"currency": currency, "name": currency, "fullName": currency, "precision": 8, "confirms": None, "contractAddress": None,
+                 "isMarginEnabled": False, "isDebitEnabled": False, "chains": []} for currency in currencies]
+
+    def _symbols(self, path, query):
+        symbols = []
+        for symbol in self.market.spot_symbols:
+            base_currency, quote_currency = symbol.split("-")
+            price_increment = 10 ** math.floor(math.log10(self.market.last_quotes[symbol][0]) - 5)
+            symbols.append({
+                "symbol": symbol, "name": symbol, "baseCurrency": base_currency, "quoteCurrency": quote_currency,
+                "feeCurrency": quote_currency, "market": self.market.market_of(symbol),
+                "baseMinSize": "0.0001", "quoteMinSize": "0.1", "baseMaxSize": "10000000000", "quoteMaxSize": "99999999",
+                "baseIncrement": "0.0001", "quoteIncrement": "0.000001", "priceIncrement": format_price(price_increment),
+                "priceLimitRate": "0.1", "minFunds": "0.1", "isMarginEnabled": False, "enableTrading": True,
+                "feeCategory": 1, "makerFeeCoefficient": "1.00", "takerFeeCoefficient": "1.00", "st": False,
+            })
+        market = query.get("market")
+        return [symbol for symbol in symbols if market is None or symbol["market"] == market]
+
+    def _ticker(self, path, query):
+        symbol = query["symbol"]
+        bid, ask, bid_size, ask_size = self.market.last_quotes[symbol]
+        return {"time": int(time.time() * 1000), "sequence": str(self.market.sequences[symbol]), "price": format_price(bid),
+                "size": "0.01", "bestBid": format_price(bid), "bestBidSize": str(bid_size), "bestAsk": format_price(ask), "bestAskSize": str(ask_size)}
+
+    def _all_tickers(self, path, query):
+        tickers = []
+        for symbol in self.market.spot_symbols:
+            bid, ask, bid_size, ask_size = self.market.last_quotes[symbol]
+            tickers.append({"symbol": symbol, "symbolName": symbol, "buy": format_price(bid), "bestBidSize": str(bid_size),
+                            "sell": format_price(ask), "bestAskSize": str(ask_size), "changeRate": "0", "changePrice": "0",
+                            "high": format_price(ask), "low": format_price(bid), "vol": "0", "volValue": "0", "last": format_price(bid),
+                            "averagePrice": format_price(bid), "takerFeeRate": "0.001", "makerFeeRate": "0.001",
+                            "takerCoefficient": "1", "makerCoefficient": "1"})
+        return {"time": int(time.time() * 1000), "ticker": tickers}
+
+    def _contracts(self, path, query):
+        contracts = []
+        now = int(time.time() * 1000)
+        for symbol in self.market.futures_symbols:
+            base_currency = symbol[:-5]
+            bid, ask = self.market.last_quotes[symbol][:2]
+            contracts.append({
+                "symbol": symbol, "rootSymbol": "USDT", "type": "FFWCSX", "firstOpenDate": 1585555200000, "expireDate": None,
+                "settleDate": None, "baseCurrency": base_currency, "quoteCurrency": "USDT", "settleCurrency": "USDT",
+                "maxOrderQty": 1000000, "maxPrice": 1000000.0, "lotSize": 1, "tickSize": 0.1, "indexPriceTickSize": 0.01,
+                "multiplier": 0.001, "initialMargin": 0.008, "maintainMargin": 0.004, "maxRiskLimit": 100000, "minRiskLimit": 100000,
+                "riskStep": 50000, "makerFeeRate": 0.0002, "takerFeeRate": 0.0006, "takerFixFee": 0.0, "makerFixFee": 0.0,
+                "isDeleverage": True, "isQuanto": False, "isInverse": False, "markMethod": "FairPrice", "fairMethod": "FundingRate",
+                "fundingBaseSymbol": f".{base_currency}INT8H", "fundingQuoteSymbol": ".USDTINT8H", "fundingRateSymbol": f".{symbol}FPI8H",
+                "indexSymbol": f".K{base_currency}USDT", "settlementSymbol": "", "status": "Open",
+                "fundingFeeRate": FUNDING_FEE_RATE, "predictedFundingFeeRate": FUNDING_FEE_RATE, "fundingRateGranularity": FUNDING_INTERVAL,
+                "nextFundingRateTime": FUNDING_INTERVAL - now % FUNDING_INTERVAL, "openInterest": "0", "turnoverOf24h": 0.0,
+                "volumeOf24h": 0.0, "markPrice": (bid + ask) / 2, "indexPrice": (bid + ask) / 2, "lastTradePrice": bid, "maxLeverage": 125,
+                "sourceExchanges": [], "lowPrice": bid, "highPrice": ask, "priceChgPct": 0.0, "priceChg": 0.0, "supportCross": True,
+            })
+        return contracts
+
+    def _order_book(self, path, query):
+        depth = 100 if path.endswith("level2") else int(path.rsplit("_", 1)[1])
+        sequence, bids, asks = self.market.order_book(query["symbol"], depth)
+        return {"time": int(time.time() * 1000), "sequence": str(sequence), "bids": bids, "asks": asks}
+
+    def _announcements(self, path, query):
+        announcements = self.market.announcements
+        announcement_type = query.get("annType")
+        if announcement_type:
+            announcements = [announcement for announcement in announcements if announcement_type in announcement["annType"]]
+        page = int(query.get("currentPage", 1))
+        page_size = int(query.get("pageSize", 50))
+        return {"totalNum": len(announcements), "items": announcements[(page - 1) * page_size:page * page_size],
+                "currentPage": page, "pageSize": page_size, "totalPage": max(1, math.ceil(len(announcements) / page_size))}
+
+    def _server_time(self, path, query):
+        return int(time.time() * 1000)
+
+    def _add_order(self, path, query):
+        symbol = query["symbol"]
+        if symbol not in self.market.spot_symbols:
+            raise ValueError(f"unknown symbol {symbol}")
+        side = query["side"]
+        if side not in ("buy", "sell"):
+            raise ValueError(f"invalid side {side}")
+        order_type = query.get("type", "limit")
+        bid, ask = self.market.last_quotes[symbol][:2]
+        price = ask if side == "buy" else bid
+        if "funds" in query and side == "buy":
+            size = float(query["funds"]) / price
+        else:
+            size = float(query["size"])
+        # A limit order fills only if it crosses the spread, and never rests in the book
+        if order_type == "limit" and (side == "buy" and float(query["price"]) < ask or side == "sell" and float(query["price"]) > bid):
+            fill_ratio = 0.0
+        elif self.partial_fill_rate and self.random.random() < self.partial_fill_rate:
+            fill_ratio = self.random.uniform(0.1, 0.9)
+        else:
+            fill_ratio = 1.0
+
+        self.count("orders")
+        now = int(time.time() * 1000)
+        filled_size = size * fill_ratio
+        order = {"id": uuid.uuid4().hex[:24], "clientOid": query.get("clientOid") or uuid.uuid4().hex, "symbol": symbol, "side": side,
+                 "type": order_type, "size": format_price(size), "funds": query.get("funds"), "price": format_price(price),
+                 "dealSize": format_price(filled_size), "dealFunds": format_price(filled_size * price), "active": False,
+                 "cancelledSize": format_price(size - filled_size), "createdAt": now, "lastUpdatedAt": now}
+        self.orders[order["clientOid"]] = order
+        self._push_order_events(order, size, filled_size, price, now)
+        return {"orderId": order["id"], "clientOid": order["clientOid"]}
+
+    def _push_order_events(self, order: dict, size: float, filled_size: float, price: float, now: int) -> None:
+        base_event = {"symbol": order["symbol"], "side": order["side"], "orderType": order["type"], "orderId": order["id"],
+                      "clientOid": order["clientOid"], "orderTime": now, "originSize": order["size"], "size": order["size"], "price": order["price"]}
+        events = [{**base_event, "type": "received", "status": "new", "filledSize": "0", "remainSize": order["size"], "ts": now * 1_000_000}]
+        if filled_size > 0:
+            events.append({**base_event, "type": "match", "status": "match", "matchPrice": format_price(price), "matchSize": format_price(filled_size),
+                           "tradeId": uuid.uuid4().hex[:16], "liquidity": "taker", "filledSize": format_price(filled_size),
+                           "remainSize": format_price(size - filled_size), "ts": now * 1_000_000 + 1})
+        done_type = "filled" if filled_size >= size else "canceled"
+        events.append({**base_event, "type": done_type, "status": "done", "filledSize": format_price(filled_size), "remainSize": "0",
+                       "canceledSize": format_price(size - filled_size), "ts": now * 1_000_000 + 2})
+
+        with self._sessions_lock:
+            sessions = [session for session in self.sessions if session.order_events]
+        for session in sessions:
+            for event in events:
+                session.send_json({"type": "message", "topic": "/spotMarket/tradeOrdersV2", "subject": "orderChange",
+                                   "channelType": "private", "data": event})
+
+    def _order_by_client_oid(self, path, query):
+        return self.orders[path.rsplit("/", 1)[1]]
+
+    # WebSocket
+
+    def handle_websocket_message(self, session: WebSocketSession, message: dict) -> None:
+        message_type = message.get("type")
+        message_id = message.get("id")
+        if message_type == "ping":
+            session.send_json({"id": message_id, "type": "pong", "timestamp": int(time.time() * 1e6)})
+        elif message_type in ("subscribe", "unsubscribe"):
+            if message_type == "subscribe" and self.error_rate and self.random.random() < self.error_rate:
+                session.send_json({"id": message_id, "type": "error", "code": 509, "data": "exceed max subscription count limitation"})
+                return
+            prefix, _, arguments = message.get("topic", "").partition(":")
+            subscriptions = []
+            for argument in arguments.split(","):
+                if prefix == "/market/ticker" and argument == "all":
+                    subscriptions.extend(("all", symbol) for symbol in self.market.spot_symbols)
+                elif prefix == "/market/ticker" and argument in self.market.sequences:
+                    subscriptions.append(("ticker", argument))
+                elif prefix == "/contractMarket/tickerV2" and argument in self.market.sequences:
+                    subscriptions.append(("futures", argument))
+                elif prefix == "/market/level2" and argument in self.market.l2_sequences:
+                    subscriptions.append(("l2", argument))
+                elif prefix == "/market/snapshot":
+                    # Resolved to a symbol of the market when sent, so symbols listed later are included
+                    subscriptions.append(("snapshot", argument))
+            if prefix == "/spotMarket/tradeOrdersV2":
+                # Private events are pushed by the order endpoint, never streamed
+                session.order_events = message_type == "subscribe"
+            if message_type == "subscribe":
+                if not session.subscriptions:
+                    session.stream_start = time.monotonic()
+                    session.generated = 0
+                session.subscriptions = session.subscriptions + subscriptions
+            else:
+                session.subscriptions = [subscription for subscription in session.subscriptions if subscription not in subscriptions]
+            if message.get("response"):
+                session.send_json({"id": message_id, "type": "ack"})
+
+    def build_message(self, kind: str, symbol: str, now_ms: int) -> bytes:
+        if kind == "snapshot":
+            market = symbol
+            symbols = [symbol for symbol in self.market.spot_symbols if self.market.market_of(symbol) == market]
+            if not symbols:
+                return b'{"type":"message","topic":"/market/snapshot:%s","subject":"trade.snapshot","data":{"sequence":"0","data":null}}' % market.encode()
+            symbol = self.random.choice(symbols)
+            base_currency, quote_currency = symbol.split("-")
+            bid, ask, bid_size, ask_size, sequence = self.market.tick(symbol)
+            return (f'{{"type":"message","topic":"/market/snapshot:{market}","subject":"trade.snapshot","data":{{"sequence":"{sequence}","data":{{'
+                    f'"symbol":"{symbol}","symbolCode":"{symbol}","baseCurrency":"{base_currency}","quoteCurrency":"{quote_currency}",'
+                    f'"market":"{market}","markets":["{market}"],"trading":true,"buy":{format_price(bid)},"sell":{format_price(ask)},'
+                    f'"lastTradedPrice":{format_price(bid)},"bidSize":{bid_size},"askSize":{ask_size},"datetime":{now_ms}}}}}}}').encode()
+
+        if kind == "l2":
+            is_ask, price, size, sequence = self.market.l2_change(symbol)
+            change = f'[["{format_price(price)}","{size}","{sequence}"]]'
+            return (f'{{"type":"message","topic":"/market/level2:{symbol}","subject":"trade.l2update","data":{{"changes":{{"asks":{change if is_ask else "[]"},'
+                    f'"bids":{"[]" if is_ask else change}}},"sequenceEnd":{sequence},"sequenceStart":{sequence},"symbol":"{symbol}","time":{now_ms}}}}}').encode()
+
+        bid, ask, bid_size, ask_size, sequence = self.market.tick(symbol)
+        if kind == "futures":
+            return (f'{{"type":"message","topic":"/contractMarket/tickerV2:{symbol}","subject":"tickerV2","data":{{"symbol":"{symbol}","sequence":{sequence},'
+                    f'"bestBidSize":{int(bid_size * 100)},"bestBidPrice":"{format_price(bid)}","bestAskPrice":"{format_price(ask)}",'
+                    f'"bestAskSize":{int(ask_size * 100)},"ts":{now_ms * 1_000_000}}}}}').encode()
+        topic, subject = ("/market/ticker:all", symbol) if kind == "all" else (f"/market/ticker:{symbol}", "trade.ticker")
+        return (f'{{"type":"message","topic":"{topic}","subject":"{subject}","data":{{"sequence":"{sequence}","price":"{format_price(bid)}",'
+                f'"size":"0.01","bestAsk":"{format_price(ask)}","bestAskSize":"{ask_size}","bestBid":"{format_price(bid)}",'
+                f'"bestBidSize":"{bid_size}","time":{now_ms}}}}}').encode()
+
+    def _stream(self) -> None:
+        """
+        Streamer thread : generates the messages due on each connection, holds them for the injected latency,
+        then sends them in a single write.
+        """
+        next_disconnect = time.monotonic() + self.disconnect_interval if self.disconnect_interval else None
+        while not self._stopped.is_set():
+            now = time.monotonic()
+            with self._sessions_lock:
+                sessions = list(self.sessions)
+
+            if next_disconnect is not None and now >= next_disconnect:
+                next_disconnect = now + self.disconnect_interval
+                if sessions:
+                    session = self.random.choice(sessions)
+                    logging.info(f"[MOCK] Dropping WebSocket connection {session.connect_id}")
+                    self.count("ws_disconnects")
+                    session.close()
+
+            for session in sessions:
+                subscriptions = session.subscriptions
+                if session.closed or not subscriptions:
+                    continue
+                due = int(self.rate * (now - session.stream_start)) - session.generated
+                max_burst = max(1, int(self.rate * MAX_STREAM_BURST))
+                if due > max_burst:
+                    session.generated += due - max_burst
+                    due = max_burst
+                if due > 0:
+                    now_ms = int(time.time() * 1000)
+                    frames = [encode_frame(self.build_message(*self.random.choice(subscriptions), now_ms)) for _ in range(due)]
+                    session.generated += due
+                    session.pending.append((now + self.ws_latency, due, b"".join(frames)))
+
+                while session.pending and session.pending[0][0] <= now:
+                    _, messages, data = session.pending.popleft()
+                    if session.send(data):
+                        session.sent += messages
+                        self.count("ws_messages", messages)
+
+            time.sleep(STREAM_INTERVAL)
+
+
+REST_ROUTES = {
+    ("POST", "/api/v1/bullet-public"): MockKucoinServer._bullet_public,
+    ("POST", "/api/v1/bullet-private"): MockKucoinServer._bullet_public,
+    ("POST", "/api/v1/hf/orders"): MockKucoinServer._add_order,
+    ("GET", "/api/v1/market/candles"): MockKucoinServer._klines,
+    ("GET", "/api/v3/currencies"): MockKucoinServer._currencies,
+    ("GET", "/api/v2/symbols"): MockKucoinServer._symbols,
+    ("GET", "/api/v1/market/orderbook/level1"): MockKucoinServer._ticker,
+    ("GET", "/api/v1/market/allTickers"): MockKucoinServer._all_tickers,
+    ("GET", "/api/v1/contracts/active"): MockKucoinServer._contracts,
+    ("GET", "/api/v3/market/orderbook/level2"): MockKucoinServer._order_book,
+    ("GET", "/api/v3/announcements"): MockKucoinServer._announcements,
+    ("GET", "/api/v1/timestamp"): MockKucoinServer._server_time,
+}
+
+
+def _make_request_handler(mock_server: MockKucoinServer):
+    class MockRequestHandler(BaseHTTPRequestHandler):
+        # Keep-alive, the SDK reuses its connections
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes, which Nagle's algorithm would hold for the delayed ACK of the client
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            logging.debug("[MOCK] " + format % args)
+
+        def _respond(self):
+            url = urlparse(self.path)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            content_length = int(self.headers.get("Content-Length") or 0)
+            request_body = None
+            if content_length:
+                try:
+                    request_body = json.loads(self.rfile.read(content_length))
+                except json.JSONDecodeError:
+                    pass
+            status, body = mock_server.handle_rest(self.command, url.path, query, request_body if isinstance(request_body, dict) else None)
+            payload = json.dumps(body, separators=(",", ":")).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.headers.get("Upgrade", "").lower() == "websocket":
+                self._serve_websocket()
+            else:
+                self._respond()
+
+        def do_POST(self):
+            self._respond()
+
+        def do_DELETE(self):
+            self._respond()
+
+        def _serve_websocket(self):
+            query = {key: values[-1] for key, values in parse_qs(urlparse(self.path).query).items()}
+            if query.get("token") != MOCK_TOKEN:
+                self.send_error(401, "Invalid token")
+                return
+
+            accept = base64.b64encode(hashlib.sha1((self.headers["Sec-WebSocket-Key"] + WEBSOCKET_GUID).encode()).digest()).decode()
+            self.send_response(101, "Switching Protocols")
+            self.send_header("Upgrade", "websocket")
+            self.send_header("Connection", "Upgrade")
+            self.send_header("Sec-WebSocket-Accept", accept)
+            self.end_headers()
+            self.close_connection = True
+
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            session = WebSocketSession(self.connection, query.get("connectId", ""))
+            with mock_server._sessions_lock:
+                mock_server.sessions.add(session)
+            mock_server.count("ws_connections")
+            session.send_json({"id": session.connect_id, "type": "welcome"})
+
+            fragments = []
+            try:
+                while not session.closed:
+                    frame = read_frame(self.rfile)
+                    if frame is None:
+                        break
+                    fin, opcode, payload = frame
+                    if opcode == 0x8:
+                        break
+                    if opcode == 0x9:
+                        session.send(encode_frame(payload, 0xA))
+                        continue
+                    if opcode in (0x0, 0x1):
+                        fragments.append(payload)
+                        if fin:
+                            message = b"".join(fragments)
+                            fragments = []
+                            try:
+                                mock_server.handle_websocket_message(session, json.loads(message))
+                            except json.JSONDecodeError:
+                                logging.warning(f"[MOCK] Invalid WebSocket message: {message[:100]}")
+            except OSError:
+                pass
+            finally:
+                with mock_server._sessions_lock:
+                    mock_server.sessions.discard(session)
+                session.close()
+
+    return MockRequestHandler
@@ -0,0 +1,355 @@
+import bisect
+import logging
+import threading
+from typing import TYPE_CHECKING
+from services.rest_client import submit_rest
+
+# The SDK is imported on first use, see services.config
+if TYPE_CHECKING:
+    from kucoin_universal_sdk.generate.spot.market.api_market import MarketAPI
+    from kucoin_universal_sdk.generate.spot.spot_public.model_orderbook_increment_event import OrderbookIncrementEvent
+
+L2_TOPIC_PREFIX = "/market/level2:"
+# Updates buffered while waiting for a snapshot, older ones are dropped (and cause a new resync)
+MAX_PENDING_EVENTS = 10000
+SNAPSHOT_RETRY_DELAY = 1
+
+
+class BookSide:
+    """
+    One side of an order book : sizes by price, plus the prices kept sorted from the best to the worst.
+    Bids are sorted on their negated price so both sides are walked in ascending key order.
+    """
+    __slots__ = ("is_bid", "sizes", "keys")
+
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self.sizes = {}
+        self.keys = []
+
+    def clear(self):
+        self.sizes.clear()
+        self.keys.clear()
+
+    def set(self, price: float, size: float) -> None:
+        """
+        Sets the size of a price level, a size of 0 removes the level.
+        """
+        key = -price if self.is_bid else price
+        if size == 0:
+            if self.sizes.pop(key, None) is not None:
+                del self.keys[bisect.bisect_left(self.keys, key)]
+            return
+        if key not in self.sizes:
+            bisect.insort(self.keys, key)
+        self.sizes[key] = size
+
+    def best(self):
+        """
+        Returns the best (price, size), or None if the side is empty.
+        """
+        if not self.keys:
+            return None
+        key = self.keys[0]
+        return (-key if self.is_bid else key), self.sizes[key]
+
+    def levels(self, depth: int = None):
+        keys = self.keys if depth is None else self.keys[:depth]
+        return [((-key if self.is_bid else key), self.sizes[key]) for key in keys]
+
+    def walk_base(self, quantity: float):
+        """
+        Consumes levels from the best price until `quantity` of base currency is filled.
+
+        Returns:
+            tuple: (filled base quantity, quote amount exchanged).
+        """
+        filled = 0.0
+        quote_amount = 0.0
+        for key in self.keys:
+            price = -key if self.is_bid else key
+            take = min(self.sizes[key], quantity - filled)
+            filled += take
+            quote_amount += take * price
+            if filled >= quantity:
+                break
+        return filled, quote_amount
+
+    def walk_quote(self, quote_amount: float):
+        """
+        Consumes levels from the best price until `quote_amount` of quote currency is exchanged.
+
+        Returns:
+            tuple: (base quantity exchanged, quote amount filled).
+        """
+        base_quantity = 0.0
+        filled = 0.0
+        for key in self.keys:
+            price = -key if self.is_bid else key
+            take = min(self.sizes[key] * price, quote_amount - filled)
+            filled += take
+            base_quantity += take / price
+            if filled >= quote_amount:
+                break
+        return base_quantity, filled
+
+
+class OrderBook:
+    """
+    Local level-2 order book of a symbol, maintained from KuCoin's incremental updates.
+
+    Updates received before the book is synchronized are buffered. Once the REST snapshot is loaded,
+    buffered changes newer than the snapshot are replayed. A gap in the sequence numbers marks the book
+    as out of sync until the next snapshot, and queries on an unsynchronized book return nothing.
+    """
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.sequence = 0
+        self.synchronized = False
+        self.time = 0
+        self._pending_events = []
+        self._lock = threading.Lock()
+
+    def load_snapshot(self, sequence: int, bids: list, asks: list) -> bool:
+        """
+        Replaces the book with a REST snapshot, then replays the buffered updates newer than it.
+
+        Args:
+            sequence (int): Sequence of the snapshot.
+            bids (list): List of [price, size] (str), best first.
+            asks (list): List of [price, size] (str), best first.
+
+        Returns:
+            bool: False if the buffered updates do not continue the snapshot, and a new snapshot is needed.
+        """
+        with self._lock:
+            self.bids.clear()
+            self.asks.clear()
+            for price, size in bids:
+                self.bids.set(float(price), float(size))
+            for price, size in asks:
+                self.asks.set(float(price), float(size))
+            self.sequence = sequence
+            self.synchronized = True
+
+            pending_events, self._pending_events = self._pending_events, []
+            for index, event in enumerate(pending_events):
+                if not self._apply_event(event):
+                    # Keep every update from the gap on for the next snapshot
+                    self._pending_events = pending_events[index:]
+                    return False
+        logging.info(f"[L2] {self.symbol} order book synchronized at sequence {sequence}")
+        return True
+
+    def apply_event(self, event: "OrderbookIncrementEvent") -> bool:
+        """
+        Applies an incremental update, or buffers it while the book is not synchronized.
+
+        Returns:
+            bool: False if a sequence gap was detected and the book needs a new snapshot.
+        """
+        with self._lock:
+            if not self.synchronized:
+                self._pending_events.append(event)
+                if len(self._pending_events) > MAX_PENDING_EVENTS:
+                    del self._pending_events[0]
+                return True
+            return self._apply_event(event)
+
+    def _apply_event(self, event: "OrderbookIncrementEvent") -> bool:
+        if event.sequence_end <= self.sequence:
+            return True
+        if event.sequence_start > self.sequence + 1:
+            logging.warning(f"[L2] {self.symbol} sequence gap : expected {self.sequence + 1}, received {event.sequence_start}")
+            self.synchronized = False
+            self._pending_events = [event]
+            return False
+
+        # Each change carries its own sequence : [price, size, sequence]
+        for side, changes in ((self.asks, event.changes.asks), (self.bids, event.changes.bids)):
+            for price, size, sequence in changes or []:
+                if int(sequence) > self.sequence:
+                    side.set(float(price), float(size))
+        self.sequence = event.sequence_end
+        self.time = event.time or self.time
+        return True
+
+    def best_bid(self):
+        with self._lock:
+            return self.bids.best() if self.synchronized else None
+
+    def best_ask(self):
+        with self._lock:
+            return self.asks.best() if self.synchronized else None
+
+    def sell_base(self, quantity: float):
+        """
+        Walks the bids to sell `quantity` of base currency.
+
+        Returns:
+            tuple: (sold base quantity, quote received), (0, 0) if the book is not synchronized.
+        """
+        with self._lock:
+            return self.bids.walk_base(quantity) if self.synchronized else (0.0, 0.0)
+
+    def buy_base(self, quantity: float):
+        """
+        Walks the asks to buy `quantity` of base currency.
+
+        Returns:
+            tuple: (bought base quantity, quote spent), (0, 0) if the book is not synchronized.
+        """
+        with self._lock:
+            return self.asks.walk_base(quantity) if self.synchronized else (0.0, 0.0)
+
+    def buy_with_quote(self, quote_amount: float):
+        """
+        Walks the asks to spend `quote_amount` of quote currency.
+
+        Returns:
+            tuple: (bought base quantity, quote spent), (0, 0) if the book is not synchronized.
+        """
+        with self._lock:
+            return self.asks.walk_quote(quote_amount) if self.synchronized else (0.0, 0.0)
+
+
+def simulate_cycle(legs: list, amount: float) -> float:
+    """
+    Converts `amount` of the starting currency along a cycle, walking each order book (VWAP fills).
+
+    Args:
+        legs (list): List of (OrderBook, sells) tuples, sells being True if the leg sells the base currency.
+        amount (float): Amount of the starting currency.
+
+    Returns:
+        float: Amount of the starting currency obtained at the end of the cycle, 0 if the depth is insufficient.
+    """
+    for order_book, sells in legs:
+        if sells:
+            filled, received = order_book.sell_base(amount)
+        else:
+            received, filled = order_book.buy_with_quote(amount)
+        # Not enough liquidity for the whole amount
+        if filled < amount * (1 - 1e-12):
+            return 0.0
+        amount = received
+    return amount
+
+
+def find_executable_size(legs: list, max_amount: float, min_profit: float = 0.0, iterations: int = 20):
+    """
+    Finds the largest starting amount whose VWAP profit along the cycle stays above `min_profit`.
+    The profit can only decrease with the size, so a binary search is enough.
+
+    Args:
+        legs (list): List of (OrderBook, sells) tuples, see simulate_cycle.
+        max_amount (float): Largest amount of the starting currency to consider.
+        min_profit (float): Minimum percentage profit.
+        iterations (int): Number of binary search steps.
+
+    Returns:
+        tuple: (amount, percentage profit at that amount), (0, 0) if even a tiny amount is not profitable.
+    """
+    def profit(amount):
+        return (simulate_cycle(legs, amount) / amount - 1) * 100
+
+    if profit(max_amount) > min_profit:
+        return max_amount, profit(max_amount)
+
+    low, high = 0.0, max_amount
+    for _ in range(iterations):
+        middle = (low + high) / 2
+        if profit(middle) > min_profit:
+            low = middle
+        else:
+            high = middle
+    if low == 0:
+        return 0.0, 0.0
+    return low, profit(low)
+
+
+class OrderBookManager:
+    """
+    Maintains the local order books of several symbols over one spot public WebSocket.
+    Snapshots are fetched on the REST thread pool, so the WebSocket thread never waits for the REST API,
+    and at most ENDPOINT_CONCURRENCY["order_book"] at a time, so a mass resync after a reconnection is queued.
+
+    Args:
+        market_api (MarketAPI): The market API client instance, used for the snapshots.
+        subscription_manager (SubscriptionManager): Manager owning the spot WebSocket.
+        snapshot_depth (str): None to use the full order book snapshot (requires API keys), or '20' / '100' for a partial one.
+        recorder (TickRecorder): Optional recorder receiving every raw level-2 event, see services.tick_recorder.
+    """
+    def __init__(self, market_api: "MarketAPI", subscription_manager, snapshot_depth: str = None, recorder=None):
+        self.market_api = market_api
+        self.recorder = recorder
+        self.subscription_manager = subscription_manager
+        self.snapshot_depth = snapshot_depth
+        self.order_books = {}
+        self._resyncing = set()
+        self._resync_lock = threading.Lock()
+
+    def subscribe(self, symbols: list) -> dict:
+        """
+        Subscribes to the level-2 updates of the symbols and starts their synchronization.
+
+        Returns:
+            dict: The order books by symbol.
+        """
+        new_symbols = [symbol for symbol in symbols if symbol not in self.order_books]
+        for symbol in new_symbols:
+            self.order_books[symbol] = OrderBook(symbol)
+        if new_symbols:
+            # Subscribe first so no update between the snapshot and the subscription is missed
+            self.subscription_manager.subscribe_order_book_increments(new_symbols, self._on_increment)
+            for symbol in new_symbols:
+                self.resync(symbol)
+        return self.order_books
+
+    def _on_increment(self, topic: str, subject: str, data: "OrderbookIncrementEvent") -> None:
+        order_book = self.order_books.get(topic[len(L2_TOPIC_PREFIX):])
+        if order_book is not None and self.recorder is not None:
+            self.recorder.record_order_book_increment(order_book.symbol, data)
+        if order_book is not None and not order_book.apply_event(data):
+            self.resync(order_book.symbol)
+
+    def fetch_snapshot(self, symbol: str):
+        if self.snapshot_depth is None:
+            from kucoin_universal_sdk.generate.spot.market.model_get_full_order_book_req import GetFullOrderBookReqBuilder
+            return self.market_api.get_full_order_book(GetFullOrderBookReqBuilder().set_symbol(symbol).build())
+        from kucoin_universal_sdk.generate.spot.market.model_get_part_order_book_req import GetPartOrderBookReqBuilder
+        return self.market_api.get_part_order_book(GetPartOrderBookReqBuilder().set_symbol(symbol).set_size(self.snapshot_depth).build())
+
+    def resync(self, symbol: str) -> None:
+        """
+        Fetches a new snapshot of a symbol in the background, unless one is already being fetched.
+        """
+        with self._resync_lock:
+            if symbol in self._resyncing:
+                return
+            self._resyncing.add(symbol)
+        self._fetch(symbol)
+
+    def _fetch(self, symbol: str) -> None:
+        submit_rest("order_book", self.fetch_snapshot, symbol).add_done_callback(lambda future: self._on_snapshot(symbol, future))
+
+    def _on_snapshot(self, symbol: str, future) -> None:
+        """
+        Loads a fetched snapshot (on the REST thread pool), or fetches a new one after SNAPSHOT_RETRY_DELAY seconds.
+        """
+        synchronized = False
+        try:
+            snapshot = future.result()
+            synchronized = self.order_books[symbol].load_snapshot(int(snapshot.sequence), snapshot.bids, snapshot.asks)
+        except Exception as e:
+            logging.error(f"[L2] Error fetching the {symbol} order book snapshot: {e}")
+        if synchronized:
+            with self._resync_lock:
+                self._resyncing.discard(symbol)
+            return
+        # The retry waits on a timer thread, not on a thread of the pool
+        retry = threading.Timer(SNAPSHOT_RETRY_DELAY, self._fetch, (symbol,))
+        retry.daemon = True
+        retry.start()
@@ -0,0 +1,200 @@
+import logging
+import platform
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+
+DEFAULT_CAPACITY = 1024
+# Reads of snapshot retried while a symbol is being written, before the torn symbols are returned as not operational
+SNAPSHOT_MAX_RETRIES = 1000
+# Architectures ordering stores with other stores and loads with other loads, which the seqlock of a SharedPriceBook relies on
+TOTAL_STORE_ORDER_MACHINES = ("x86_64", "amd64", "i386", "i686", "x86")
+# Arrays of a PriceBook, all 8 bytes per symbol so a SharedPriceBook lays them out back to back
+PRICE_BOOK_FIELDS = (("bid", np.float64), ("ask", np.float64), ("bid_size", np.float64), ("ask_size", np.float64),
+                     ("last_price", np.float64), ("last_size", np.float64),
+                     ("last_update", np.float64), ("exchange_time", np.int64), ("sequence", np.int64), ("version", np.int64))
+
+
+class PriceBook:
+    """
+    Central top-of-book prices, stored as one NumPy array per field and indexed by integer symbol id.
+    Updates write into preallocated arrays, so no object is created per tick.
+
+    Each symbol has a version counter used as a seqlock : it is odd while the symbol is being written,
+    so readers on another thread can detect and retry a torn read instead of taking a lock on the hot path.
+    Writers (the WebSocket threads, and the invalidations of a reconnection) are serialized by a lock,
+    so an increment of the version is never lost.
+    """
+    __slots__ = ("symbols", "symbol_ids", "bid", "ask", "bid_size", "ask_size", "last_price", "last_size", "last_update", "exchange_time",
+                 "sequence", "version", "_add_lock", "_write_lock")
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.symbols = []
+        self.symbol_ids = {}
+        self._add_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        size = len(self.symbols)
+        for field, dtype in PRICE_BOOK_FIELDS:
+            array = np.zeros(capacity, dtype=dtype)
+            if size:
+                array[:size] = getattr(self, field)[:size]
+            setattr(self, field, array)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def add_symbol(self, symbol: str) -> int:
+        """
+        Returns the id of a symbol, registering it if needed. Arrays grow by doubling,
+        so readers must access them through the book rather than keeping references.
+        """
+        symbol_id = self.symbol_ids.get(symbol)
+        if symbol_id is not None:
+            return symbol_id
+        with self._add_lock:
+            if symbol in self.symbol_ids:
+                return self.symbol_ids[symbol]
+            if len(self.symbols) == len(self.bid):
+                self._allocate(2 * len(self.bid))
+            symbol_id = len(self.symbols)
+            self.symbols.append(symbol)
+            self.symbol_ids[symbol] = symbol_id
+            return symbol_id
+
+    def update(self, symbol_id: int, bid: float, ask: float, bid_size: float = 0, ask_size: float = 0,
+               exchange_time: int = 0, sequence: int = 0, last_price: float = 0, last_size: float = 0) -> None:
+        """
+        Writes the top of book of a symbol. Writers of several threads take turns, see the class docstring.
+
+        Args:
+            symbol_id (int): Id of the symbol, see add_symbol.
+            bid (float): Best bid price.
+            ask (float): Best ask price.
+            bid_size (float): Best bid size.
+            ask_size (float): Best ask size.
+            exchange_time (int): Exchange timestamp of the event, in milliseconds.
+            sequence (int): Exchange sequence number of the event.
+            last_price (float): Price of the last trade, 0 if the event carries none.
+            last_size (float): Size of the last trade.
+        """
+        with self._write_lock:
+            self.version[symbol_id] += 1
+            self.bid[symbol_id] = bid
+            self.ask[symbol_id] = ask
+            self.bid_size[symbol_id] = bid_size
+            self.ask_size[symbol_id] = ask_size
+            self.exchange_time[symbol_id] = exchange_time
+            self.sequence[symbol_id] = sequence
+            self.last_price[symbol_id] = last_price
+            self.last_size[symbol_id] = last_size
+            self.last_update[symbol_id] = time.time()
+            self.version[symbol_id] += 1
+
+    def invalidate(self, symbol_ids) -> None:
+        """
+        Clears the prices of symbols (e.g. after a disconnection), so they are not operational until updated again.
+        """
+        with self._write_lock:
+            for symbol_id in symbol_ids:
+                self.version[symbol_id] += 1
+                self.bid[symbol_id] = 0
+                self.ask[symbol_id] = 0
+                self.version[symbol_id] += 1
+
+    def is_operational(self, symbol_id: int, max_age: float = None) -> bool:
+        """
+        Returns True if the symbol has prices, and if they are not older than max_age seconds when given.
+        """
+        if self.bid[symbol_id] == 0 or self.ask[symbol_id] == 0:
+            return False
+        return max_age is None or time.time() - self.last_update[symbol_id] <= max_age
+
+    def stale_symbols(self, max_age: float) -> np.ndarray:
+        """
+        Returns the ids of the symbols not updated for more than max_age seconds.
+        """
+        size = len(self.symbols)
+        return np.flatnonzero(time.time() - self.last_update[:size] > max_age)
+
+    def snapshot(self, symbol_ids=None):
+        """
+        Reads a consistent copy of the bid and ask prices, retrying while a symbol is being written.
+        After SNAPSHOT_MAX_RETRIES torn reads, the prices of the symbols still being written are returned as 0,
+        so they are not operational, instead of blocking the caller.
+
+        Args:
+            symbol_ids (list | np.ndarray): Ids to read, every symbol if None.
+
+        Returns:
+            tuple: (bid, ask) arrays.
+        """
+        if symbol_ids is None:
+            symbol_ids = slice(0, len(self.symbols))
+        for _ in range(SNAPSHOT_MAX_RETRIES):
+            version_before = self.version[symbol_ids].copy()
+            bid = self.bid[symbol_ids].copy()
+            ask = self.ask[symbol_ids].copy()
+            version_after = self.version[symbol_ids]
+            torn = (version_before & 1).astype(bool) | (version_before != version_after)
+            if not torn.any():
+                return bid, ask
+        logging.warning(f"[PRICE BOOK] Snapshot still torn after {SNAPSHOT_MAX_RETRIES} reads, {np.count_nonzero(torn)} symbols returned as not operational")
+        bid[torn] = 0
+        ask[torn] = 0
+        return bid, ask
+
+
+class SharedPriceBook(PriceBook):
+    """
+    PriceBook whose arrays live in a multiprocessing.shared_memory block, so worker processes attached to it read
+    the prices written by the ingestion process with no copy nor message. The symbols are fixed at creation.
+
+    The seqlock of snapshot works across processes as long as a single process writes, the version being
+    written before and after the prices in the same memory (x86 does not reorder stores with other stores,
+    nor loads with other loads). NumPy issues no memory barrier, so creating or attaching to a shared price book
+    raises a RuntimeError on other architectures, where readers could see the new version with the old prices.
+
+    Args:
+        symbols (list): Symbols of the book, in id order. Every process must pass the same list.
+        name (str): Name of the block to attach to, a new block is created if None (see `name`).
+    """
+    __slots__ = ("shared_memory", "owner")
+
+    def __init__(self, symbols: list, name: str = None):
+        machine = platform.machine()
+        if machine.lower() not in TOTAL_STORE_ORDER_MACHINES:
+            raise RuntimeError(f"A shared price book requires an x86 processor, its seqlock relies on the x86 memory ordering ({machine} is not supported)")
+        self.owner = name is None
+        capacity = max(len(symbols), 1)
+        self.shared_memory = SharedMemory(name=name, create=self.owner, size=capacity * 8 * len(PRICE_BOOK_FIELDS))
+        self.symbols = list(symbols)
+        self.symbol_ids = {symbol: symbol_id for symbol_id, symbol in enumerate(self.symbols)}
+        self._add_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        for index, (field, dtype) in enumerate(PRICE_BOOK_FIELDS):
+            setattr(self, field, np.ndarray(capacity, dtype=dtype, buffer=self.shared_memory.buf, offset=index * capacity * 8))
+
+    @property
+    def name(self) -> str:
+        return self.shared_memory.name
+
+    def _allocate(self, capacity: int):
+        raise ValueError(f"A shared price book cannot grow beyond its {len(self.symbols)} symbols")
+
+    def close(self) -> None:
+        """
+        Detaches from the block, which is also destroyed by the process that created it.
+        """
+        for field, _ in PRICE_BOOK_FIELDS:
+            setattr(self, field, None)
+        self.shared_memory.close()
+        if self.owner:
+            self.shared_memory.unlink()
+
+
+# Price book shared by every WebSocketSymbol created without an explicit book
+default_price_book = PriceBook()
@@ -0,0 +1,105 @@
+import asyncio
+import threading
+import weakref
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from services.config import REST_POOL_SIZE
+
+# Requests in flight per endpoint : a slow or bulk endpoint (e.g. a history download) cannot take every pooled
+# connection, so the calls the strategies wait on (symbols, order book snapshots) still get one
+ENDPOINT_CONCURRENCY = {
+    "klines": 12,
+    "order_book": 4,
+    "symbols": 2,
+    "announcements": 1,
+    "contracts": 2,
+    # The legs of a cycle are sent together, never queued behind each other
+    "orders": 8,
+}
+DEFAULT_ENDPOINT_CONCURRENCY = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+# Semaphores by event loop, an asyncio.Semaphore cannot be shared by two loops
+_semaphores = weakref.WeakKeyDictionary()
+# Calls submitted from threads (see submit_rest) : [calls in flight, queued calls] by endpoint
+_thread_queues = {}
+_thread_queues_lock = threading.Lock()
+
+
+def get_rest_executor() -> ThreadPoolExecutor:
+    """
+    Returns the thread pool running the blocking SDK calls, sized like the HTTP connection pool of the client.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=REST_POOL_SIZE, thread_name_prefix="kucoin-rest")
+        return _executor
+
+
+def get_endpoint_semaphore(endpoint: str) -> asyncio.Semaphore:
+    """
+    Returns the semaphore limiting the requests in flight to an endpoint, on the running event loop.
+    """
+    semaphores = _semaphores.setdefault(asyncio.get_running_loop(), {})
+    semaphore = semaphores.get(endpoint)
+    if semaphore is None:
+        semaphore = semaphores[endpoint] = asyncio.Semaphore(ENDPOINT_CONCURRENCY.get(endpoint, DEFAULT_ENDPOINT_CONCURRENCY))
+    return semaphore
+
+
+async def run_rest(endpoint: str, function, *args):
+    """
+    Runs a blocking REST call (an SDK method, or a function making one) on the REST thread pool,
+    so the event loop keeps processing the WebSocket messages meanwhile.
+
+    Args:
+        endpoint (str): Endpoint name, see ENDPOINT_CONCURRENCY.
+        function (callable): The blocking call.
+        *args: Arguments of the call.
+
+    Returns:
+        The result of the call, whose exceptions are raised in the caller.
+    """
+    async with get_endpoint_semaphore(endpoint):
+        return await asyncio.get_running_loop().run_in_executor(get_rest_executor(), function, *args)
+
+
+def _run_submitted(endpoint: str, future: Future, function, args) -> None:
+    if future.set_running_or_notify_cancel():
+        try:
+            future.set_result(function(*args))
+        except BaseException as e:
+            future.set_exception(e)
+    # Starts the next queued call of the endpoint, if any
+    with _thread_queues_lock:
+        queue = _thread_queues[endpoint]
+        if queue[1]:
+            get_rest_executor().submit(_run_submitted, endpoint, *queue[1].popleft())
+        else:
+            queue[0] -= 1
+
+
+def submit_rest(endpoint: str, function, *args) -> Future:
+    """
+    Runs a blocking REST call on the REST thread pool from a thread without event loop (e.g. the SDK's WebSocket thread),
+    at most ENDPOINT_CONCURRENCY calls of an endpoint at a time, the others being queued. Never blocks the caller.
+
+    Args:
+        endpoint (str): Endpoint name, see ENDPOINT_CONCURRENCY.
+        function (callable): The blocking call.
+        *args: Arguments of the call.
+
+    Returns:
+        Future: The result of the call.
+    """
+    future = Future()
+    with _thread_queues_lock:
+        queue = _thread_queues.setdefault(endpoint, [0, deque()])
+        if queue[0] >= ENDPOINT_CONCURRENCY.get(endpoint, DEFAULT_ENDPOINT_CONCURRENCY):
+            queue[1].append((future, function, args))
+            return future
+        queue[0] += 1
+    get_rest_executor().submit(_run_submitted, endpoint, future, function, args)
+    return future
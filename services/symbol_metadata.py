@@ -0,0 +1,134 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+from services.rest_client import run_rest
+
+# The SDK is imported on first use, see services.config
+if TYPE_CHECKING:
+    from kucoin_universal_sdk.generate.spot.market.api_market import MarketAPI
+
+# Base taker fee of each fee category (VIP 0), multiplied by the symbol's taker fee coefficient
+TAKER_FEE_RATES = {1: 0.001, 2: 0.002, 3: 0.003}
+DEFAULT_TAKER_FEE_RATE = 0.001
+METADATA_REFRESH_INTERVAL = 3600
+# Futures contracts use their own code for some currencies (e.g. XBTUSDTM is the BTC-USDT perpetual)
+FUTURES_CURRENCY_ALIASES = {"XBT": "BTC"}
+DEFAULT_FUNDING_INTERVAL = 8 * 3600 * 1000
+DEFAULT_FUTURES_TAKER_FEE_RATE = 0.0006
+
+
+class SymbolMetadata:
+    """
+    Trading rules of a spot symbol, parsed once from the symbols endpoint.
+    """
+    __slots__ = ("symbol", "base_currency", "quote_currency", "base_increment", "quote_increment", "price_increment",
+                 "base_min_size", "quote_min_size", "min_funds", "taker_fee", "enable_trading")
+
+    def __init__(self, symbol_data, fee_discount: float = 1.0):
+        self.symbol = symbol_data.symbol
+        self.base_currency = symbol_data.base_currency
+        self.quote_currency = symbol_data.quote_currency
+        self.base_increment = float(symbol_data.base_increment or 0)
+        self.quote_increment = float(symbol_data.quote_increment or 0)
+        self.price_increment = float(symbol_data.price_increment or 0)
+        self.base_min_size = float(symbol_data.base_min_size or 0)
+        self.quote_min_size = float(symbol_data.quote_min_size or 0)
+        self.min_funds = float(symbol_data.min_funds or 0)
+        self.enable_trading = bool(symbol_data.enable_trading)
+
+        fee_category = symbol_data.fee_category.value if symbol_data.fee_category is not None else None
+        fee_coefficient = float(symbol_data.taker_fee_coefficient) if symbol_data.taker_fee_coefficient is not None else 1.0
+        self.taker_fee = TAKER_FEE_RATES.get(fee_category, DEFAULT_TAKER_FEE_RATE) * fee_coefficient * fee_discount
+
+    def min_quote_amount(self) -> float:
+        """
+        Returns the minimum amount of quote currency of an order.
+        """
+        return max(self.min_funds, self.quote_min_size)
+
+
+class SymbolMetadataCache:
+    """
+    Symbol metadata (fees, increments, minimum sizes) loaded once from the market symbols endpoint
+    and refreshed periodically. `version` changes on each refresh, so users can recompute what they derived from it.
+
+    Args:
+        market_api (MarketAPI): The market API client instance.
+        fee_discount (float): Multiplier applied to every taker fee (e.g. 0.8 for a VIP or KCS discount).
+        refresh_interval (float): Seconds between two refreshes in run_refresh.
+    """
+    def __init__(self, market_api: "MarketAPI", fee_discount: float = 1.0, refresh_interval: float = METADATA_REFRESH_INTERVAL):
+        self.market_api = market_api
+        self.fee_discount = fee_discount
+        self.refresh_interval = refresh_interval
+        self.symbols = {}
+        self.version = 0
+
+    def refresh(self) -> None:
+        """
+        Reloads the metadata of every symbol (blocking call).
+        """
+        from kucoin_universal_sdk.generate.spot.market.model_get_all_symbols_req import GetAllSymbolsReqBuilder
+        symbols_resp = self.market_api.get_all_symbols(GetAllSymbolsReqBuilder().build())
+        self.symbols = {symbol_data.symbol: SymbolMetadata(symbol_data, self.fee_discount) for symbol_data in symbols_resp.data}
+        self.version += 1
+        logging.info(f"Symbol metadata loaded for {len(self.symbols)} symbols")
+
+    async def run_refresh(self) -> None:
+        """
+        Refreshes the metadata every refresh_interval seconds, without blocking the event loop.
+        """
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await run_rest("symbols", self.refresh)
+            except Exception as e:
+                logging.error(f"Error refreshing symbol metadata: {e}")
+
+    def get(self, symbol: str) -> SymbolMetadata:
+        return self.symbols.get(symbol)
+
+    def trading_symbols(self) -> list:
+        return sorted(symbol for symbol, metadata in self.symbols.items() if metadata.enable_trading)
+
+    def taker_fee(self, symbol: str) -> float:
+        metadata = self.symbols.get(symbol)
+        return metadata.taker_fee if metadata is not None else DEFAULT_TAKER_FEE_RATE * self.fee_discount
+
+
+class FuturesContract:
+    """
+    Trading rules and funding of a futures contract, parsed from the active contracts endpoint.
+    Currencies are mapped to their spot codes, so `spot_symbol` is the matching spot pair.
+    """
+    __slots__ = ("symbol", "base_currency", "quote_currency", "is_inverse", "is_perpetual", "expire_date", "multiplier",
+                 "taker_fee", "funding_fee_rate", "predicted_funding_fee_rate", "funding_interval", "next_funding_time")
+
+    def __init__(self, contract_data):
+        self.symbol = contract_data.symbol
+        self.base_currency = FUTURES_CURRENCY_ALIASES.get(contract_data.base_currency, contract_data.base_currency)
+        self.quote_currency = FUTURES_CURRENCY_ALIASES.get(contract_data.quote_currency, contract_data.quote_currency)
+        self.is_inverse = bool(contract_data.is_inverse)
+        self.is_perpetual = contract_data.type is not None and contract_data.type.value == "FFWCSX"
+        self.expire_date = contract_data.expire_date
+        self.multiplier = float(contract_data.multiplier or 0)
+        self.taker_fee = float(contract_data.taker_fee_rate) if contract_data.taker_fee_rate is not None else DEFAULT_FUTURES_TAKER_FEE_RATE
+        self.funding_fee_rate = float(contract_data.funding_fee_rate or 0)
+        self.predicted_funding_fee_rate = float(contract_data.predicted_funding_fee_rate or 0)
+        self.funding_interval = contract_data.funding_rate_granularity or DEFAULT_FUNDING_INTERVAL
+        self.next_funding_time = contract_data.next_funding_rate_time
+
+    @property
+    def spot_symbol(self) -> str:
+        return f"{self.base_currency}-{self.quote_currency}"
+
+
+def fetch_futures_contracts(futures_market_api) -> list:
+    """
+    Returns the active futures contracts as FuturesContract (blocking call).
+
+    Args:
+        futures_market_api (MarketAPI): The futures market API client instance, see services.config.get_futures_market_api.
+    """
+    contracts_resp = futures_market_api.get_all_symbols()
+    return [FuturesContract(contract_data) for contract_data in contracts_resp.data]
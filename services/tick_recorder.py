@@ -0,0 +1,272 @@
+import asyncio
+import json
+import logging
+import struct
+import threading
+import time
+import numpy as np
+
+TICK_LOG_MAGIC = b"KCTICK1\n"
+
+# Record layouts, all little-endian and prefixed by their type byte
+RECORD_SYMBOL = 1
+RECORD_TICKER = 2
+RECORD_ORDER_BOOK = 3
+SYMBOL_STRUCT = struct.Struct("<HH")  # symbol id, name length, then the name
+TICKER_STRUCT = struct.Struct("<qqHddddddq")  # receive time (ns), exchange time (ms), symbol id, bid, ask, bid size, ask size, price, size, sequence
+ORDER_BOOK_STRUCT = struct.Struct("<qqHqqI")  # receive time (ns), exchange time (ms), symbol id, sequence start, sequence end, changes length, then the changes (JSON)
+# Loop iterations given to the strategies after each replayed event : one for the wake-up callback, one for the evaluator task
+REPLAY_YIELDS = 2
+
+
+class ReplayTickerEvent:
+    """
+    Lightweight stand-in for the SDK's TickerEvent, with the attributes WebSocketSymbol reads.
+    """
+    __slots__ = ("best_bid", "best_ask", "best_bid_size", "best_ask_size", "price", "size", "time", "sequence")
+
+    def __init__(self, best_bid, best_ask, best_bid_size, best_ask_size, price, size, time, sequence):
+        self.best_bid = best_bid
+        self.best_ask = best_ask
+        self.best_bid_size = best_bid_size
+        self.best_ask_size = best_ask_size
+        self.price = price
+        self.size = size
+        self.time = time
+        self.sequence = sequence
+
+
+class ReplayTickerV2Event:
+    """
+    Lightweight stand-in for the SDK's futures TickerV2Event, with the attributes WebSocketSymbol reads.
+    """
+    __slots__ = ("best_bid_price", "best_ask_price", "best_bid_size", "best_ask_size", "ts", "sequence")
+
+    def __init__(self, best_bid_price, best_ask_price, best_bid_size, best_ask_size, ts, sequence):
+        self.best_bid_price = best_bid_price
+        self.best_ask_price = best_ask_price
+        self.best_bid_size = best_bid_size
+        self.best_ask_size = best_ask_size
+        self.ts = ts
+        self.sequence = sequence
+
+
+class ReplayChanges:
+    __slots__ = ("asks", "bids")
+
+    def __init__(self, asks, bids):
+        self.asks = asks
+        self.bids = bids
+
+
+class ReplayOrderBookEvent:
+    """
+    Lightweight stand-in for the SDK's OrderbookIncrementEvent, with the attributes OrderBook reads.
+    """
+    __slots__ = ("symbol", "sequence_start", "sequence_end", "time", "changes")
+
+    def __init__(self, symbol, sequence_start, sequence_end, time, changes):
+        self.symbol = symbol
+        self.sequence_start = sequence_start
+        self.sequence_end = sequence_end
+        self.time = time
+        self.changes = changes
+
+
+class TickRecorder:
+    """
+    Records raw ticker (and optionally level-2) events with their receive time into a compact, append-only binary log.
+    Called from the SDK's WebSocket thread : records are packed with struct and buffered, never formatted as text.
+
+    Args:
+        file_name (str): The log file, appended to if it already exists.
+    """
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self._file = open(file_name, "ab", buffering=256 * 1024)
+        if self._file.tell() == 0:
+            self._file.write(TICK_LOG_MAGIC)
+        self._symbol_ids = {}
+        self._lock = threading.Lock()
+        self.records = 0
+
+    def _symbol_id(self, symbol: str) -> int:
+        symbol_id = self._symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self._symbol_ids)
+            self._symbol_ids[symbol] = symbol_id
+            name = symbol.encode()
+            self._file.write(bytes((RECORD_SYMBOL,)) + SYMBOL_STRUCT.pack(symbol_id, len(name)) + name)
+        return symbol_id
+
+    def record_ticker(self, symbol: str, data) -> None:
+        """
+        Records a spot TickerEvent (or AllTickersEvent) or a futures TickerV2Event.
+        """
+        receive_time = time.time_ns()
+        if hasattr(data, "best_ask_price"):
+            # Futures timestamps are in nanoseconds
+            values = (float(data.best_bid_price), float(data.best_ask_price), float(data.best_bid_size or 0), float(data.best_ask_size or 0),
+                      0.0, 0.0, (data.ts or 0) // 1_000_000, int(data.sequence or 0))
+        else:
+            values = (float(data.best_bid), float(data.best_ask), float(data.best_bid_size or 0), float(data.best_ask_size or 0),
+                      float(data.price or 0), float(data.size or 0), data.time or 0, int(data.sequence or 0))
+        bid, ask, bid_size, ask_size, price, size, exchange_time, sequence = values
+        with self._lock:
+            symbol_id = self._symbol_id(symbol)
+            self._file.write(bytes((RECORD_TICKER,)) + TICKER_STRUCT.pack(receive_time, exchange_time, symbol_id, bid, ask, bid_size, ask_size, price, size, sequence))
+            self.records += 1
+
+    def record_order_book_increment(self, symbol: str, data) -> None:
+        """
+        Records a level-2 OrderbookIncrementEvent.
+        """
+        receive_time = time.time_ns()
+        changes = json.dumps([data.changes.asks or [], data.changes.bids or []], separators=(",", ":")).encode()
+        with self._lock:
+            symbol_id = self._symbol_id(symbol)
+            self._file.write(bytes((RECORD_ORDER_BOOK,)) + ORDER_BOOK_STRUCT.pack(receive_time, data.time or 0, symbol_id,
+                                                                                  data.sequence_start, data.sequence_end, len(changes)) + changes)
+            self.records += 1
+
+    def flush(self) -> None:
+        with self._lock:
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+        logging.info(f"Recorded {self.records} events into {self.file_name}")
+
+
+def read_tick_log(file_name: str):
+    """
+    Reads a tick log recorded by TickRecorder.
+
+    Yields:
+        tuple: (receive_time_ns, symbol, is_futures, event), event being a ReplayTickerEvent, a ReplayTickerV2Event
+               or a ReplayOrderBookEvent.
+    """
+    symbols = {}
+    with open(file_name, "rb") as file:
+        if file.read(len(TICK_LOG_MAGIC)) != TICK_LOG_MAGIC:
+            raise ValueError(f"{file_name} is not a tick log")
+        while True:
+            record_type = file.read(1)
+            if not record_type:
+                return
+            record_type = record_type[0]
+
+            if record_type == RECORD_SYMBOL:
+                symbol_id, length = SYMBOL_STRUCT.unpack(file.read(SYMBOL_STRUCT.size))
+                symbols[symbol_id] = file.read(length).decode()
+
+            elif record_type == RECORD_TICKER:
+                payload = file.read(TICKER_STRUCT.size)
+                if len(payload) < TICKER_STRUCT.size:
+                    return  # Truncated by an interrupted recording
+                receive_time, exchange_time, symbol_id, bid, ask, bid_size, ask_size, price, size, sequence = TICKER_STRUCT.unpack(payload)
+                symbol = symbols[symbol_id]
+                if "-" in symbol:
+                    yield receive_time, symbol, False, ReplayTickerEvent(bid, ask, bid_size, ask_size, price, size, exchange_time, sequence)
+                else:
+                    yield receive_time, symbol, True, ReplayTickerV2Event(bid, ask, bid_size, ask_size, exchange_time * 1_000_000, sequence)
+
+            elif record_type == RECORD_ORDER_BOOK:
+                payload = file.read(ORDER_BOOK_STRUCT.size)
+                if len(payload) < ORDER_BOOK_STRUCT.size:
+                    return
+                receive_time, exchange_time, symbol_id, sequence_start, sequence_end, length = ORDER_BOOK_STRUCT.unpack(payload)
+                asks, bids = json.loads(file.read(length))
+                symbol = symbols[symbol_id]
+                yield receive_time, symbol, False, ReplayOrderBookEvent(symbol, sequence_start, sequence_end, exchange_time, ReplayChanges(asks, bids))
+
+            else:
+                raise ValueError(f"Unknown record type {record_type} in {file_name}")
+
+
+class ReplayDriver:
+    """
+    Feeds a tick log through the same WebSocketSymbol.updatePrices path as the live WebSocket, so the strategies
+    listening on the symbols run exactly as they would live, with no network.
+    Exchange timestamps are shifted to the replay time, keeping the recorded delay between the exchange and the reception,
+    so the latency metrics (see utils.latency) are meaningful at any speed.
+
+    Args:
+        file_name (str): The tick log to replay.
+    """
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self.websocket_symbols = {}
+        self.order_books = {}
+        self.events = 0
+        self.elapsed = 0.0
+        # Time spent on each event, from updatePrices until the woken strategies yielded back (seconds)
+        self.latencies = np.empty(0)
+
+    def add_symbols(self, websocket_symbols: list) -> None:
+        """
+        Registers WebSocketSymbol objects to update. Several objects can share the same symbol.
+        """
+        for websocket_symbol in websocket_symbols:
+            self.websocket_symbols.setdefault(websocket_symbol.symbol, []).append(websocket_symbol)
+
+    def add_order_books(self, order_books: dict) -> None:
+        """
+        Registers OrderBook objects (by symbol) to update with the recorded level-2 events.
+        """
+        self.order_books.update(order_books)
+
+    async def run(self, speed: float = None) -> None:
+        """
+        Replays the log.
+
+        Args:
+            speed (float): None to replay as fast as possible, 1.0 for the recorded pace, 10.0 for ten times faster...
+        """
+        first_receive_time = None
+        latencies = []
+        start = time.perf_counter()
+
+        for receive_time, symbol, is_futures, event in read_tick_log(self.file_name):
+            if speed is not None:
+                if first_receive_time is None:
+                    first_receive_time = receive_time
+                delay = (receive_time - first_receive_time) / 1e9 / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            event_start = time.perf_counter()
+            replay_time = time.time_ns()
+            if isinstance(event, ReplayOrderBookEvent):
+                order_book = self.order_books.get(symbol)
+                if order_book is not None:
+                    order_book.apply_event(event)
+            else:
+                if is_futures:
+                    event.ts += replay_time - receive_time
+                elif event.time:
+                    event.time += (replay_time - receive_time) // 1_000_000
+                for websocket_symbol in self.websocket_symbols.get(symbol, ()):
+                    websocket_symbol.updatePrices(event, replay_time)
+            self.events += 1
+
+            # Let the woken strategies evaluate before the next event, so every event is evaluated as in a quiet live market
+            for _ in range(REPLAY_YIELDS):
+                await asyncio.sleep(0)
+            latencies.append(time.perf_counter() - event_start)
+
+        self.elapsed = time.perf_counter() - start
+        self.latencies = np.array(latencies)
+        logging.info(self.summary())
+
+    def summary(self) -> str:
+        """
+        Returns the throughput and the latency percentiles of the last replay.
+        """
+        message = f"Replayed {self.events} events in {self.elapsed:.3f}s ({self.events / max(self.elapsed, 1e-9):.0f} events/s)"
+        if len(self.latencies):
+            p50, p99, p999 = np.percentile(self.latencies, [50, 99, 99.9]) * 1e6
+            message += f" | latency p50 {p50:.1f}us, p99 {p99:.1f}us, p99.9 {p999:.1f}us, max {self.latencies.max() * 1e6:.1f}us"
+        return message
@@ -1,134 +1,514 @@
 import asyncio
-import os
 import logging
-from services.config import LOG_WEBSOCKET_PRICES
-from kucoin_universal_sdk.api.client import DefaultClient
-from kucoin_universal_sdk.generate.spot.spot_public.model_ticker_event import TickerEvent
-from kucoin_universal_sdk.generate.futures.futures_public.model_ticker_v2_event import TickerV2Event
-from kucoin_universal_sdk.generate.spot.spot_public.ws_spot_public import SpotPublicWS
-from kucoin_universal_sdk.generate.futures.futures_public.ws_futures_public import FuturesPublicWS
-from kucoin_universal_sdk.model.client_option import ClientOptionBuilder
-from kucoin_universal_sdk.model.constants import GLOBAL_API_ENDPOINT, GLOBAL_FUTURES_API_ENDPOINT
-from kucoin_universal_sdk.model.websocket_option import WebSocketClientOptionBuilder
+import random
+import threading
+import time
+from typing import TYPE_CHECKING
+from services.config import LOG_WEBSOCKET_PRICES, get_settings
+from services.price_book import PriceBook, default_price_book
+from utils.latency import latency_metrics
 
-from dotenv import load_dotenv, find_dotenv
+# The SDK is imported when the first WebSocket is created, see services.config
+if TYPE_CHECKING:
+    from kucoin_universal_sdk.generate.spot.spot_public.model_ticker_event import TickerEvent
+    from kucoin_universal_sdk.generate.spot.spot_public.model_all_tickers_event import AllTickersEvent
+    from kucoin_universal_sdk.generate.futures.futures_public.model_ticker_v2_event import TickerV2Event
+    from kucoin_universal_sdk.model.websocket_option import WebSocketEvent
 
-load_dotenv(find_dotenv())
+# KuCoin accepts at most 100 symbols in a single ticker subscription
+SPOT_TICKER_BATCH_SIZE = 100
+SPOT_TICKER_TOPIC_PREFIX = "/market/ticker:"
+FUTURES_TICKER_TOPIC_PREFIX = "/contractMarket/tickerV2:"
+
+# Connection supervision, see SubscriptionManager.run : KuCoin answers a heartbeat every 18 seconds, so a connection
+# silent for WEBSOCKET_MAX_SILENCE seconds is dead. Reconnections back off exponentially up to MAX_RECONNECT_BACKOFF seconds.
+WEBSOCKET_MAX_SILENCE = 30
+SUPERVISOR_CHECK_INTERVAL = 1
+MIN_RECONNECT_BACKOFF = 0.5
+MAX_RECONNECT_BACKOFF = 60
+# The SDK does not reconnect the supervised connections by itself, so a drop ends with EVENT_CLIENT_FAIL.
+# WebSocketEvent member names, resolved by SubscriptionManager once the SDK is imported
+CONNECTION_LOST_EVENTS = ("EVENT_CLIENT_FAIL", "EVENT_DISCONNECTED", "EVENT_RE_SUBSCRIBE_ERROR")
 
 class WebSocketSymbol:
-    def __init__(self, symbol):
+    """
+    Handle on one symbol of a PriceBook : prices are not stored in the object itself but in the book's arrays,
+    at the symbol's id.
+    """
+    __slots__ = ("symbol", "type", "symbol_id", "price_book", "listeners")
+
+    def __init__(self, symbol, price_book: PriceBook = None):
         self.symbol = symbol
-        self.bestAskPrice = 0
-        self.bestBidPrice = 0
+        self.price_book = price_book if price_book is not None else default_price_book
+        self.symbol_id = self.price_book.add_symbol(symbol)
+        self.listeners = []
 
         if "-" in self.symbol:
             self.type = "spot"
         else:
             self.type = "futures"
+
+    def __str__(self):
+        return self.symbol
+
+    @property
+    def bestAskPrice(self):
+        return float(self.price_book.ask[self.symbol_id])
+
+    @property
+    def bestBidPrice(self):
+        return float(self.price_book.bid[self.symbol_id])
     
-    def isOperational(self):
-        return self.bestAskPrice != 0 and self.bestBidPrice != 0
+    def isOperational(self, max_age: float = None):
+        return self.price_book.is_operational(self.symbol_id, max_age)
+
+    def add_listener(self, listener):
+        """
+        Registers a callable called with this symbol after each price update.
+        Listeners run on the SDK's WebSocket thread, so they must be fast and thread-safe.
+        """
+        self.listeners.append(listener)
     
-    def updatePrices(self, data):
+    def updatePrices(self, data, receive_time: int = None):
+        """
+        Writes an event into the price book, then calls the listeners.
+
+        Args:
+            data (TickerEvent | TickerV2Event): The ticker event.
+            receive_time (int): time.time_ns() when the event was received, to measure the latency (see utils.latency).
+        """
         if self.type == "spot":
             self.updatePricesSpot(data)
         else:
             self.updatePricesFutures(data)
+        if receive_time is not None and latency_metrics.enabled:
+            latency_metrics.record_update(self.symbol, receive_time, int(self.price_book.exchange_time[self.symbol_id]))
+        for listener in self.listeners:
+            listener(self)
 
-    def updatePricesSpot(self, data: TickerEvent):
-        self.bestAskPrice = float(data.best_ask)
-        self.bestBidPrice = float(data.best_bid)
-        if LOG_WEBSOCKET_PRICES: logging.info(f"[SPOT PRICE] {self.symbol}: Best Ask Price={self.bestAskPrice}, Best Bid Price={self.bestBidPrice}")
+    def updatePricesSpot(self, data: "TickerEvent"):
+        self.price_book.update(self.symbol_id, float(data.best_bid), float(data.best_ask),
+                               float(data.best_bid_size or 0), float(data.best_ask_size or 0),
+                               data.time or 0, int(data.sequence or 0), float(data.price or 0), float(data.size or 0))
+        if LOG_WEBSOCKET_PRICES: logging.info("[SPOT PRICE] %s: Best Ask Price=%s, Best Bid Price=%s", self.symbol, self.bestAskPrice, self.bestBidPrice)
 
-    def updatePricesFutures(self, data: TickerV2Event):
-        self.bestAskPrice = float(data.best_ask_price)
-        self.bestBidPrice = float(data.best_bid_price)
-        if LOG_WEBSOCKET_PRICES: logging.info(f"[FUTURES PRICE] {self.symbol}: Best Ask Price={self.bestAskPrice}, Best Bid Price={self.bestBidPrice}")
+    def updatePricesFutures(self, data: "TickerV2Event"):
+        # Futures timestamps are in nanoseconds
+        self.price_book.update(self.symbol_id, float(data.best_bid_price), float(data.best_ask_price),
+                               data.best_bid_size or 0, data.best_ask_size or 0,
+                               (data.ts or 0) // 1_000_000, data.sequence or 0)
+        if LOG_WEBSOCKET_PRICES: logging.info("[FUTURES PRICE] %s: Best Ask Price=%s, Best Bid Price=%s", self.symbol, self.bestAskPrice, self.bestBidPrice)
 
 
-def initialize_websocket():
+def initialize_websocket(event_callback=None, reconnect: bool = True):
     """
     Initializes the Kucoin WebSocket client.
+
+    Args:
+        event_callback (callable): Optional callback receiving the connection events (WebSocketEvent, message, error).
+        reconnect (bool): Whether the SDK reconnects and resubscribes by itself after a disconnection.
+            The connections of a SubscriptionManager are restarted by the manager instead.
     """
-    # Retrieve API credentials from environment variables
-    key = os.getenv("KUCOINBOT_API_KEY", "")
-    secret = os.getenv("KUCOINBOT_API_SECRET", "")
-    passphrase = os.getenv("KUCOINBOT_API_PASSPHRASE", "")
+    from kucoin_universal_sdk.api.client import DefaultClient
+    from kucoin_universal_sdk.model.client_option import ClientOptionBuilder
+    from kucoin_universal_sdk.model.websocket_option import WebSocketClientOptionBuilder
+
+    settings = get_settings()
 
     # Set WebSocket options
-    ws_client_option = WebSocketClientOptionBuilder().build()
+    ws_client_option_builder = WebSocketClientOptionBuilder().with_reconnect(reconnect)
+    if event_callback is not None:
+        ws_client_option_builder.with_event_callback(event_callback)
+    ws_client_option = ws_client_option_builder.build()
 
     # Create a client using the specified options
     client_option = (
         ClientOptionBuilder()
-        .set_key(key)
-        .set_secret(secret)
-        .set_passphrase(passphrase)
+        .set_key(settings.api_key)
+        .set_secret(settings.api_secret)
+        .set_passphrase(settings.api_passphrase)
         .set_websocket_client_option(ws_client_option)
-        .set_spot_endpoint(GLOBAL_API_ENDPOINT)
-        .set_futures_endpoint(GLOBAL_FUTURES_API_ENDPOINT)
+        .set_spot_endpoint(settings.spot_endpoint)
+        .set_futures_endpoint(settings.futures_endpoint)
         .build()
     )
     client = DefaultClient(client_option)
     return client.ws_service()
 
-async def subscribe_to_spot_price(spot_ws: SpotPublicWS, symbol: WebSocketSymbol):
+async def subscribe_to_spot_price(symbol: WebSocketSymbol):
     """
-    Subscribes to real-time spot price updates for the specified trading pair.
-    
+    Subscribes to real-time spot price updates for the specified trading pair, until cancelled.
+    The connection is supervised, see SubscriptionManager.run.
+
+    Args:
+        symbol (WebSocketSymbol): The trading pair symbol (e.g., 'BTC-USDT').
+    """
+    subscription_manager = SubscriptionManager()
+    try:
+        subscription_manager.subscribe([symbol])
+    except Exception as e:
+        logging.error(f"[SPOT] Error: {e}")
+        subscription_manager.stop()
+        return
+    await subscription_manager.run()
+
+async def subscribe_to_futures_price(symbol: WebSocketSymbol):
+    """
+    Subscribes to real-time futures price updates for the specified contract, until cancelled.
+    The connection is supervised, see SubscriptionManager.run.
+
     Args:
-        spot_ws (SpotPublicWS): The Spot WebSocket client instance.
-        symbol (str): The trading pair symbol (e.g., 'BTC-USDT').
+        symbol (WebSocketSymbol): The futures contract symbol (e.g., 'XBTUSDTM').
     """
+    subscription_manager = SubscriptionManager()
     try:
-        # Start WebSocket
-        spot_ws.start()
+        subscription_manager.subscribe([symbol])
+    except Exception as e:
+        logging.error(f"[FUTURES] Error: {e}")
+        subscription_manager.stop()
+        return
+    await subscription_manager.run()
 
-        # Define callback function to handle ticker events
-        def ticker_event_callback(topic: str, subject: str, data: TickerEvent) -> None:
-            symbol.updatePrices(data)
-            # logging.info(f"[SPOT PRICE] {symbol}: Best Ask Price={data.best_ask}, Best Bid Price={data.best_bid}")
-            # logging.info(f"received ticker event {data.to_json()}")
 
-        # Subscribe to ticker updates
-        sub_id = spot_ws.ticker([symbol.symbol], ticker_event_callback)
-        logging.info(f"[SPOT] Subscribed to price updates for {symbol} with subscription ID: {sub_id}")
+class SupervisedConnection:
+    """
+    One public WebSocket of a SubscriptionManager : its symbols, the subscriptions to restore when it is restarted,
+    and its health. `generation` changes each time the WebSocket is replaced, so late events of a stopped
+    WebSocket are ignored.
+    """
+    __slots__ = ("name", "open_ws", "symbols", "subscriptions", "ws", "generation", "lock", "last_message_time",
+                 "connected_time", "failed", "down_since", "backoff", "next_attempt", "reconnects")
 
-        # Keep the WebSocket connection alive
-        await asyncio.Event().wait()  # Keeps the coroutine alive without blocking
+    def __init__(self, name: str, open_ws):
+        self.name = name
+        # Creates the SDK WebSocket from a WebSocket service
+        self.open_ws = open_ws
+        self.symbols = {}
+        # [method name, arguments, subscription ID on the current WebSocket] of each subscription, replayed on a new WebSocket
+        self.subscriptions = []
+        self.ws = None
+        self.generation = 0
+        self.lock = threading.RLock()
+        self.last_message_time = 0.0
+        self.connected_time = 0.0
+        self.failed = False
+        self.down_since = None
+        self.backoff = 0.0
+        self.next_attempt = 0.0
+        self.reconnects = 0
+
+    def schedule_retry(self) -> None:
+        """
+        Schedules the next reconnection attempt, the delay doubling (with jitter) after each consecutive failure.
+        """
+        self.next_attempt = time.monotonic() + self.backoff * random.uniform(1, 1.5)
+        self.backoff = min(max(2 * self.backoff, MIN_RECONNECT_BACKOFF), MAX_RECONNECT_BACKOFF)
 
-    except Exception as e:
-        logging.error(f"[SPOT] Error: {e}")
-    finally:
-        spot_ws.stop()
 
-async def subscribe_to_futures_price(futures_ws: FuturesPublicWS, symbol: WebSocketSymbol):
+class SubscriptionManager:
     """
-    Subscribes to real-time futures price updates for the specified trading pair.
-    
+    Shares one spot and one futures public WebSocket between every subscribed symbol.
+    Each WebSocket is started once, spot tickers are subscribed in batches of symbols,
+    and every event is routed to its WebSocketSymbol with a dict lookup on the topic,
+    so no coroutine nor callback is created per symbol.
+    The connections are supervised while run() is awaited, see run.
+
     Args:
-        futures_ws (FuturesPublicWS): The Futures WebSocket client instance.
-        symbol (str): The futures contract symbol (e.g., 'XBTUSDTM').
+        recorder (TickRecorder): Optional recorder receiving every raw ticker event, see services.tick_recorder.
+        max_silence (float): Seconds without any message nor heartbeat after which a connection is considered dead.
+        ws_service_factory (callable): Creates a WebSocket service, see initialize_websocket.
     """
-    try:
-        # Start WebSocket
-        futures_ws.start()
+    def __init__(self, recorder=None, max_silence: float = WEBSOCKET_MAX_SILENCE, ws_service_factory=initialize_websocket):
+        self.recorder = recorder
+        self.max_silence = max_silence
+        self.ws_service_factory = ws_service_factory
+        self.spot = SupervisedConnection("SPOT", lambda ws_service: ws_service.new_spot_public_ws())
+        self.futures = SupervisedConnection("FUTURES", lambda ws_service: ws_service.new_futures_public_ws())
+        self.spot_symbols = self.spot.symbols
+        self.futures_symbols = self.futures.symbols
+        self.subscription_ids = []
+        self.all_tickers_subscription_id = None
+        self._loop = None
+        self._connection_failed = None
+        self._message_received = None
+        self._pong_received = None
+        self._connection_lost_events = ()
 
-        # Define callback function to handle ticker events
-        def ticker_event_v2_callback(topic: str, subject: str, data: TickerV2Event) -> None:
-            symbol.updatePrices(data)
-            # logging.info(f"received ticker event {data.to_json()}")
-            # logging.info(f"[FUTURES PRICE] {symbol}: Best Ask Price={data.best_ask_price}, Best Bid Price={data.best_bid_price}")
+    def _connect(self, connection: SupervisedConnection):
+        """
+        Starts the WebSocket of a connection if needed, with its lock held.
+        Each WebSocket has its own service, so its events can be told apart from the other connection's.
+        """
+        if connection.ws is None:
+            if self._message_received is None:
+                from kucoin_universal_sdk.model.websocket_option import WebSocketEvent
+                self._message_received = WebSocketEvent.EVENT_MESSAGE_RECEIVED
+                self._pong_received = WebSocketEvent.EVENT_PONG_RECEIVED
+                self._connection_lost_events = tuple(WebSocketEvent[name] for name in CONNECTION_LOST_EVENTS)
+            connection.generation += 1
+            generation = connection.generation
+            ws_service = self.ws_service_factory(
+                lambda event, message, error: self._on_websocket_event(connection, generation, event, error), reconnect=False)
+            ws = connection.open_ws(ws_service)
+            connection.last_message_time = connection.connected_time = time.monotonic()
+            ws.start()
+            connection.ws = ws
+        return connection.ws
 
-        # Subscribe to ticker updates
-        sub_id = futures_ws.ticker_v2(symbol.symbol, ticker_event_v2_callback)
-        logging.info(f"[FUTURES] Subscribed to price updates for {symbol} with subscription ID: {sub_id}")
+    def _stop_ws(self, connection: SupervisedConnection, ws) -> None:
+        try:
+            ws.stop()
+        except Exception as e:
+            logging.warning(f"[{connection.name}] Error stopping the WebSocket: {e}")
 
-        # Keep the WebSocket connection alive
-        while True:
-            await asyncio.sleep(60)
+    def _close(self, connection: SupervisedConnection) -> None:
+        ws, connection.ws = connection.ws, None
+        # Events of the stopped WebSocket are ignored from now on
+        connection.generation += 1
+        if ws is not None:
+            self._stop_ws(connection, ws)
 
-    except Exception as e:
-        logging.error(f"[FUTURES] Error: {e}")
-    finally:
-        futures_ws.stop()
\ No newline at end of file
+    def _subscribe(self, connection: SupervisedConnection, method: str, *args) -> str:
+        """
+        Subscribes on a connection, and records the subscription to restore it after a restart.
+        """
+        with connection.lock:
+            sub_id = getattr(self._connect(connection), method)(*args)
+            connection.subscriptions.append([method, args, sub_id])
+        self.subscription_ids.append(sub_id)
+        return sub_id
+
+    def _unsubscribe(self, connection: SupervisedConnection, method: str, matches) -> int:
+        """
+        Unsubscribes the subscriptions of a connection made with `method` whose arguments satisfy `matches`,
+        so they are not restored after a restart either.
+
+        Returns:
+            int: The number of subscriptions removed.
+        """
+        with connection.lock:
+            removed = [subscription for subscription in connection.subscriptions if subscription[0] == method and matches(*subscription[1])]
+            for subscription in removed:
+                connection.subscriptions.remove(subscription)
+                if subscription[2] in self.subscription_ids:
+                    self.subscription_ids.remove(subscription[2])
+                # A failed WebSocket is replaced without the subscription anyway
+                if connection.ws is not None and not connection.failed:
+                    try:
+                        connection.ws.unsubscribe(subscription[2])
+                    except Exception as e:
+                        logging.warning(f"[{connection.name}] Error unsubscribing {subscription[2]}: {e}")
+        return len(removed)
+
+    def subscribe(self, symbols: list) -> None:
+        """
+        Subscribes to the ticker of every symbol not subscribed yet.
+
+        Args:
+            symbols (list): List of WebSocketSymbol, spot and futures symbols can be mixed.
+        """
+        spot_symbols = [symbol for symbol in symbols if symbol.type == "spot" and symbol.symbol not in self.spot_symbols]
+        futures_symbols = [symbol for symbol in symbols if symbol.type == "futures" and symbol.symbol not in self.futures_symbols]
+
+        for symbol in spot_symbols:
+            self.spot_symbols[symbol.symbol] = symbol
+        for batch_start in range(0, len(spot_symbols), SPOT_TICKER_BATCH_SIZE):
+            batch = [symbol.symbol for symbol in spot_symbols[batch_start:batch_start + SPOT_TICKER_BATCH_SIZE]]
+            sub_id = self._subscribe(self.spot, "ticker", batch, self._on_spot_ticker)
+            logging.info(f"[SPOT] Subscribed to price updates for {len(batch)} symbols with subscription ID: {sub_id}")
+
+        # The futures ticker topic only accepts one symbol, but every subscription shares the same callback
+        for symbol in futures_symbols:
+            self.futures_symbols[symbol.symbol] = symbol
+            sub_id = self._subscribe(self.futures, "ticker_v2", symbol.symbol, self._on_futures_ticker)
+            logging.info(f"[FUTURES] Subscribed to price updates for {symbol.symbol} with subscription ID: {sub_id}")
+
+    def subscribe_all_spot_tickers(self, symbols: list) -> None:
+        """
+        Subscribes once to the tickers of the whole spot market, which avoids the per-connection topic limit
+        when following hundreds of symbols. Events of symbols that were not registered are ignored.
+
+        Args:
+            symbols (list): List of spot WebSocketSymbol to update.
+        """
+        for symbol in symbols:
+            self.spot_symbols[symbol.symbol] = symbol
+        if self.all_tickers_subscription_id is None:
+            self.all_tickers_subscription_id = self._subscribe(self.spot, "all_tickers", self._on_all_spot_tickers)
+            logging.info(f"[SPOT] Subscribed to price updates for all symbols with subscription ID: {self.all_tickers_subscription_id}")
+
+    def subscribe_order_book_increments(self, symbols: list, callback) -> None:
+        """
+        Subscribes to the level-2 incremental updates of spot symbols, in batches, with a single callback.
+        After a reconnection, the sequence gap makes the books resynchronize, see services.order_book.
+
+        Args:
+            symbols (list): Spot trading pair symbols (str).
+            callback (callable): Called with (topic, subject, OrderbookIncrementEvent) on the WebSocket thread.
+        """
+        for batch_start in range(0, len(symbols), SPOT_TICKER_BATCH_SIZE):
+            batch = symbols[batch_start:batch_start + SPOT_TICKER_BATCH_SIZE]
+            sub_id = self._subscribe(self.spot, "orderbook_increment", batch, callback)
+            logging.info(f"[SPOT] Subscribed to level-2 updates for {len(batch)} symbols with subscription ID: {sub_id}")
+
+    def subscribe_market_snapshots(self, markets: list, callback) -> None:
+        """
+        Subscribes to the snapshots of every symbol of spot markets (pushed every 2 seconds), with a single callback.
+
+        Args:
+            markets (list): Spot markets (e.g., 'USDS', 'BTC').
+            callback (callable): Called with (topic, subject, MarketSnapshotEvent) on the WebSocket thread.
+        """
+        for market in markets:
+            sub_id = self._subscribe(self.spot, "market_snapshot", market, callback)
+            logging.info(f"[SPOT] Subscribed to the {market} market snapshots with subscription ID: {sub_id}")
+
+    def unsubscribe_market_snapshots(self, markets: list) -> None:
+        """
+        Unsubscribes from the snapshots of spot markets subscribed by subscribe_market_snapshots.
+
+        Args:
+            markets (list): Spot markets (e.g., 'USDS', 'BTC').
+        """
+        markets = set(markets)
+        removed = self._unsubscribe(self.spot, "market_snapshot", lambda market, callback: market in markets)
+        logging.info(f"[SPOT] Unsubscribed from {removed} market snapshots")
+
+    def _on_all_spot_tickers(self, topic: str, subject: str, data: "AllTickersEvent") -> None:
+        receive_time = time.time_ns()
+        # The symbol of an all tickers event is its subject
+        symbol = self.spot_symbols.get(subject)
+        if symbol is not None and not self.spot.failed:
+            if self.recorder is not None:
+                self.recorder.record_ticker(subject, data)
+            symbol.updatePrices(data, receive_time)
+
+    def _on_spot_ticker(self, topic: str, subject: str, data: "TickerEvent") -> None:
+        receive_time = time.time_ns()
+        symbol = self.spot_symbols.get(topic[len(SPOT_TICKER_TOPIC_PREFIX):])
+        if symbol is not None and not self.spot.failed:
+            if self.recorder is not None:
+                self.recorder.record_ticker(symbol.symbol, data)
+            symbol.updatePrices(data, receive_time)
+
+    def _on_futures_ticker(self, topic: str, subject: str, data: "TickerV2Event") -> None:
+        receive_time = time.time_ns()
+        symbol = self.futures_symbols.get(topic[len(FUTURES_TICKER_TOPIC_PREFIX):])
+        if symbol is not None and not self.futures.failed:
+            if self.recorder is not None:
+                self.recorder.record_ticker(symbol.symbol, data)
+            symbol.updatePrices(data, receive_time)
+
+    def _on_websocket_event(self, connection: SupervisedConnection, generation: int, event: "WebSocketEvent", error: str) -> None:
+        """
+        Called by the SDK threads for every event of a connection's WebSocket, messages and heartbeats included.
+        """
+        if generation != connection.generation:
+            return
+        if event is self._message_received or event is self._pong_received:
+            connection.last_message_time = time.monotonic()
+            if connection.down_since is not None and event is self._message_received:
+                logging.info(f"[{connection.name}] Prices flowing again after {connection.last_message_time - connection.down_since:.1f}s")
+                connection.down_since = None
+        elif event in self._connection_lost_events:
+            self._on_connection_lost(connection, f"{event} {error}".strip())
+
+    def _on_connection_lost(self, connection: SupervisedConnection, reason: str) -> None:
+        if connection.failed:
+            return
+        now = time.monotonic()
+        # The backoff only grows while the connection keeps dropping soon after being restored
+        if now - connection.connected_time > MAX_RECONNECT_BACKOFF:
+            connection.backoff = 0.0
+        connection.schedule_retry()
+        connection.failed = True
+        # The ticker callbacks skip a failed connection, so its prices stay invalid during the whole outage,
+        # whether or not the next reconnection succeeds
+        self._invalidate(connection)
+        if connection.down_since is None:
+            connection.down_since = now
+        logging.warning(f"[{connection.name}] WebSocket lost ({reason}), reconnecting")
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._connection_failed.set)
+
+    def _invalidate(self, connection: SupervisedConnection) -> None:
+        for symbol in list(connection.symbols.values()):
+            symbol.price_book.invalidate((symbol.symbol_id,))
+
+    def _restart(self, connection: SupervisedConnection) -> None:
+        """
+        Replaces the WebSocket of a connection and restores its subscriptions (blocking).
+        The prices of its symbols are invalidated when the connection is lost (see _on_connection_lost), and again once
+        the old WebSocket is stopped, in case it wrote a late update, before the new one is subscribed.
+        They become valid again with their first update.
+        """
+        with connection.lock:
+            ws, connection.ws = connection.ws, None
+            connection.generation += 1
+            # The SDK takes about a second to stop a WebSocket, the new one connects meanwhile
+            stopping = threading.Thread(target=self._stop_ws, args=(connection, ws), daemon=True) if ws is not None else None
+            if stopping is not None:
+                stopping.start()
+            try:
+                ws = self._connect(connection)
+            finally:
+                if stopping is not None:
+                    stopping.join()
+            self._invalidate(connection)
+            connection.failed = False
+            for subscription in connection.subscriptions:
+                subscription[2] = getattr(ws, subscription[0])(*subscription[1])
+
+    async def _reconnect(self, connection: SupervisedConnection) -> None:
+        try:
+            await asyncio.to_thread(self._restart, connection)
+        except Exception as e:
+            connection.failed = True
+            connection.schedule_retry()
+            logging.error(f"[{connection.name}] Reconnection failed, next attempt in {connection.next_attempt - time.monotonic():.1f}s: {e}")
+            return
+        connection.reconnects += 1
+        logging.info(f"[{connection.name}] Reconnected, {len(connection.subscriptions)} subscriptions restored")
+
+    async def run(self) -> None:
+        """
+        Supervises the WebSocket connections until cancelled, then stops them.
+
+        A connection that drops, or receives neither message nor heartbeat for max_silence seconds, is restarted
+        with an exponential backoff and its subscriptions are restored. The prices of its symbols are invalidated
+        meanwhile, so the strategies skip them until they are updated by the new connection.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._connection_failed = asyncio.Event()
+        reconnections = {}
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._connection_failed.wait(), SUPERVISOR_CHECK_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                self._connection_failed.clear()
+
+                for connection in (self.spot, self.futures):
+                    silence = time.monotonic() - connection.last_message_time
+                    if connection.ws is not None and not connection.failed and silence > self.max_silence:
+                        self._on_connection_lost(connection, f"silent for {silence:.0f}s")
+                    # Each connection is restarted by its own task, so a slow restart does not delay the other one
+                    if connection.failed and time.monotonic() >= connection.next_attempt and connection.name not in reconnections:
+                        reconnections[connection.name] = asyncio.create_task(self._reconnect(connection))
+                        reconnections[connection.name].add_done_callback(lambda _, name=connection.name: reconnections.pop(name, None))
+        finally:
+            for reconnection in list(reconnections.values()):
+                reconnection.cancel()
+            self.stop()
+
+    def stop(self) -> None:
+        for connection in (self.spot, self.futures):
+            with connection.lock:
+                self._close(connection)
+                connection.symbols.clear()
+                connection.subscriptions.clear()
+                connection.failed = False
+                connection.down_since = None
+        self.subscription_ids.clear()
+        self.all_tickers_subscription_id = None
@@ -0,0 +1,113 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from services.config import configure_logging
+from services.mock_kucoin import MockKucoinServer, MockMarket
+from utils.latency import latency_metrics
+
+DEFAULT_SYMBOLS = ["BTC-USDT", "ETH-USDT", "ETH-BTC", "SOL-USDT", "SOL-BTC", "SOL-ETH"]
+# The simulated cycles are kept out of the signal file of the live bot
+DEFAULT_SIGNAL_FILE = "data/simulated_signals.log"
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Executes triangular cycles against a local mock exchange (see run_mock_server.py), "
+                                                 "in both execution modes, and checks the fills, the unwinds and the recorded latencies.")
+    parser.add_argument("--cycles", type=int, default=5, help="Cycles executed per mode")
+    parser.add_argument("--amount", type=float, default=100, help="Amount of USDT traded per cycle")
+    parser.add_argument("--partial-fill-rate", type=float, default=0.5, help="Probability of an order being only partially filled")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the mock market and fills")
+    parser.add_argument("--signal-file", default=DEFAULT_SIGNAL_FILE, help="File the reports of the executed cycles are written to")
+    return parser.parse_args()
+
+
+def check_reports(mode: str, reports: list, failures: list) -> None:
+    """
+    Checks the reports of a mode against the latencies recorded meanwhile, adding a message to `failures` for each problem.
+    """
+    def check(condition: bool, message: str) -> None:
+        if not condition:
+            failures.append(f"{mode}: {message}")
+
+    check(len(reports) > 0, "no cycle executed")
+    orders = [state for report in reports for state in report.orders + report.unwind_orders]
+    for state in orders:
+        check(state.error is None, f"order {state.client_oid} rejected ({state.error})")
+        check(state.done and state.filled_size > 0, f"order {state.client_oid} not filled")
+    # With partial fills, some leg leaves a residual in an intermediate currency, which is traded back
+    check(any(report.unwind_orders for report in reports), "no partial fill was unwound")
+
+    # Only the orders sent at the decision measure decision_to_send : every concurrent leg, the first sequential one
+    at_decision = sum(len(report.orders) if mode == "concurrent" else 1 for report in reports)
+    histograms = latency_metrics.histograms
+    check(histograms["decision_to_send"].total == at_decision,
+          f"{histograms['decision_to_send'].total} decision_to_send latencies recorded, expected {at_decision}")
+    check(histograms["send_to_ack"].total == len(orders), f"{histograms['send_to_ack'].total} send_to_ack latencies recorded, expected {len(orders)}")
+    check(histograms["send_to_fill"].total == len(orders), f"{histograms['send_to_fill'].total} send_to_fill latencies recorded, expected {len(orders)}")
+
+
+async def simulate(server: MockKucoinServer, cycles: int, amount: float, signal_file: str) -> list:
+    # Imported once the endpoints point at the mock server
+    from services.config import get_kucoin_client, get_market_api
+    from services.execution import EXECUTION_MODES, ExecutionEngine
+    from services.symbol_metadata import SymbolMetadataCache
+    from strategies.triangle_scanner import TriangleScanner
+
+    client = get_kucoin_client()
+    symbol_metadata = SymbolMetadataCache(get_market_api(client))
+    symbol_metadata.refresh()
+    scanner = TriangleScanner(DEFAULT_SYMBOLS, symbol_metadata=symbol_metadata, trade_amounts={"USDT": amount})
+
+    failures = []
+    for mode in EXECUTION_MODES:
+        engine = ExecutionEngine(client, symbol_metadata, mode=mode, fill_timeout=2, signal_file=signal_file)
+        await engine.start()
+        engine.prepare_cycles(scanner, scanner.trade_amounts)
+        latency_metrics.enable()
+        reports = []
+        try:
+            attempts = 0
+            while len(reports) < cycles and attempts < cycles * 10:
+                for symbol in DEFAULT_SYMBOLS:
+                    bid, ask = server.market.last_quotes[symbol][:2]
+                    scanner.update_price(scanner.symbol_ids[symbol], bid, ask)
+                # Cycles with a leg under its minimum order size are skipped by the engine
+                report = await engine.execute_cycle(scanner, attempts % len(scanner.leg_symbols), time.time_ns())
+                attempts += 1
+                if report is not None:
+                    reports.append(report)
+        finally:
+            engine.stop()
+        logging.info(f"[SIMULATION] {mode}: {len(reports)} cycles executed\n{latency_metrics.summary()}")
+        check_reports(mode, reports, failures)
+    return failures
+
+
+if __name__ == "__main__":
+    # The level is given, so the settings are only read once the endpoints point at the mock server
+    configure_logging(logging.INFO, log_in_file=False)
+    arguments = parse_arguments()
+
+    server = MockKucoinServer(port=0, market=MockMarket(DEFAULT_SYMBOLS, seed=arguments.seed), rate=50,
+                              partial_fill_rate=arguments.partial_fill_rate)
+    server.random.seed(arguments.seed)
+    server.start()
+    # The mock server accepts any credentials
+    os.environ.update({"KUCOINBOT_SPOT_ENDPOINT": server.endpoint, "KUCOINBOT_FUTURES_ENDPOINT": server.endpoint,
+                       "KUCOINBOT_API_KEY": "mock", "KUCOINBOT_API_SECRET": "mock", "KUCOINBOT_API_PASSPHRASE": "mock"})
+    os.makedirs(os.path.dirname(arguments.signal_file) or ".", exist_ok=True)
+    try:
+        failures = asyncio.run(simulate(server, arguments.cycles, arguments.amount, arguments.signal_file))
+    except KeyboardInterrupt:
+        logging.info("Interrupted by user.")
+        sys.exit(1)
+    finally:
+        server.stop()
+
+    if failures:
+        logging.error("Simulation failed:\n" + "\n".join(failures))
+        sys.exit(1)
+    logging.info("Simulation passed")
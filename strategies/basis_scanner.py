@@ -0,0 +1,232 @@
+import asyncio
+import logging
+import time
+import numpy as np
+from services.websocket_management import WebSocketSymbol, SubscriptionManager
+from services.price_book import PriceBook
+from services.symbol_metadata import SymbolMetadataCache, fetch_futures_contracts, DEFAULT_TAKER_FEE_RATE
+from utils.utils import get_signal_writer, LogSampler
+from utils.latency import latency_metrics
+from services.rest_client import run_rest
+
+YEAR_MS = 365 * 24 * 3600 * 1000
+# Perpetuals never converge : their entry basis is amortized over the expected holding period (milliseconds)
+DEFAULT_HOLDING_PERIOD = 7 * 24 * 3600 * 1000
+# Dated contracts closer to their expiry are not annualized, the carry would explode
+MIN_TIME_TO_EXPIRY = 3600 * 1000
+FUNDING_REFRESH_INTERVAL = 60
+SUMMARY_LOG_INTERVAL = 60
+SUMMARY_TOP_PAIRS = 10
+
+
+def map_contracts_to_spot(contracts: list, spot_symbols: list) -> list:
+    """
+    Returns the linear contracts whose spot pair (e.g. XBTUSDTM -> BTC-USDT) is in `spot_symbols`.
+    Inverse contracts are quoted in USD and settled in the base currency, so they have no matching spot pair.
+    """
+    spot_symbols = set(spot_symbols)
+    return [contract for contract in contracts if not contract.is_inverse and contract.spot_symbol in spot_symbols]
+
+
+class BasisScanner:
+    """
+    Compares futures contracts with their spot pair, on prices streamed into a shared PriceBook.
+
+    For every mapped pair, a single vectorized pass computes the basis (futures against spot, at mid prices) and the
+    annualized carry of the two trades, crossing the spread and paying the taker fees of both legs to open and close :
+    - cash and carry : buy spot, sell the contract, and receive the funding when it is positive,
+    - reverse : sell (borrowed) spot, buy the contract, and receive the funding when it is negative.
+    Perpetual carry is the funding annualized over its interval plus the entry basis amortized over the holding period,
+    dated contract carry is the entry basis annualized over the time to expiry.
+
+    Args:
+        contracts (list): FuturesContract list, see services.symbol_metadata.fetch_futures_contracts.
+        spot_symbols (list): Spot trading pair symbols, contracts without a spot pair are ignored.
+        threshold (float): Annualized carry percentage over which a pair is reported.
+        price_book (PriceBook): Book shared with other strategies, the default one if None.
+        holding_period (int): Expected holding period of a perpetual position, in milliseconds.
+        symbol_metadata (SymbolMetadataCache): Optional spot metadata for the spot taker fees.
+        futures_market_api (MarketAPI): Optional futures market API, to refresh the funding rates in start().
+        include_reverse (bool): Also score the reverse trade, which needs to borrow the spot currency.
+    """
+    def __init__(self, contracts: list, spot_symbols: list, threshold: float = 10.0, price_book: PriceBook = None,
+                 holding_period: int = DEFAULT_HOLDING_PERIOD, symbol_metadata: SymbolMetadataCache = None,
+                 futures_market_api=None, include_reverse: bool = True):
+        self.contracts = map_contracts_to_spot(contracts, spot_symbols)
+        self.threshold = threshold
+        self.holding_period = holding_period
+        self.symbol_metadata = symbol_metadata
+        self.futures_market_api = futures_market_api
+        self.include_reverse = include_reverse
+        self.signal_writer = get_signal_writer("important.log")
+        self.summary_sampler = LogSampler(SUMMARY_LOG_INTERVAL)
+
+        self.spot_symbols = [WebSocketSymbol(contract.spot_symbol, price_book) for contract in self.contracts]
+        self.price_book = self.spot_symbols[0].price_book if self.spot_symbols else (price_book if price_book is not None else PriceBook())
+        self.futures_symbols = [WebSocketSymbol(contract.symbol, self.price_book) for contract in self.contracts]
+        self.spot_book_ids = np.array([symbol.symbol_id for symbol in self.spot_symbols], dtype=np.int64)
+        self.futures_book_ids = np.array([symbol.symbol_id for symbol in self.futures_symbols], dtype=np.int64)
+        self.is_perpetual = np.array([contract.is_perpetual for contract in self.contracts], dtype=bool)
+        self.expire_dates = np.array([contract.expire_date or 0 for contract in self.contracts], dtype=np.float64)
+        self.update_contracts(self.contracts)
+        # Pairs above the threshold at the previous pass, a pair is reported when it crosses it
+        self.reported = np.zeros(len(self.contracts), dtype=bool)
+
+        self._loop = None
+        self._price_updated = None
+        self._wake_pending = False
+        self._wake_symbol_id = 0
+        self._wake_requested_time = 0
+        for symbol in self.spot_symbols + self.futures_symbols:
+            symbol.add_listener(self.on_price_update)
+
+        logging.info(f"Mapped {len(self.contracts)} futures contracts to their spot pair")
+
+    @property
+    def websocket_symbols(self) -> list:
+        return self.spot_symbols + self.futures_symbols
+
+    def update_contracts(self, contracts: list) -> None:
+        """
+        Updates the funding rates, funding intervals and fees of the mapped contracts from a fresher contract list.
+        """
+        contracts_by_symbol = {contract.symbol: contract for contract in contracts}
+        self.contracts = [contracts_by_symbol.get(contract.symbol, contract) for contract in self.contracts]
+        self.funding_rates = np.array([contract.funding_fee_rate for contract in self.contracts], dtype=np.float64)
+        self.funding_intervals = np.array([contract.funding_interval for contract in self.contracts], dtype=np.float64)
+        spot_fees = np.array([self.symbol_metadata.taker_fee(contract.spot_symbol) if self.symbol_metadata is not None else DEFAULT_TAKER_FEE_RATE
+                              for contract in self.contracts], dtype=np.float64)
+        futures_fees = np.array([contract.taker_fee for contract in self.contracts], dtype=np.float64)
+        # Both legs are opened and closed
+        self.round_trip_fees = 2 * (spot_fees + futures_fees) * 100
+
+    def compute(self, now: float = None) -> dict:
+        """
+        Computes the basis and carry of every mapped pair.
+
+        Args:
+            now (float): Current time in milliseconds, for the time to expiry of dated contracts.
+
+        Returns:
+            dict: Arrays by name (percentages) : basis, funding (per interval), carry (annualized, best trade),
+                reverse (True when the best trade is the reverse one). NaN where a price is missing.
+        """
+        if now is None:
+            now = time.time() * 1000
+        bid, ask = self.price_book.snapshot()
+        spot_bids, spot_asks = bid[self.spot_book_ids], ask[self.spot_book_ids]
+        futures_bids, futures_asks = bid[self.futures_book_ids], ask[self.futures_book_ids]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            basis = ((futures_bids + futures_asks) / (spot_bids + spot_asks) - 1) * 100
+            carry_entry = (futures_bids / spot_asks - 1) * 100 - self.round_trip_fees
+            reverse_entry = (spot_bids / futures_asks - 1) * 100 - self.round_trip_fees
+
+            funding = self.funding_rates * 100
+            fundings_per_year = YEAR_MS / self.funding_intervals
+            time_to_expiry = np.maximum(self.expire_dates - now, MIN_TIME_TO_EXPIRY)
+            entry_periods = np.where(self.is_perpetual, YEAR_MS / self.holding_period, YEAR_MS / time_to_expiry)
+            carry = np.where(self.is_perpetual, funding * fundings_per_year, 0) + carry_entry * entry_periods
+            reverse_carry = np.where(self.is_perpetual, -funding * fundings_per_year, 0) + reverse_entry * entry_periods
+
+        reverse = self.include_reverse & (reverse_carry > carry)
+        carry = np.where(reverse, reverse_carry, carry)
+        missing = ~((spot_bids > 0) & (spot_asks > 0) & (futures_bids > 0) & (futures_asks > 0))
+        basis[missing] = np.nan
+        carry[missing] = np.nan
+        return {"basis": basis, "funding": funding, "carry": carry, "reverse": reverse}
+
+    def describe(self, index: int, result: dict) -> str:
+        contract = self.contracts[index]
+        funding_hours = self.funding_intervals[index] / 3600000
+        return (f"[BASIS] {contract.symbol} / {contract.spot_symbol} : basis {result['basis'][index]:.3f}%, "
+                f"funding {result['funding'][index]:.4f}% per {funding_hours:g}h, carry {result['carry'][index]:.1f}%/year "
+                f"({'reverse' if result['reverse'][index] else 'cash and carry'})")
+
+    def scan(self) -> list:
+        """
+        Returns the pairs crossing over the threshold since the previous scan, as (index, annualized carry), best first.
+        """
+        result = self.compute()
+        with np.errstate(invalid="ignore"):
+            above = result["carry"] > self.threshold
+        crossing = np.flatnonzero(above & ~self.reported)
+        self.reported = above
+        crossing = crossing[np.argsort(-result["carry"][crossing])]
+        for index in crossing:
+            self.signal_writer.write(self.describe(index, result))
+        if self.summary_sampler.ready():
+            logging.info(self.summary(result))
+        return [(int(index), float(result["carry"][index])) for index in crossing]
+
+    def summary(self, result: dict = None, top_pairs: int = SUMMARY_TOP_PAIRS) -> str:
+        """
+        Returns the pairs with the highest annualized carry.
+        """
+        if result is None:
+            result = self.compute()
+        carry = np.where(np.isnan(result["carry"]), -np.inf, result["carry"])
+        best = [index for index in np.argsort(-carry)[:top_pairs] if np.isfinite(carry[index])]
+        if not best:
+            return "[BASIS] no priced pair"
+        return "\n".join(self.describe(index, result) for index in best)
+
+    def on_price_update(self, symbol: WebSocketSymbol) -> None:
+        """
+        Called from the SDK's WebSocket thread once the price book is updated : wakes the evaluator.
+        """
+        if self._loop is None or self._wake_pending:
+            return
+        self._wake_pending = True
+        self._wake_symbol_id = symbol.symbol_id
+        self._wake_requested_time = time.time_ns()
+        self._loop.call_soon_threadsafe(self._price_updated.set)
+
+    async def start(self):
+        tasks = [self.websocket_main(), self.manage_scanner()]
+        if self.futures_market_api is not None:
+            tasks.append(self.run_refresh())
+        await asyncio.gather(*tasks)
+
+    async def websocket_main(self):
+        """
+        Subscribes to the spot and futures tickers of every mapped pair.
+        """
+        subscription_manager = SubscriptionManager()
+        try:
+            subscription_manager.subscribe(self.websocket_symbols)
+        except Exception as e:
+            logging.error(f"[BASIS] Error: {e}")
+            subscription_manager.stop()
+            return
+
+        await subscription_manager.run()
+
+    async def run_refresh(self) -> None:
+        """
+        Refreshes the funding rates every FUNDING_REFRESH_INTERVAL seconds, without blocking the event loop.
+        """
+        while True:
+            await asyncio.sleep(FUNDING_REFRESH_INTERVAL)
+            try:
+                self.update_contracts(await run_rest("contracts", fetch_futures_contracts, self.futures_market_api))
+            except Exception as e:
+                logging.error(f"[BASIS] Error refreshing the funding rates: {e}")
+
+    async def manage_scanner(self):
+        """
+        Rescores every pair each time a price changes.
+        """
+        logging.info(f"Starting basis scanner on {len(self.contracts)} pairs")
+        self._loop = asyncio.get_running_loop()
+        self._price_updated = asyncio.Event()
+
+        while True:
+            await self._price_updated.wait()
+            wake_time = time.time_ns()
+            wake_requested_time, wake_symbol_id = self._wake_requested_time, self._wake_symbol_id
+            self._wake_pending = False
+            self._price_updated.clear()
+            self.scan()
+            if latency_metrics.enabled:
+                latency_metrics.record_decision(wake_requested_time, wake_time, int(self.price_book.exchange_time[wake_symbol_id]))
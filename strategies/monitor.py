@@ -1,65 +1,203 @@
 import asyncio
 import logging
-from services.websocket_management import initialize_websocket, subscribe_to_spot_price, WebSocketSymbol
-
-async def monitor(spot_market_api):
-    # Initialize WebSocket
-    ws_service = initialize_websocket()
-
-    # Symbol to monitor (not yet listed)
-    new_symbol = "XOXO-USDT"
-
-    # Poll for new listings (example logic)
-    while True:
-        try:
-            # Check if the symbol exists (use the appropriate API endpoint)
-            is_listed = check_if_symbol_is_listed(spot_market_api,"XOXO")  # Implement this function using KuCoin's API
-            if is_listed:
-                logging.info(f"{new_symbol} is now listed! Subscribing to price updates...")
-                spot_ws = initialize_websocket().new_spot_public_ws()
-                await subscribe_to_spot_price(spot_ws, WebSocketSymbol(new_symbol))
-                break
-            else:
-                logging.debug(f"{new_symbol} not listed yet. Checking again in 0.1 seconds...")
-                await asyncio.sleep(0.1)
-        except Exception as e:
-            logging.error(f"Error checking for new listings: {e}")
-            await asyncio.sleep(60)
+import re
+import time
+from services.websocket_management import SubscriptionManager, WebSocketSymbol
+from services.announcements import get_new_listings
+from services.rest_client import run_rest
+
+# Listing watcher schedule (seconds) : the symbol list is polled slowly until an announcement names a target,
+# then quickly until the target is listed. Failed requests back off exponentially.
+SYMBOLS_POLL_INTERVAL = 30
+HOT_SYMBOLS_POLL_INTERVAL = 1
+ANNOUNCEMENTS_POLL_INTERVAL = 60
+MAX_POLL_BACKOFF = 300
+ANNOUNCEMENTS_PAGE_SIZE = 10
+# Markets whose snapshots (pushed every 2 seconds for each symbol) reveal a new trading symbol without any request
+DEFAULT_SNAPSHOT_MARKETS = ("USDS", "BTC")
 
 
-def check_available_symbols(spot_market_api) -> set:
+async def monitor(spot_market_api, targets: list = ("XOXO-USDT",)):
     """
-    Fetches the list of available trading symbols (pairs) from KuCoin.
+    Waits for the target symbols to be listed, then keeps streaming their prices.
+
     Args:
         spot_market_api (MarketAPI): The market API client instance for the spot market.
-    Returns:
-        set: A set of available trading symbols (e.g., {"BTC-USDT", "ETH-USDT", ...}).
+        targets (list): Symbols (e.g., 'XOXO-USDT') or currencies (e.g., 'XOXO') to watch.
     """
-    try:
-        # Fetch all available trading symbols
-        symbols_resp = spot_market_api.get_all_currencies()
-        logging.debug(f"Available symbols fetched successfully: {symbols_resp.data}.")
-        available_symbols = {symbol_data.currency for symbol_data in symbols_resp.data}
-        logging.info(f"Available symbols fetched successfully: {len(available_symbols)} symbols.")
-        return available_symbols
-    except Exception as e:
-        logging.error(f"Error fetching available symbols: {e}")
-        return set()  # Return an empty set in case of an error
-
-
-def check_if_symbol_is_listed(spot_market_api, symbol: str) -> bool:
+    subscription_manager = SubscriptionManager()
+    watcher = ListingWatcher(spot_market_api, targets, subscription_manager)
+    # The connections are supervised while watching too, so the market snapshots survive a disconnection
+    await asyncio.gather(watcher.run(), subscription_manager.run())
+
+
+class ListingWatcher:
     """
-    Checks if a symbol is listed on KuCoin's spot market.
+    Detects the listing of many target symbols at once, and subscribes to their tickers as soon as they trade.
+
+    Three signals are combined, from the cheapest to the most expensive :
+    - the market snapshot topics of the WebSocket, where a new symbol shows up without any request,
+    - the new listing announcements, which switch the announced targets to a fast poll,
+    - the symbol list, diffed against the cached set of trading symbols on an adaptive schedule.
+
     Args:
-        spot_market_api (MarketAPI): The market API client instance for the spot market.
-        symbol (str): The symbol to check (e.g., "BTC-USDT").
-    Returns:
-        bool: True if the symbol is listed, False otherwise.
+        market_api (MarketAPI): The market API client instance for the spot market.
+        targets (list): Symbols (e.g., 'XOXO-USDT') or currencies (e.g., 'XOXO') to watch.
+        subscription_manager (SubscriptionManager): Manager used for the snapshots and the ticker subscriptions, None to only detect.
+        on_listing (callable): Called with the WebSocketSymbol of each listed symbol, on the event loop.
+        snapshot_markets (list): Markets whose snapshots are watched.
+        price_book (PriceBook): Book of the created WebSocketSymbols.
     """
-    try:
-        # Fetch the symbol information
-        symbol_resp = check_available_symbols(spot_market_api)
-        return symbol in symbol_resp
-    except Exception as e:
-        logging.error(f"Error checking if {symbol} is listed: {e}")
-        return False
+    def __init__(self, market_api, targets: list, subscription_manager: SubscriptionManager = None, on_listing=None,
+                 snapshot_markets: list = DEFAULT_SNAPSHOT_MARKETS, price_book=None):
+        self.market_api = market_api
+        self.targets = set(targets)
+        self.pending_targets = set(targets)
+        self.hot_targets = set()
+        self.subscription_manager = subscription_manager
+        self.on_listing = on_listing
+        self.snapshot_markets = list(snapshot_markets)
+        self.price_book = price_book
+        # Replaced, never mutated, so the WebSocket thread can read it without a lock
+        self.known_symbols = frozenset()
+        self.listed_symbols = {}
+        self.seen_announcements = set()
+        self.requests = 0
+        self._loop = None
+        self._listed = None
+
+    def _target_of(self, symbol: str):
+        if symbol in self.targets:
+            return symbol
+        base_currency = symbol.split("-")[0]
+        return base_currency if base_currency in self.targets else None
+
+    def _on_listed(self, symbol: str, source: str) -> None:
+        target = self._target_of(symbol)
+        if target is None or symbol in self.listed_symbols:
+            return
+        self.known_symbols = self.known_symbols | {symbol}
+        websocket_symbol = WebSocketSymbol(symbol, self.price_book)
+        self.listed_symbols[symbol] = websocket_symbol
+        self.pending_targets.discard(target)
+        logging.info(f"[LISTING] {symbol} is now listed (detected by {source})! Subscribing to price updates...")
+        if self.subscription_manager is not None:
+            try:
+                self.subscription_manager.subscribe([websocket_symbol])
+            except Exception as e:
+                logging.error(f"[LISTING] Error subscribing to {symbol}: {e}")
+        if self.on_listing is not None:
+            self.on_listing(websocket_symbol)
+        self._listed.set()
+
+    def _on_market_snapshot(self, topic: str, subject: str, data) -> None:
+        # Called on the WebSocket thread for every symbol of the market, so known symbols are skipped with a set lookup
+        snapshot = data.data
+        if snapshot is None or snapshot.symbol in self.known_symbols or not snapshot.trading:
+            return
+        if self._target_of(snapshot.symbol) is not None:
+            self._loop.call_soon_threadsafe(self._on_listed, snapshot.symbol, "market snapshot")
+
+    def refresh_symbols(self) -> set:
+        """
+        Fetches the symbol list (blocking call) and returns the trading symbols missing from the cached set.
+        """
+        from kucoin_universal_sdk.generate.spot.market.model_get_all_symbols_req import GetAllSymbolsReqBuilder
+        self.requests += 1
+        symbols_resp = self.market_api.get_all_symbols(GetAllSymbolsReqBuilder().build())
+        symbols = frozenset(symbol_data.symbol for symbol_data in symbols_resp.data if symbol_data.enable_trading)
+        new_symbols = symbols - self.known_symbols
+        self.known_symbols = symbols | self.known_symbols
+        return new_symbols
+
+    def check_announcements(self) -> set:
+        """
+        Fetches the latest new listing announcements (blocking call) and returns the pending targets they name.
+        """
+        self.requests += 1
+        announcements = get_new_listings(self.market_api, ANNOUNCEMENTS_PAGE_SIZE).items or []
+        announced_targets = set()
+        for announcement in announcements:
+            if announcement.ann_id in self.seen_announcements:
+                continue
+            self.seen_announcements.add(announcement.ann_id)
+            text = f"{announcement.ann_title} {announcement.ann_desc}"
+            for target in self.pending_targets:
+                if re.search(rf"\b{re.escape(target.split('-')[0])}\b", text):
+                    announced_targets.add(target)
+        return announced_targets
+
+    async def run(self) -> None:
+        """
+        Watches until every target is listed.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._listed = asyncio.Event()
+        logging.info(f"[LISTING] Watching {len(self.targets)} targets: {', '.join(sorted(self.targets))}")
+
+        # The first load only fills the cache, targets already trading are reported at once.
+        # It is retried with the backoff of the symbol list poll, so an error at startup does not stop the watcher
+        symbols_failures = 0
+        while True:
+            try:
+                initial_symbols = await run_rest("symbols", self.refresh_symbols)
+                break
+            except Exception as e:
+                symbols_failures += 1
+                delay = min(SYMBOLS_POLL_INTERVAL * 2 ** symbols_failures, MAX_POLL_BACKOFF)
+                logging.error(f"[LISTING] Error loading the symbol list, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+        for symbol in initial_symbols:
+            self._on_listed(symbol, "symbol list")
+        if self.subscription_manager is not None and self.snapshot_markets and self.pending_targets:
+            try:
+                self.subscription_manager.subscribe_market_snapshots(self.snapshot_markets, self._on_market_snapshot)
+            except Exception as e:
+                logging.error(f"[LISTING] Error subscribing to the market snapshots: {e}")
+
+        next_symbols_poll = time.monotonic() + SYMBOLS_POLL_INTERVAL
+        next_announcements_poll = time.monotonic()
+        symbols_failures = 0
+        announcements_failures = 0
+
+        while self.pending_targets:
+            now = time.monotonic()
+            if now >= next_announcements_poll:
+                try:
+                    announced_targets = await run_rest("announcements", self.check_announcements)
+                    for target in announced_targets - self.hot_targets:
+                        logging.info(f"[LISTING] {target} announced, polling the symbol list every {HOT_SYMBOLS_POLL_INTERVAL}s")
+                        next_symbols_poll = now
+                    self.hot_targets |= announced_targets
+                    announcements_failures = 0
+                except Exception as e:
+                    announcements_failures += 1
+                    logging.error(f"[LISTING] Error fetching the announcements: {e}")
+                next_announcements_poll = now + min(ANNOUNCEMENTS_POLL_INTERVAL * 2 ** announcements_failures, MAX_POLL_BACKOFF)
+
+            if now >= next_symbols_poll:
+                interval = HOT_SYMBOLS_POLL_INTERVAL if self.hot_targets & self.pending_targets else SYMBOLS_POLL_INTERVAL
+                try:
+                    for symbol in await run_rest("symbols", self.refresh_symbols):
+                        self._on_listed(symbol, "symbol list")
+                    symbols_failures = 0
+                except Exception as e:
+                    symbols_failures += 1
+                    logging.error(f"[LISTING] Error fetching the symbol list: {e}")
+                next_symbols_poll = time.monotonic() + min(interval * 2 ** symbols_failures, MAX_POLL_BACKOFF)
+
+            # Sleep until the next poll, or until a snapshot reports a listing
+            timeout = max(0.0, min(next_symbols_poll, next_announcements_poll) - time.monotonic())
+            self._listed.clear()
+            try:
+                await asyncio.wait_for(self._listed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        logging.info(f"[LISTING] Every target is listed ({len(self.listed_symbols)} symbols, {self.requests} requests)")
+        # The snapshots of every symbol of the markets are no longer needed once nothing is pending
+        if self.subscription_manager is not None and self.snapshot_markets:
+            try:
+                self.subscription_manager.unsubscribe_market_snapshots(self.snapshot_markets)
+            except Exception as e:
+                logging.error(f"[LISTING] Error unsubscribing from the market snapshots: {e}")
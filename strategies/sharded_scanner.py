@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import time
+import numpy as np
+from services.price_book import SharedPriceBook
+from services.symbol_metadata import SymbolMetadataCache
+from services.websocket_management import WebSocketSymbol, SubscriptionManager
+from strategies.triangle_scanner import TriangleScanner
+from utils.utils import get_signal_writer
+
+# Seconds a worker sleeps when no price changed since its last pass, doubled at each idle poll up to the maximum
+# so an idle worker does not keep its core awake, and the reporter sleeps when no hit is queued
+WORKER_POLL_INTERVAL = 0.0002
+WORKER_MAX_POLL_INTERVAL = 0.005
+REPORT_POLL_INTERVAL = 0.01
+# Seconds to wait for the workers to import and build their cycles, and to report their statistics when stopped
+WORKER_START_TIMEOUT = 60
+WORKER_STOP_TIMEOUT = 10
+
+
+def run_scanner_worker(book_name: str, symbols: list, shard: int, shards: int, threshold: float, results, stop_event,
+                       symbol_metadata: SymbolMetadataCache = None, trade_amounts: dict = None) -> None:
+    """
+    Entry point of a worker process : scores one shard of the triangular cycles against the shared price book,
+    each time the prices of one of their symbols change, and sends the hits to the reporter.
+
+    Messages put in `results` : ("ready", shard), ("hit", shard, description),
+    and ("stats", shard, passes, cycles evaluated, busy seconds) once stopped.
+    """
+    price_book = SharedPriceBook(symbols, book_name)
+    scanner = TriangleScanner(symbols, threshold, price_book=price_book, symbol_metadata=symbol_metadata,
+                              trade_amounts=trade_amounts, shard=(shard, shards))
+    book_ids = scanner.book_ids
+    versions = price_book.version[book_ids].copy()
+    passes = 0
+    cycles_evaluated = 0
+    busy = 0.0
+    poll_interval = WORKER_POLL_INTERVAL
+    results.put(("ready", shard))
+
+    try:
+        while not stop_event.is_set():
+            current_versions = price_book.version[book_ids]
+            changed_symbols = np.flatnonzero(current_versions != versions)
+            if not len(changed_symbols):
+                time.sleep(poll_interval)
+                poll_interval = min(poll_interval * 2, WORKER_MAX_POLL_INTERVAL)
+                continue
+            poll_interval = WORKER_POLL_INTERVAL
+            pass_start = time.perf_counter()
+            # Versions are copied before the prices are read, so an update written meanwhile triggers another pass
+            versions = current_versions.copy()
+            cycle_indexes = scanner.cycles_for_symbols(changed_symbols)
+            for cycle_index, profit in scanner.scan(cycle_indexes):
+                results.put(("hit", shard, scanner.describe_hit(cycle_index, profit)))
+            passes += 1
+            cycles_evaluated += len(cycle_indexes)
+            busy += time.perf_counter() - pass_start
+    except KeyboardInterrupt:
+        pass
+    finally:
+        results.put(("stats", shard, passes, cycles_evaluated, busy))
+        price_book.close()
+
+
+class ShardedScanner:
+    """
+    Spreads the triangular cycles of TriangleScanner over worker processes, so the evaluation capacity grows
+    with the number of cores instead of being bound to the event loop's.
+
+    The ingestion process writes the WebSocket prices into a SharedPriceBook. Each worker attaches to it, polls the
+    versions of its symbols and rescores the cycles of its shard touching the changed ones. The hits of every
+    worker are funneled through a queue to a single reporter, which writes them to the signal file.
+
+    Args:
+        symbols (list): Spot trading pair symbols.
+        workers (int): Number of worker processes, one per core by default.
+        threshold (float): Percentage profit over which a cycle is reported.
+        symbol_metadata (SymbolMetadataCache): Optional metadata, to score the cycles net of fees (copied to each worker at start).
+        trade_amounts (dict): Optional trade amount by currency, see TriangleScanner.
+    """
+    def __init__(self, symbols: list, workers: int = None, threshold: float = 0.3, symbol_metadata: SymbolMetadataCache = None,
+                 trade_amounts: dict = None):
+        self.symbols = list(symbols)
+        self.workers = workers or os.cpu_count() or 1
+        self.threshold = threshold
+        self.trade_amounts = trade_amounts
+        self.symbol_metadata = None
+        if symbol_metadata is not None:
+            # Workers receive a copy without the API client, which cannot be pickled
+            self.symbol_metadata = SymbolMetadataCache(None, symbol_metadata.fee_discount)
+            self.symbol_metadata.symbols = symbol_metadata.symbols
+            self.symbol_metadata.version = symbol_metadata.version
+        self.price_book = SharedPriceBook(self.symbols)
+        self.websocket_symbols = [WebSocketSymbol(symbol, self.price_book) for symbol in self.symbols]
+
+        # Workers are spawned rather than forked, the SDK and the logging listener run threads in this process
+        self._context = multiprocessing.get_context("spawn")
+        self.results = self._context.Queue()
+        self._stop_event = self._context.Event()
+        self.processes = []
+        self.signal_writer = get_signal_writer("important.log")
+        self.hits = 0
+        self.shard_stats = {}
+
+    def start_workers(self) -> None:
+        """
+        Starts the worker processes and waits until each one is ready (blocking).
+        """
+        for shard in range(self.workers):
+            process = self._context.Process(target=run_scanner_worker, name=f"scanner-shard-{shard}", daemon=True,
+                                            args=(self.price_book.name, self.symbols, shard, self.workers, self.threshold,
+                                                  self.results, self._stop_event, self.symbol_metadata, self.trade_amounts))
+            process.start()
+            self.processes.append(process)
+
+        ready = 0
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+        while ready < self.workers:
+            message = self.results.get(timeout=max(deadline - time.monotonic(), 0.001))
+            if message[0] == "ready":
+                ready += 1
+            else:
+                self._handle(message)
+        logging.info(f"Started {self.workers} scanner workers on {len(self.symbols)} symbols")
+
+    def stop_workers(self) -> None:
+        """
+        Stops the workers, collects their statistics and releases the shared price book (blocking).
+        """
+        self._stop_event.set()
+        deadline = time.monotonic() + WORKER_STOP_TIMEOUT
+        try:
+            while len(self.shard_stats) < len(self.processes) and time.monotonic() < deadline:
+                self._handle(self.results.get(timeout=max(deadline - time.monotonic(), 0.001)))
+        except queue.Empty:
+            logging.warning(f"Only {len(self.shard_stats)} of {len(self.processes)} scanner workers reported their statistics")
+        for process in self.processes:
+            process.join(timeout=max(deadline - time.monotonic(), 0.1))
+            if process.is_alive():
+                process.terminate()
+        self.processes = []
+        self.price_book.close()
+
+    def _handle(self, message: tuple) -> None:
+        if message[0] == "hit":
+            self.hits += 1
+            self.signal_writer.write(message[2])
+        elif message[0] == "stats":
+            self.shard_stats[message[1]] = message[2:]
+
+    async def report(self) -> None:
+        """
+        Writes the hits of every worker to the signal file, until cancelled.
+        The queue is polled rather than read from an executor thread, which could not be cancelled and would
+        take messages from stop_workers.
+        """
+        while True:
+            try:
+                while True:
+                    self._handle(self.results.get_nowait())
+            except queue.Empty:
+                pass
+            await asyncio.sleep(REPORT_POLL_INTERVAL)
+
+    def summary(self) -> str:
+        """
+        Returns the evaluation statistics of each shard, available once the workers are stopped.
+        """
+        lines = []
+        total_rate = 0.0
+        for shard, (passes, cycles_evaluated, busy) in sorted(self.shard_stats.items()):
+            rate = cycles_evaluated / busy if busy else 0.0
+            total_rate += rate
+            lines.append(f"shard {shard}: {passes} passes, {cycles_evaluated} cycles evaluated in {busy:.3f}s busy ({rate:.0f} cycles/s)")
+        lines.append(f"{self.hits} hits, evaluation capacity {total_rate:.0f} cycles/s over {len(self.shard_stats)} workers")
+        return "\n".join(lines)
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.start_workers)
+        try:
+            await asyncio.gather(
+                self.websocket_main(),
+                self.report()
+            )
+        finally:
+            self.stop_workers()
+
+    async def websocket_main(self):
+        """
+        Subscribes to the tickers of the whole spot market and writes them into the shared price book.
+        """
+        subscription_manager = SubscriptionManager()
+        try:
+            subscription_manager.subscribe_all_spot_tickers(self.websocket_symbols)
+        except Exception as e:
+            logging.error(f"[SPOT] Error: {e}")
+            subscription_manager.stop()
+            return
+
+        await subscription_manager.run()
@@ -0,0 +1,375 @@
+import asyncio
+import logging
+import threading
+import time
+import numpy as np
+from services.websocket_management import WebSocketSymbol, SubscriptionManager
+from services.price_book import PriceBook
+from services.order_book import find_executable_size
+from services.symbol_metadata import SymbolMetadataCache
+from utils.utils import get_signal_writer
+from utils.latency import latency_metrics
+
+
+def build_triangular_cycles(symbols: list):
+    """
+    Builds every triangular cycle of the currency graph, in both directions.
+    Each currency is a node and each trading pair an edge, so a cycle is a triangle of currencies
+    where the three pairs exist.
+
+    Args:
+        symbols (list): Spot trading pair symbols (e.g., ['BTC-USDT', 'ETH-BTC', 'ETH-USDT']).
+
+    Returns:
+        tuple: (leg_symbols, leg_sells, cycle_currencies)
+            leg_symbols (np.ndarray): (cycles, 3) symbol index of each leg.
+            leg_sells (np.ndarray): (cycles, 3) True if the leg sells the base currency at the bid, False if it buys it at the ask.
+            cycle_currencies (list): Currencies visited by each cycle (e.g., ('USDT', 'BTC', 'ETH')).
+    """
+    pairs = {}
+    neighbors = {}
+    for index, symbol in enumerate(symbols):
+        base, quote = symbol.split("-")
+        pairs[(base, quote)] = index
+        neighbors.setdefault(base, set()).add(quote)
+        neighbors.setdefault(quote, set()).add(base)
+
+    def leg(from_currency, to_currency):
+        # Converting base to quote sells at the bid, converting quote to base buys at the ask
+        if (from_currency, to_currency) in pairs:
+            return pairs[(from_currency, to_currency)], True
+        return pairs[(to_currency, from_currency)], False
+
+    leg_symbols = []
+    leg_sells = []
+    cycle_currencies = []
+    for first in neighbors:
+        for second in neighbors[first]:
+            if second <= first:
+                continue
+            for third in neighbors[first] & neighbors[second]:
+                if third <= second:
+                    continue
+                for path in ((first, second, third), (first, third, second)):
+                    legs = [leg(path[0], path[1]), leg(path[1], path[2]), leg(path[2], path[0])]
+                    leg_symbols.append([symbol_index for symbol_index, _ in legs])
+                    leg_sells.append([sell for _, sell in legs])
+                    cycle_currencies.append(path)
+
+    return (np.array(leg_symbols, dtype=np.int64).reshape(-1, 3),
+            np.array(leg_sells, dtype=bool).reshape(-1, 3),
+            cycle_currencies)
+
+
+class TriangleScanner:
+    """
+    Scores every triangular cycle of the spot market at once.
+    Best bid/ask prices are read from a PriceBook (NumPy arrays indexed by symbol id), and the profit of each cycle
+    (implied price along the path against the real price, crossing the spread on each leg) is recomputed
+    as a single vectorized pass, or only for the cycles touching the updated symbols.
+    """
+    def __init__(self, symbols: list, threshold: float = 0.3, price_book: PriceBook = None, order_books: dict = None, max_amounts: dict = None,
+                 symbol_metadata: SymbolMetadataCache = None, trade_amounts: dict = None, shard: tuple = None, execution_engine=None):
+        self.symbols = list(symbols)
+        self.symbol_ids = {symbol: index for index, symbol in enumerate(self.symbols)}
+        self.threshold = threshold
+        # With metadata, cycles are scored net of taker fees, and rounded to the increments when
+        # a trade amount is given for one of their currencies (e.g. {"USDT": 100})
+        self.symbol_metadata = symbol_metadata
+        self.trade_amounts = trade_amounts or {}
+        self._metadata_version = None
+        # Level-2 books by symbol and maximum starting amount by currency, to size the hits on the book depth
+        self.order_books = order_books
+        self.max_amounts = max_amounts or {}
+        # ExecutionEngine sending the orders of the best hit with a trade amount, None to only report the hits
+        self.execution_engine = execution_engine
+        self._execution_task = None
+
+        self.price_book = price_book if price_book is not None else PriceBook(len(self.symbols))
+        self.book_ids = np.array([self.price_book.add_symbol(symbol) for symbol in self.symbols], dtype=np.int64)
+
+        self.leg_symbols, self.leg_sells, self.cycle_currencies = build_triangular_cycles(self.symbols)
+        if shard is not None:
+            # (index, count) : only every count-th cycle is kept, so the shards of a worker pool get the same mix of cycles
+            shard_index, shard_count = shard
+            self.leg_symbols = self.leg_symbols[shard_index::shard_count]
+            self.leg_sells = self.leg_sells[shard_index::shard_count]
+            self.cycle_currencies = self.cycle_currencies[shard_index::shard_count]
+        self.leg_book_ids = self.book_ids[self.leg_symbols]
+
+        # Cycles touching each symbol, stored as CSR offsets to avoid a list per symbol
+        cycle_indexes = np.repeat(np.arange(len(self.leg_symbols)), 3)
+        order = np.argsort(self.leg_symbols.ravel(), kind="stable")
+        self._symbol_cycles = cycle_indexes[order]
+        self._symbol_cycles_offsets = np.searchsorted(self.leg_symbols.ravel()[order], np.arange(len(self.symbols) + 1))
+
+        # Symbols fed by the WebSocket (or a replay), each one marks its cycles dirty
+        self.websocket_symbols = []
+        for symbol in self.symbols:
+            websocket_symbol = WebSocketSymbol(symbol, self.price_book)
+            websocket_symbol.add_listener(self.on_price_update)
+            self.websocket_symbols.append(websocket_symbol)
+
+        self._dirty_symbols = set()
+        self._dirty_lock = threading.Lock()
+        self._loop = None
+        self._price_updated = None
+        self._wake_pending = False
+        self._wake_symbol_id = 0
+        self._wake_requested_time = 0
+
+        logging.info(f"Built {len(self.leg_symbols)} triangular cycles from {len(self.symbols)} symbols")
+
+    def cycles_for_symbols(self, symbol_ids) -> np.ndarray:
+        """
+        Returns the indexes of the cycles using at least one of the symbols.
+        """
+        cycles = [self._symbol_cycles[self._symbol_cycles_offsets[symbol_id]:self._symbol_cycles_offsets[symbol_id + 1]]
+                  for symbol_id in symbol_ids]
+        if not cycles:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(cycles))
+
+    def update_price(self, symbol_id: int, best_bid: float, best_ask: float) -> None:
+        self.price_book.update(self.book_ids[symbol_id], best_bid, best_ask)
+
+    def compute_profits(self, cycle_indexes: np.ndarray = None) -> np.ndarray:
+        """
+        Computes the percentage profit of cycles, converting one unit of the first currency along the path.
+
+        Args:
+            cycle_indexes (np.ndarray): Indexes of the cycles to compute, every cycle if None.
+
+        Returns:
+            np.ndarray: Percentage profit of each cycle, NaN if one of its prices is not initialized.
+        """
+        leg_book_ids = self.leg_book_ids if cycle_indexes is None else self.leg_book_ids[cycle_indexes]
+        leg_sells = self.leg_sells if cycle_indexes is None else self.leg_sells[cycle_indexes]
+
+        bid, ask = self.price_book.snapshot()
+        bids = bid[leg_book_ids]
+        asks = ask[leg_book_ids]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = np.where(leg_sells, bids, 1 / asks)
+            profits = (rates.prod(axis=1) - 1) * 100
+        profits[~((bids > 0) & (asks > 0)).all(axis=1)] = np.nan
+        return profits
+
+    def compile_metadata(self) -> None:
+        """
+        Precompiles the symbol metadata into per-cycle arrays : legs rotated to start from the currency
+        with a trade amount, taker fee, increment and minimum amount of each leg, and the fee multiplier
+        of each cycle. Called again automatically when the metadata cache is refreshed.
+        """
+        metadata = [self.symbol_metadata.get(symbol) for symbol in self.symbols]
+        fees = np.array([self.symbol_metadata.taker_fee(symbol) for symbol in self.symbols])
+        base_increments = np.array([entry.base_increment if entry else 0 for entry in metadata])
+        quote_increments = np.array([entry.quote_increment if entry else 0 for entry in metadata])
+        base_min_sizes = np.array([entry.base_min_size if entry else 0 for entry in metadata])
+        quote_min_amounts = np.array([entry.min_quote_amount() if entry else 0 for entry in metadata])
+
+        rotations = np.zeros(len(self.leg_symbols), dtype=np.int64)
+        self.start_amounts = np.full(len(self.leg_symbols), np.nan)
+        for cycle_index, currencies in enumerate(self.cycle_currencies):
+            for currency, amount in self.trade_amounts.items():
+                if currency in currencies:
+                    rotations[cycle_index] = currencies.index(currency)
+                    self.start_amounts[cycle_index] = amount
+                    break
+
+        leg_order = (np.arange(3)[None, :] + rotations[:, None]) % 3
+        net_leg_symbols = np.take_along_axis(self.leg_symbols, leg_order, axis=1)
+        self.net_leg_book_ids = np.take_along_axis(self.leg_book_ids, leg_order, axis=1)
+        self.net_leg_sells = np.take_along_axis(self.leg_sells, leg_order, axis=1)
+
+        # Selling rounds the base quantity, buying rounds the quote funds
+        self.leg_fee_multipliers = 1 - fees[net_leg_symbols]
+        self.leg_increments = np.where(self.net_leg_sells, base_increments[net_leg_symbols], quote_increments[net_leg_symbols])
+        self.leg_min_amounts = np.where(self.net_leg_sells, base_min_sizes[net_leg_symbols], quote_min_amounts[net_leg_symbols])
+        self.fee_multipliers = self.leg_fee_multipliers.prod(axis=1)
+
+        self._metadata_version = self.symbol_metadata.version
+
+    def compute_net_profits(self, cycle_indexes: np.ndarray = None) -> np.ndarray:
+        """
+        Computes the percentage profit of cycles net of taker fees. For cycles with a trade amount, each leg's
+        amount is also rounded down to the symbol increment, and cycles below a minimum order size are excluded.
+        Each cycle costs a constant number of array operations.
+
+        Args:
+            cycle_indexes (np.ndarray): Indexes of the cycles to compute, every cycle if None.
+
+        Returns:
+            np.ndarray: Net percentage profit of each cycle, NaN if a price is missing or an order would be too small.
+        """
+        if self._metadata_version != self.symbol_metadata.version:
+            self.compile_metadata()
+        if cycle_indexes is None:
+            cycle_indexes = np.arange(len(self.leg_symbols))
+
+        leg_book_ids = self.net_leg_book_ids[cycle_indexes]
+        leg_sells = self.net_leg_sells[cycle_indexes]
+        leg_increments = self.leg_increments[cycle_indexes]
+        leg_min_amounts = self.leg_min_amounts[cycle_indexes]
+        leg_fee_multipliers = self.leg_fee_multipliers[cycle_indexes]
+        start_amounts = self.start_amounts[cycle_indexes]
+
+        bid, ask = self.price_book.snapshot()
+        bids = bid[leg_book_ids]
+        asks = ask[leg_book_ids]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = np.where(leg_sells, bids, 1 / asks)
+
+            # Without a trade amount, only the fees apply
+            profits = (rates.prod(axis=1) * self.fee_multipliers[cycle_indexes] - 1) * 100
+
+            sized = ~np.isnan(start_amounts)
+            amounts = start_amounts[sized]
+            executable = np.ones(len(amounts), dtype=bool)
+            for leg in range(3):
+                increments = leg_increments[sized, leg]
+                # The epsilon avoids losing an increment to floating point errors (e.g. 0.3 / 0.1)
+                amounts = np.where(increments > 0, np.floor(amounts / increments + 1e-9) * increments, amounts)
+                executable &= amounts >= leg_min_amounts[sized, leg]
+                amounts = amounts * rates[sized, leg] * leg_fee_multipliers[sized, leg]
+            sized_profits = (amounts / start_amounts[sized] - 1) * 100
+            sized_profits[~executable] = np.nan
+            profits[sized] = sized_profits
+
+        profits[~((bids > 0) & (asks > 0)).all(axis=1)] = np.nan
+        return profits
+
+    def describe_cycle(self, cycle_index: int) -> str:
+        currencies = self.cycle_currencies[cycle_index]
+        return " -> ".join(currencies + (currencies[0],))
+
+    def scan(self, cycle_indexes: np.ndarray = None) -> list:
+        """
+        Returns the cycles whose profit (net profit when symbol metadata is available) exceeds the threshold.
+
+        Args:
+            cycle_indexes (np.ndarray): Indexes of the cycles to scan, every cycle if None.
+
+        Returns:
+            list: List of (cycle_index, percentage_profit) tuples, best first.
+        """
+        if cycle_indexes is None:
+            cycle_indexes = np.arange(len(self.leg_symbols))
+        if self.symbol_metadata is not None:
+            profits = self.compute_net_profits(cycle_indexes)
+        else:
+            profits = self.compute_profits(cycle_indexes)
+        with np.errstate(invalid="ignore"):
+            hits = np.flatnonzero(profits > self.threshold)
+        hits = hits[np.argsort(-profits[hits])]
+        return [(int(cycle_indexes[hit]), float(profits[hit])) for hit in hits]
+
+    def cycle_legs(self, cycle_index: int, order_books: dict, start_currency: str = None):
+        """
+        Returns the legs of a cycle as (OrderBook, sells) tuples, starting from `start_currency` if given.
+        Returns None if an order book is missing.
+        """
+        legs = [(order_books.get(self.symbols[symbol_index]), bool(sells))
+                for symbol_index, sells in zip(self.leg_symbols[cycle_index], self.leg_sells[cycle_index])]
+        if any(order_book is None for order_book, _ in legs):
+            return None
+        if start_currency is not None:
+            start = self.cycle_currencies[cycle_index].index(start_currency)
+            legs = legs[start:] + legs[:start]
+        return legs
+
+    def evaluate_depth(self, cycle_index: int, start_currency: str, max_amount: float):
+        """
+        Computes the executable size and VWAP profit of a cycle by walking the level-2 order books.
+
+        Args:
+            cycle_index (int): Index of the cycle.
+            start_currency (str): Currency the cycle starts and ends with (e.g., 'USDT').
+            max_amount (float): Largest amount of the starting currency to trade.
+
+        Returns:
+            tuple: (amount, percentage profit), (0, 0) if the books are missing or the cycle is not profitable.
+        """
+        legs = self.cycle_legs(cycle_index, self.order_books or {}, start_currency)
+        if legs is None:
+            return 0.0, 0.0
+        return find_executable_size(legs, max_amount, self.threshold)
+
+    def describe_hit(self, cycle_index: int, profit: float) -> str:
+        description = f"{self.describe_cycle(cycle_index)} : {profit:.2f}%"
+        if not self.order_books:
+            return description
+        for currency in self.cycle_currencies[cycle_index]:
+            if currency in self.max_amounts:
+                amount, depth_profit = self.evaluate_depth(cycle_index, currency, self.max_amounts[currency])
+                description += f" | executable {amount:.6f} {currency} at {depth_profit:.2f}% (VWAP)"
+                break
+        return description
+
+    def on_price_update(self, symbol: WebSocketSymbol) -> None:
+        """
+        Called from the SDK's WebSocket thread once the price book is updated : marks the symbol dirty and wakes the evaluator.
+        """
+        symbol_id = self.symbol_ids[symbol.symbol]
+        with self._dirty_lock:
+            self._dirty_symbols.add(symbol_id)
+        if self._loop is None or self._wake_pending:
+            return
+        self._wake_pending = True
+        self._wake_symbol_id = symbol.symbol_id
+        self._wake_requested_time = time.time_ns()
+        self._loop.call_soon_threadsafe(self._price_updated.set)
+
+    async def start(self):
+        if self.execution_engine is not None:
+            await self.execution_engine.start()
+            self.execution_engine.prepare_cycles(self, self.trade_amounts)
+        await asyncio.gather(
+            self.websocket_main(),
+            self.manage_scanner()
+        )
+
+    async def websocket_main(self):
+        """
+        Subscribes to the tickers of the whole spot market and feeds the scanner.
+        """
+        subscription_manager = SubscriptionManager()
+        try:
+            subscription_manager.subscribe_all_spot_tickers(self.websocket_symbols)
+        except Exception as e:
+            logging.error(f"[SPOT] Error: {e}")
+            subscription_manager.stop()
+            return
+
+        await subscription_manager.run()
+
+    async def manage_scanner(self):
+        """
+        Rescores the cycles touching the symbols updated since the last pass, each time prices change.
+        """
+        logging.info(f"Starting triangle scanner on {len(self.leg_symbols)} cycles")
+        self._loop = asyncio.get_running_loop()
+        self._price_updated = asyncio.Event()
+        signal_writer = get_signal_writer("important.log")
+
+        while True:
+            await self._price_updated.wait()
+            wake_time = time.time_ns()
+            wake_requested_time, wake_symbol_id = self._wake_requested_time, self._wake_symbol_id
+            self._wake_pending = False
+            self._price_updated.clear()
+
+            with self._dirty_lock:
+                dirty_symbols, self._dirty_symbols = self._dirty_symbols, set()
+
+            hits = self.scan(self.cycles_for_symbols(dirty_symbols))
+            if hits and self.execution_engine is not None and not self.execution_engine.busy:
+                # Fired before the hits are logged : the best hit going through a currency with a trade amount
+                tradable = next((cycle_index for cycle_index, _ in hits
+                                 if any(currency in self.trade_amounts for currency in self.cycle_currencies[cycle_index])), None)
+                if tradable is not None:
+                    self._execution_task = asyncio.create_task(self.execution_engine.execute_cycle(self, tradable, time.time_ns()))
+            for cycle_index, profit in hits:
+                signal_writer.write(self.describe_hit(cycle_index, profit))
+            if latency_metrics.enabled:
+                latency_metrics.record_decision(wake_requested_time, wake_time, int(self.price_book.exchange_time[wake_symbol_id]))
@@ -1,18 +1,49 @@
 import logging
 import asyncio
-from services.websocket_management import WebSocketSymbol, subscribe_to_futures_price, subscribe_to_spot_price, initialize_websocket
-from utils.utils import log_to_file
+import time
+from services.websocket_management import WebSocketSymbol, SubscriptionManager
+from services.price_book import PriceBook
+from services.order_book import find_executable_size
+from services.symbol_metadata import SymbolMetadataCache
+from utils.utils import get_signal_writer, LogSampler
+from utils.latency import latency_metrics
+
+# Per-tick diagnostics are logged at most once every DIAGNOSTICS_LOG_INTERVAL seconds
+DIAGNOSTICS_LOG_INTERVAL = 5
 
 class TriangularArbitrage:
     """
     Class to manage the triangular arbitrage strategy.
     type: str - "spot" or "futures"
     """
-    def __init__(self, first_symbol: str, intermediary_symbol: str, last_symbol: str, type: str):
-        self.first_symbol = WebSocketSymbol(first_symbol)
-        self.intermediary_symbol = WebSocketSymbol(intermediary_symbol)
-        self.last_symbol = WebSocketSymbol(last_symbol)
+    def __init__(self, first_symbol: str, intermediary_symbol: str, last_symbol: str, type: str, price_book: PriceBook = None,
+                 order_books: dict = None, max_amount: float = None, symbol_metadata: SymbolMetadataCache = None, threshold: float = 0.3):
+        self.first_symbol = WebSocketSymbol(first_symbol, price_book)
+        self.intermediary_symbol = WebSocketSymbol(intermediary_symbol, price_book)
+        self.last_symbol = WebSocketSymbol(last_symbol, price_book)
         self.type = type
+        self.price_book = self.first_symbol.price_book
+        self.symbol_ids = [self.first_symbol.symbol_id, self.intermediary_symbol.symbol_id, self.last_symbol.symbol_id]
+        self.signal_writer = get_signal_writer("important.log")
+        self.diagnostics_sampler = LogSampler(DIAGNOSTICS_LOG_INTERVAL)
+        # Optional level-2 books by symbol, to size the hits on the book depth
+        self.order_books = order_books
+        self.max_amount = max_amount
+        # Optional symbol metadata, to flag hits on their profit net of the taker fees of the three legs
+        self.symbol_metadata = symbol_metadata
+        self.threshold = threshold
+        self.fee_multiplier = 1.0
+        self._metadata_version = None
+
+        # Price updates wake the evaluator instead of polling, see on_price_update
+        self._loop = None
+        self._price_updated = None
+        self._wake_pending = False
+        # Symbol and time of the update that scheduled the pending wake-up, for the latency metrics
+        self._wake_symbol_id = 0
+        self._wake_requested_time = 0
+        for symbol in (self.first_symbol, self.intermediary_symbol, self.last_symbol):
+            symbol.add_listener(self.on_price_update)
 
 
     async def start(self):
@@ -26,57 +57,81 @@ class TriangularArbitrage:
         """
         Main function to initialize WebSocket and subscribe to price updates.
         """
-        # Initialize WebSocket service
-        ws_service = initialize_websocket()
-
-        # Create Spot and Futures WebSocket clients
-        spot_ws = ws_service.new_spot_public_ws()
-        futures_ws = ws_service.new_futures_public_ws()
-
-        # Run all subscriptions concurrently
-        if (self.type == "spot"):
-            await asyncio.gather(
-                subscribe_to_spot_price(spot_ws, self.first_symbol),
-                subscribe_to_spot_price(spot_ws, self.intermediary_symbol),
-                subscribe_to_spot_price(spot_ws, self.last_symbol),
-            )
-        elif (self.type == "futures"):
-            await asyncio.gather(
-                subscribe_to_futures_price(futures_ws, self.first_symbol),
-                subscribe_to_futures_price(futures_ws, self.intermediary_symbol),
-                subscribe_to_futures_price(futures_ws, self.last_symbol),
-            )
-        else:
+        if self.type not in ("spot", "futures"):
             logging.error(f"Invalid type provided. Please enter 'spot' or 'futures'. Chosen : {self.type}")
+            return
+
+        # Initialize WebSocket service, the manager shares one connection between the three symbols
+        subscription_manager = SubscriptionManager()
+        try:
+            subscription_manager.subscribe([self.first_symbol, self.intermediary_symbol, self.last_symbol])
+        except Exception as e:
+            logging.error(f"[{self.type.upper()}] Error: {e}")
+            subscription_manager.stop()
+            return
+
+        await subscription_manager.run()
+
+
+    def on_price_update(self, symbol: WebSocketSymbol):
+        """
+        Called from the SDK's WebSocket thread after one of the three symbols received a new price.
+        Marks the triangle dirty and wakes the evaluator. Only one wake-up is scheduled until the evaluator runs,
+        so a burst of ticks is coalesced into a single evaluation on the latest prices.
+        """
+        if self._loop is None or self._wake_pending:
+            return
+        self._wake_pending = True
+        self._wake_symbol_id = symbol.symbol_id
+        self._wake_requested_time = time.time_ns()
+        self._loop.call_soon_threadsafe(self._price_updated.set)
 
 
     async def manage_triangular_abritrage(self):
         logging.info(f"Starting triangular arbitrage for {self.first_symbol.symbol}, {self.intermediary_symbol.symbol}, {self.last_symbol.symbol}")
 
+        self._loop = asyncio.get_running_loop()
+        self._price_updated = asyncio.Event()
+
         while not self.verify_price_initialization():
-            await asyncio.sleep(3)
-            logging.info(f"Waiting for prices to be initialized for {self.first_symbol.symbol}, {self.intermediary_symbol.symbol}, {self.last_symbol.symbol}")
+            await self._price_updated.wait()
+            self._wake_pending = False
+            self._price_updated.clear()
+        logging.info(f"Prices initialized for {self.first_symbol.symbol}, {self.intermediary_symbol.symbol}, {self.last_symbol.symbol}")
 
         while True:
-            await asyncio.sleep(0.1)
+            await self._price_updated.wait()
+            wake_time = time.time_ns()
+            wake_requested_time, wake_symbol_id = self._wake_requested_time, self._wake_symbol_id
+            # Reset before evaluating, so a tick received during the evaluation schedules a new one
+            self._wake_pending = False
+            self._price_updated.clear()
+            # Prices invalidated by a disconnection are skipped until the three symbols are updated again
+            if not self.verify_price_initialization():
+                continue
             self.calculate_triangular_arbitrage_for_ask_price()
-
-        logging.critical("wtf, this code should never be reached")
+            if latency_metrics.enabled:
+                latency_metrics.record_decision(wake_requested_time, wake_time, int(self.price_book.exchange_time[wake_symbol_id]))
 
 
 
     def calculate_triangular_arbitrage_for_ask_price(self):
+        # Consistent snapshot of the three symbols, the WebSocket thread may be writing at the same time
+        (_, _, last_bid), (first_ask, intermediary_ask, _) = self.price_book.snapshot(self.symbol_ids)
+
         # Calculate the triangular arbitrage price difference
-        implied_first_symbol_price = 1 / self.intermediary_symbol.bestAskPrice * self.last_symbol.bestBidPrice
+        implied_first_symbol_price = 1 / intermediary_ask * last_bid
         # if the implied first symbol price (ex : BTCUSDT) is more than the real price, then buying BTC, then ETH from BTC, then selling ETH is a good idea
-        real_price = self.first_symbol.bestAskPrice
+        real_price = first_ask
 
-        logging.info(f"Implied price ({self.intermediary_symbol.symbol}): {implied_first_symbol_price:.6f}")
-        self.calculate_triangular_arbitrage_price_difference(implied_first_symbol_price, real_price, "ask")
+        log_diagnostics = self.diagnostics_sampler.ready()
+        if log_diagnostics:
+            logging.info("Implied price (%s): %.6f", self.intermediary_symbol.symbol, implied_first_symbol_price)
+        self.calculate_triangular_arbitrage_price_difference(implied_first_symbol_price, real_price, "ask", log_diagnostics)
 
 
 
-    def calculate_triangular_arbitrage_price_difference(self, implied_price, real_price, direction: str):
+    def calculate_triangular_arbitrage_price_difference(self, implied_price, real_price, direction: str, log_diagnostics: bool = False):
         """
         Calculates the triangular arbitrage price difference for the chosen symbols
         
@@ -84,17 +139,59 @@ class TriangularArbitrage:
             implied_price (float): The implied price of the triangular arbitrage.
             real_price (float): The real price of the goal symbol.
             direction (str): The direction of the triangular arbitrage ("ask" or "bid").
+            log_diagnostics (bool): Log the intermediate values, see DIAGNOSTICS_LOG_INTERVAL.
         """
         price_difference = implied_price - real_price
-        logging.info(f"Price difference: {price_difference:.6f}")
-
         percentage_difference = (price_difference / real_price) * 100
-        logging.info(f"Percentage difference: {percentage_difference:.2f}%")
 
-        if (abs(percentage_difference) > 0.3):
-            log_to_file(f"Percentage difference: {percentage_difference:.2f}%", "important.log")
+        if log_diagnostics:
+            logging.info("Price difference: %.6f", price_difference)
+            logging.info("Percentage difference: %.2f%%", percentage_difference)
+
+        if self.symbol_metadata is not None:
+            # Net of the fees, only a positive difference is an opportunity on this path
+            net_percentage_difference = self.calculate_net_percentage_difference(implied_price, real_price)
+            is_opportunity = net_percentage_difference > self.threshold
+        else:
+            is_opportunity = abs(percentage_difference) > self.threshold
+
+        if is_opportunity:
+            message = f"Percentage difference: {percentage_difference:.2f}%"
+            if self.symbol_metadata is not None:
+                message += f" | net of fees: {net_percentage_difference:.2f}%"
+            if self.order_books and self.max_amount and direction == "ask":
+                amount, depth_profit = self.calculate_executable_size()
+                message += f" | executable {amount:.6f} at {depth_profit:.2f}% (VWAP)"
+            self.signal_writer.write(message)
+
+
+    def calculate_net_percentage_difference(self, implied_price, real_price):
+        """
+        Converts the price difference into the profit of the three legs net of their taker fees.
+        The product of the leg fee multipliers is precomputed from the metadata, so this is constant time.
+        """
+        if self._metadata_version != self.symbol_metadata.version:
+            self.fee_multiplier = 1.0
+            for symbol in (self.first_symbol, self.intermediary_symbol, self.last_symbol):
+                self.fee_multiplier *= 1 - self.symbol_metadata.taker_fee(symbol.symbol)
+            self._metadata_version = self.symbol_metadata.version
+        return (implied_price / real_price * self.fee_multiplier - 1) * 100
+
+
+    def calculate_executable_size(self):
+        """
+        Walks the level-2 order books along the ask path (buy the first symbol, buy the intermediary symbol,
+        sell the last symbol) to find how much of the first symbol's quote currency can be traded profitably.
+
+        Returns:
+            tuple: (amount, VWAP percentage profit).
+        """
+        legs = [(self.order_books[self.first_symbol.symbol], False),
+                (self.order_books[self.intermediary_symbol.symbol], False),
+                (self.order_books[self.last_symbol.symbol], True)]
+        return find_executable_size(legs, self.max_amount)
 
 
     def verify_price_initialization(self):
-        return (self.first_symbol.bestAskPrice != 0 and self.first_symbol.bestBidPrice != 0) and (self.intermediary_symbol.bestAskPrice != 0 and self.intermediary_symbol.bestBidPrice != 0) and (self.last_symbol.bestAskPrice != 0 and self.last_symbol.bestBidPrice != 0)
+        return self.first_symbol.isOperational() and self.intermediary_symbol.isOperational() and self.last_symbol.isOperational()
 
@@ -0,0 +1,49 @@
+import argparse
+import logging
+from datetime import datetime, timezone
+from utils.backtest import DEFAULT_FEE_RATE
+from utils.kline_store import DEFAULT_STORE_DIRECTORY
+from utils.sweep import DEFAULT_CACHE_DIRECTORY, RANKING_STATS, format_report, run_sweep
+
+
+def parse_date(value: str) -> datetime:
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Backtests a grid of moving average crossover parameters over stored candle history, "
+                                                 "on every core, and ranks the configurations. Results already computed are read from the cache.")
+    parser.add_argument("--symbols", nargs="+", required=True, help="Trading pair symbols of the kline store (e.g., BTC-USDT ETH-USDT)")
+    parser.add_argument("--interval", default="1hour", help="Kline interval")
+    parser.add_argument("--fast", nargs="+", type=int, default=[10, 20, 50], help="Windows of the fast moving average")
+    parser.add_argument("--slow", nargs="+", type=int, default=[100, 200], help="Windows of the slow moving average")
+    parser.add_argument("--fees", nargs="+", type=float, default=[DEFAULT_FEE_RATE], help="Fee rates of an order")
+    parser.add_argument("--short", action="store_true", help="Also try going short below the slow average")
+    parser.add_argument("--start", type=parse_date, default=None, help="Start date (YYYY-MM-DD), the first candle by default")
+    parser.add_argument("--end", type=parse_date, default=None, help="End date (YYYY-MM-DD, excluded), the last candle by default")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes, one per core by default")
+    parser.add_argument("--store-dir", default=DEFAULT_STORE_DIRECTORY, help="Directory of the kline store")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIRECTORY, help="Directory of the results cache")
+    parser.add_argument("--rank-by", default="sharpe", choices=RANKING_STATS, help="Statistic ranking the configurations")
+    parser.add_argument("--top", type=int, default=20, help="Number of configurations reported")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    try:
+        arguments = parse_arguments()
+        grid = {
+            "fast_window": arguments.fast,
+            "slow_window": arguments.slow,
+            "fee_rate": arguments.fees,
+            "allow_short": [False, True] if arguments.short else [False],
+        }
+        rows = run_sweep(arguments.symbols, arguments.interval, grid, arguments.workers, arguments.store_dir, arguments.cache_dir,
+                         int(arguments.start.timestamp()) if arguments.start else None, int(arguments.end.timestamp()) if arguments.end else None)
+        logging.info(f"Best configurations by {arguments.rank_by}:\n{format_report(rows, arguments.rank_by, arguments.top)}")
+
+    except KeyboardInterrupt:
+        logging.info("Interrupted by user.")
+    except Exception as e:
+        logging.error(f"Error: {e}")
@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+from utils.backtest import backtest, backtest_sma_crossover, crossover_positions, sma
+from utils.candles import Candles
+
+FEE_RATE = 0.001
+
+
+def make_candles(close: np.ndarray) -> Candles:
+    close = np.asarray(close, dtype=np.float64)
+    return Candles(time=np.arange(len(close), dtype=np.int64) * 3600, open=close, close=close, high=close, low=close,
+                   volume=np.ones(len(close)), turnover=close)
+
+
+def random_walk(length: int, seed: int = 1) -> np.ndarray:
+    return 100 * np.exp(np.cumsum(np.random.default_rng(seed).normal(0, 0.01, length)))
+
+
+def naive_sma(values: list, window: int) -> list:
+    return [sum(values[index - window + 1:index + 1]) / window if index >= window - 1 else np.nan for index in range(len(values))]
+
+
+def naive_backtest(close: list, positions: list, fee_rate: float):
+    """
+    Candle by candle reference : equity curve, and (entry index, exit index, side, net return) of each trade.
+    """
+    positions = list(positions[:-1]) + [0]
+    equity = [1 - fee_rate * abs(positions[0])]
+    for index in range(1, len(close)):
+        value = equity[-1] * (1 + positions[index - 1] * (close[index] / close[index - 1] - 1))
+        equity.append(value * (1 - fee_rate * abs(positions[index] - positions[index - 1])))
+
+    trades = []
+    entry = None
+    for index, position in enumerate(positions):
+        if entry is not None and position != positions[entry]:
+            growth = 1.0
+            for held in range(entry + 1, index + 1):
+                growth *= 1 + positions[entry] * (close[held] / close[held - 1] - 1)
+            trades.append((entry, index, positions[entry], growth * (1 - fee_rate) ** 2 - 1))
+            entry = None
+        if entry is None and position != 0 and (index == 0 or position != positions[index - 1]):
+            entry = index
+    return equity, trades
+
+
+@pytest.mark.parametrize("window", [1, 2, 7, 50])
+def test_sma_matches_a_naive_average(window):
+    values = random_walk(200)
+
+    np.testing.assert_allclose(sma(values, window), naive_sma(values.tolist(), window), rtol=1e-9)
+
+
+def test_sma_longer_than_the_values_is_undefined():
+    assert np.isnan(sma(np.arange(5.0), 6)).all()
+
+
+def test_crossover_is_flat_until_both_averages_are_defined():
+    positions = crossover_positions(random_walk(100), 3, 20)
+
+    assert (positions[:19] == 0).all()
+    assert set(positions[19:].tolist()) <= {0, 1}
+
+
+@pytest.mark.parametrize("positions_source", ["crossover", "crossover_short", "random"])
+def test_backtest_matches_a_naive_loop(positions_source):
+    close = random_walk(500)
+    if positions_source == "random":
+        # Every kind of change, flips and a position from the first candle included
+        positions = np.random.default_rng(3).integers(-1, 2, len(close)).astype(np.int8)
+    else:
+        positions = crossover_positions(close, 5, 30, positions_source == "crossover_short")
+
+    result = backtest(make_candles(close), positions, FEE_RATE)
+    equity, trades = naive_backtest(close.tolist(), positions.tolist(), FEE_RATE)
+
+    np.testing.assert_allclose(result.equity, equity, rtol=1e-9)
+    assert len(result.trades) == len(trades)
+    assert result.trades["entry_time"].tolist() == [entry * 3600 for entry, _, _, _ in trades]
+    assert result.trades["exit_time"].tolist() == [exit * 3600 for _, exit, _, _ in trades]
+    assert result.trades["side"].tolist() == [side for _, _, side, _ in trades]
+    np.testing.assert_allclose(result.trades["net_return"], [net_return for _, _, _, net_return in trades], rtol=1e-9)
+    assert result.stats["total_return"] == pytest.approx(equity[-1] - 1)
+
+
+def test_position_taken_at_the_first_close_pays_its_fee():
+    close = np.array([100.0, 101.0, 102.01])
+
+    result = backtest(make_candles(close), np.array([1, 1, 1]), FEE_RATE)
+
+    np.testing.assert_allclose(result.equity, [1 - FEE_RATE, 1.01 * (1 - FEE_RATE), 1.0201 * (1 - FEE_RATE) ** 2])
+    assert result.stats["trades"] == 1
+
+
+def test_flip_pays_the_fee_twice():
+    close = np.full(4, 100.0)
+
+    result = backtest(make_candles(close), np.array([0, 1, -1, -1]), FEE_RATE)
+
+    # Long, then short, then closed at the last candle
+    np.testing.assert_allclose(result.equity, [1.0, 1 - FEE_RATE, (1 - FEE_RATE) * (1 - 2 * FEE_RATE), (1 - FEE_RATE) ** 2 * (1 - 2 * FEE_RATE)])
+    assert result.trades["side"].tolist() == [1, -1]
+
+
+def test_sma_crossover_backtest_uses_the_crossover_positions():
+    candles = make_candles(random_walk(300, seed=2))
+
+    result = backtest_sma_crossover(candles, 5, 30, FEE_RATE)
+
+    np.testing.assert_array_equal(result.positions[:-1], crossover_positions(candles.close, 5, 30)[:-1])
+    assert result.positions[-1] == 0
+
+
+def test_backtest_rejects_mismatched_positions():
+    with pytest.raises(ValueError):
+        backtest(make_candles(random_walk(10)), np.zeros(9), FEE_RATE)
@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from utils.kline_store import KlineStore
+
+SYMBOL = "BTC-USDT"
+INTERVAL = "1hour"
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+HOUR = timedelta(hours=1)
+
+
+def hours(offset: int) -> datetime:
+    return START + offset * HOUR
+
+
+def klines(first: int, last: int, close: float = 1.0) -> list:
+    """
+    Raw kline rows of hours [first, last), newest first as returned by the klines endpoint.
+    """
+    return [[str(int(hours(offset).timestamp())), "1", str(close), "1", "1", "1", "1"] for offset in reversed(range(first, last))]
+
+
+def test_everything_is_missing_in_an_empty_store(tmp_path):
+    store = KlineStore(str(tmp_path))
+
+    assert store.missing_ranges(SYMBOL, INTERVAL, hours(0), hours(10)) == [(hours(0), hours(10))]
+
+
+def test_missing_ranges_around_and_between_covered_ranges(tmp_path):
+    store = KlineStore(str(tmp_path))
+    store.append(SYMBOL, INTERVAL, klines(2, 4), hours(2), hours(4))
+    store.append(SYMBOL, INTERVAL, klines(6, 8), hours(6), hours(8))
+
+    assert store.missing_ranges(SYMBOL, INTERVAL, hours(0), hours(10)) == [(hours(0), hours(2)), (hours(4), hours(6)), (hours(8), hours(10))]
+    assert store.missing_ranges(SYMBOL, INTERVAL, hours(2), hours(4)) == []
+    assert store.missing_ranges(SYMBOL, INTERVAL, hours(3), hours(7)) == [(hours(4), hours(6))]
+
+
+def test_append_merges_overlapping_and_adjacent_ranges(tmp_path):
+    store = KlineStore(str(tmp_path))
+    store.append(SYMBOL, INTERVAL, klines(0, 3), hours(0), hours(3))
+    store.append(SYMBOL, INTERVAL, klines(5, 8), hours(5), hours(8))
+    store.append(SYMBOL, INTERVAL, klines(2, 5), hours(2), hours(5))
+    store.append(SYMBOL, INTERVAL, klines(8, 9), hours(8), hours(9))
+
+    assert store.get_covered_ranges(SYMBOL, INTERVAL) == [(int(hours(0).timestamp()), int(hours(9).timestamp()))]
+
+
+def test_an_empty_range_is_not_marked_as_held(tmp_path):
+    store = KlineStore(str(tmp_path))
+    store.append(SYMBOL, INTERVAL, [], hours(3), hours(3))
+
+    assert store.get_covered_ranges(SYMBOL, INTERVAL) == []
+
+
+def test_load_sorts_and_deduplicates_the_appended_candles(tmp_path):
+    store = KlineStore(str(tmp_path))
+    store.append(SYMBOL, INTERVAL, klines(4, 8), hours(4), hours(8))
+    store.append(SYMBOL, INTERVAL, klines(0, 5, close=2.0), hours(0), hours(5))
+
+    candles = store.load(SYMBOL, INTERVAL)
+
+    assert candles.time.tolist() == [int(hours(offset).timestamp()) for offset in range(8)]
+    # The last appended candle of a duplicated timestamp wins
+    assert np.asarray(candles.close).tolist() == [2.0] * 5 + [1.0] * 3
+
+
+def test_appends_after_a_load_are_merged_on_the_next_load(tmp_path):
+    store = KlineStore(str(tmp_path))
+    store.append(SYMBOL, INTERVAL, klines(0, 2), hours(0), hours(2))
+    assert len(store.load(SYMBOL, INTERVAL)) == 2
+
+    store.append(SYMBOL, INTERVAL, klines(2, 3), hours(2), hours(3))
+
+    assert len(store.load(SYMBOL, INTERVAL)) == 3
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta, timezone
+from services.kucoin_services import KLINE_INTERVALS, compute_kline_windows
+
+START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def window_candles(window: tuple, interval: str) -> int:
+    return (window[1] - window[0]) // KLINE_INTERVALS[interval]
+
+
+def test_windows_are_contiguous_and_include_the_end_candle():
+    end = START + timedelta(hours=3999)
+    windows = compute_kline_windows("1hour", START, end)
+
+    assert windows[0][0] == START
+    assert windows[-1][1] == end + timedelta(hours=1)
+    for (_, previous_end), (next_start, _) in zip(windows, windows[1:]):
+        assert previous_end == next_start
+
+
+def test_windows_hold_at_most_a_batch():
+    windows = compute_kline_windows("1min", START, START + timedelta(minutes=3199), batch_size=1500)
+
+    assert [window_candles(window, "1min") for window in windows] == [1500, 1500, 200]
+
+
+def test_exact_multiple_of_the_batch_size():
+    windows = compute_kline_windows("1hour", START, START + timedelta(hours=2999), batch_size=1500)
+
+    assert [window_candles(window, "1hour") for window in windows] == [1500, 1500]
+
+
+def test_single_candle():
+    assert compute_kline_windows("1day", START, START) == [(START, START + timedelta(days=1))]
+
+
+def test_empty_when_the_end_is_before_the_start():
+    assert compute_kline_windows("1hour", START, START - timedelta(hours=2)) == []
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from utils.latency import BUCKET_VALUES, HISTOGRAM_SIZE, SUB_BUCKET_HALF_COUNT, LatencyHistogram, LatencyMetrics, _bucket_index
+
+# Bound of the relative error of a bucket, see SUB_BUCKET_BITS
+RELATIVE_ERROR = 1 / SUB_BUCKET_HALF_COUNT
+
+
+def test_every_value_falls_in_a_bucket_covering_it():
+    values = np.unique(np.concatenate((np.arange(1000), np.geomspace(1000, 2 ** 62, 2000).astype(np.int64))))
+    for value in values.tolist():
+        index = _bucket_index(value)
+        assert 0 <= index < HISTOGRAM_SIZE
+        assert value <= BUCKET_VALUES[index] <= value * (1 + RELATIVE_ERROR) + 1
+
+
+def test_bucket_indexes_grow_with_the_values():
+    indexes = [_bucket_index(value) for value in range(0, 1 << 16)]
+
+    assert indexes == sorted(indexes)
+
+
+def test_small_values_are_exact():
+    histogram = LatencyHistogram()
+    for value in range(1, 101):
+        histogram.record(value)
+
+    assert histogram.percentiles((50, 90, 100)) == [50.0, 90.0, 100.0]
+
+
+@pytest.mark.parametrize("percentile", [50, 90, 99, 99.9])
+def test_percentiles_within_the_bucket_precision(percentile):
+    latencies = np.random.default_rng(1).lognormal(mean=13, sigma=1.5, size=100_000).astype(np.int64)
+    histogram = LatencyHistogram()
+    for latency in latencies.tolist():
+        histogram.record(latency)
+
+    expected = np.percentile(latencies, percentile, method="inverted_cdf")
+    [reported] = histogram.percentiles((percentile,))
+
+    assert expected <= reported <= expected * (1 + RELATIVE_ERROR) + 1
+
+
+def test_percentiles_never_exceed_the_maximum():
+    histogram = LatencyHistogram()
+    histogram.record(1_000_003)
+
+    assert histogram.percentiles((50, 99.9)) == [1_000_003.0, 1_000_003.0]
+
+
+def test_negative_values_are_recorded_as_zero():
+    histogram = LatencyHistogram()
+    histogram.record(-5)
+
+    assert histogram.total == 1
+    assert histogram.percentiles((100,)) == [0.0]
+
+
+def test_empty_histogram():
+    assert LatencyHistogram().percentiles((50, 99)) == [0.0, 0.0]
+    assert LatencyHistogram().mean() == 0.0
+
+
+def test_merge_matches_a_single_histogram():
+    merged, first, second = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+    for value in range(0, 200_000, 7):
+        merged.record(value)
+        (first if value % 2 else second).record(value)
+
+    first.merge(second)
+
+    assert first.counts == merged.counts
+    assert (first.total, first.sum, first.max) == (merged.total, merged.sum, merged.max)
+
+
+def test_decision_to_send_is_only_recorded_with_a_decision_time():
+    metrics = LatencyMetrics()
+    metrics.enable()
+
+    metrics.record_order(1_000, 3_000, ack_time=10_000, fill_time=20_000)
+    metrics.record_order(None, 5_000, ack_time=6_000)
+
+    assert metrics.histograms["decision_to_send"].total == 1
+    assert metrics.histograms["send_to_ack"].total == 2
+    assert metrics.histograms["send_to_fill"].total == 1
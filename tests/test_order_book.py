@@ -0,0 +1,171 @@
+import threading
+from types import SimpleNamespace
+import pytest
+from services.order_book import OrderBook, OrderBookManager, find_executable_size
+from services.tick_recorder import ReplayChanges, ReplayOrderBookEvent
+
+SYMBOL = "ETH-USDT"
+
+
+def increment(sequence_start: int, sequence_end: int = None, asks: list = (), bids: list = ()) -> ReplayOrderBookEvent:
+    """
+    Level-2 update whose changes are [price, size] pairs, numbered from sequence_start.
+    """
+    sequence_end = sequence_end if sequence_end is not None else sequence_start + len(asks) + len(bids) - 1
+    sequences = iter(range(sequence_start, sequence_end + 1))
+    return ReplayOrderBookEvent(SYMBOL, sequence_start, sequence_end, 0,
+                                ReplayChanges([[str(price), str(size), str(next(sequences))] for price, size in asks],
+                                              [[str(price), str(size), str(next(sequences))] for price, size in bids]))
+
+
+def synchronized_book(sequence: int = 10) -> OrderBook:
+    order_book = OrderBook(SYMBOL)
+    assert order_book.load_snapshot(sequence, [["99", "1"], ["98", "2"]], [["101", "1"], ["102", "2"]])
+    return order_book
+
+
+def test_updates_apply_in_sequence():
+    order_book = synchronized_book()
+
+    assert order_book.apply_event(increment(11, asks=[(100.5, 3)], bids=[(99, 0)]))
+
+    assert order_book.best_ask() == (100.5, 3.0)
+    assert order_book.best_bid() == (98.0, 2.0)
+    assert order_book.sequence == 12
+
+
+def test_updates_older_than_the_book_are_ignored():
+    order_book = synchronized_book()
+
+    assert order_book.apply_event(increment(5, 10, asks=[(90, 1)]))
+
+    assert order_book.best_ask() == (101.0, 1.0)
+
+
+def test_sequence_gap_unsynchronizes_the_book():
+    order_book = synchronized_book()
+
+    assert not order_book.apply_event(increment(15, asks=[(100, 1)]))
+
+    assert not order_book.synchronized
+    assert order_book.best_bid() is None
+    assert order_book.sell_base(1) == (0.0, 0.0)
+
+
+def test_snapshot_replays_the_buffered_updates_newer_than_it():
+    order_book = synchronized_book()
+    order_book.apply_event(increment(15, asks=[(100, 1)]))
+    order_book.apply_event(increment(16, asks=[(100.2, 4)]))
+
+    assert order_book.load_snapshot(14, [["99", "1"]], [["101", "1"]])
+
+    assert order_book.synchronized
+    assert order_book.sequence == 16
+    assert order_book.asks.levels() == [(100.0, 1.0), (100.2, 4.0), (101.0, 1.0)]
+
+
+def test_snapshot_older_than_the_buffered_updates_needs_another_one():
+    order_book = synchronized_book()
+    order_book.apply_event(increment(15, asks=[(100, 1)]))
+
+    assert not order_book.load_snapshot(12, [["99", "1"]], [["101", "1"]])
+    assert not order_book.synchronized
+    # The gap is kept for the next snapshot
+    assert order_book.load_snapshot(14, [["99", "1"]], [["101", "1"]])
+    assert order_book.best_ask() == (100.0, 1.0)
+
+
+class FakeSubscriptionManager:
+    def __init__(self):
+        self.callback = None
+
+    def subscribe_order_book_increments(self, symbols: list, callback) -> None:
+        self.callback = callback
+
+
+class FakeSnapshotManager(OrderBookManager):
+    """
+    Serves snapshots from a list instead of the REST API, and records the requests.
+    """
+    def __init__(self, snapshots: list):
+        super().__init__(None, FakeSubscriptionManager())
+        self.snapshots = snapshots
+        self.requests = 0
+        self.synchronized = threading.Event()
+
+    def fetch_snapshot(self, symbol: str):
+        self.requests += 1
+        return self.snapshots.pop(0)
+
+    def _on_snapshot(self, symbol: str, future) -> None:
+        super()._on_snapshot(symbol, future)
+        if self.order_books[symbol].synchronized:
+            self.synchronized.set()
+
+
+def snapshot(sequence: int) -> SimpleNamespace:
+    return SimpleNamespace(sequence=str(sequence), bids=[["99", "1"]], asks=[["101", "1"]])
+
+
+def test_manager_resynchronizes_after_a_sequence_gap(monkeypatch):
+    monkeypatch.setattr("services.order_book.SNAPSHOT_RETRY_DELAY", 0.01)
+    manager = FakeSnapshotManager([snapshot(10), snapshot(20)])
+    order_book = manager.subscribe([SYMBOL])[SYMBOL]
+    assert manager.synchronized.wait(5)
+
+    manager.synchronized.clear()
+    manager.subscription_manager.callback(f"/market/level2:{SYMBOL}", "trade.l2update", increment(21, asks=[(100, 1)]))
+    assert manager.synchronized.wait(5)
+
+    assert manager.requests == 2
+    assert order_book.sequence == 21
+    assert order_book.best_ask() == (100.0, 1.0)
+
+
+def test_manager_retries_a_failed_snapshot(monkeypatch):
+    monkeypatch.setattr("services.order_book.SNAPSHOT_RETRY_DELAY", 0.01)
+
+    class FailingOnceManager(FakeSnapshotManager):
+        def fetch_snapshot(self, symbol: str):
+            if self.requests == 0:
+                self.requests += 1
+                raise TimeoutError("timeout")
+            return super().fetch_snapshot(symbol)
+
+    manager = FailingOnceManager([snapshot(10)])
+    manager.subscribe([SYMBOL])
+
+    assert manager.synchronized.wait(5)
+    assert manager.requests == 2
+
+
+def level_book(bids: list, asks: list) -> OrderBook:
+    order_book = OrderBook(SYMBOL)
+    order_book.load_snapshot(1, [[str(price), str(size)] for price, size in bids], [[str(price), str(size)] for price, size in asks])
+    return order_book
+
+
+def test_executable_size_is_capped_when_the_whole_amount_is_profitable():
+    # Buy at 100 and sell at 110 : 10% on any amount the depth covers
+    legs = [(level_book([], [(100, 10)]), False), (level_book([(110, 10)], []), True)]
+
+    amount, profit = find_executable_size(legs, 500)
+
+    assert amount == 500
+    assert profit == pytest.approx(10)
+
+
+def test_executable_size_stops_where_the_depth_turns_unprofitable():
+    # Past the first 100 spent at 100, ETH costs 120 : 110 * (1 + (amount - 100) / 120) stays above the amount up to 220
+    legs = [(level_book([], [(100, 1), (120, 10)]), False), (level_book([(110, 10)], []), True)]
+
+    amount, profit = find_executable_size(legs, 1000, iterations=40)
+
+    assert amount == pytest.approx(220, rel=1e-6)
+    assert profit == pytest.approx(0, abs=1e-4)
+
+
+def test_no_executable_size_when_the_cycle_is_unprofitable():
+    legs = [(level_book([], [(100, 10)]), False), (level_book([(99, 10)], []), True)]
+
+    assert find_executable_size(legs, 100) == (0.0, 0.0)
@@ -0,0 +1,67 @@
+import threading
+import numpy as np
+from services.price_book import PriceBook
+
+
+def test_books_grow_past_their_capacity():
+    price_book = PriceBook(capacity=2)
+    symbol_ids = [price_book.add_symbol(f"S{index}-USDT") for index in range(5)]
+    price_book.update(symbol_ids[0], 1.0, 2.0)
+
+    assert symbol_ids == list(range(5))
+    assert price_book.add_symbol("S3-USDT") == 3
+    assert len(price_book.bid) >= 5
+    bid, ask = price_book.snapshot([0])
+    assert (bid.tolist(), ask.tolist()) == ([1.0], [2.0])
+
+
+def test_snapshot_and_invalidate():
+    price_book = PriceBook()
+    first, second = price_book.add_symbol("BTC-USDT"), price_book.add_symbol("ETH-USDT")
+    price_book.update(first, 100.0, 101.0)
+    price_book.update(second, 10.0, 10.1)
+
+    price_book.invalidate([first])
+
+    bid, ask = price_book.snapshot()
+    np.testing.assert_array_equal(bid, [0.0, 10.0])
+    np.testing.assert_array_equal(ask, [0.0, 10.1])
+    assert not price_book.is_operational(first)
+    assert price_book.is_operational(second)
+    assert price_book.version[first] % 2 == 0
+
+
+def test_concurrent_writers_never_leave_a_version_odd():
+    price_book = PriceBook()
+    symbol_id = price_book.add_symbol("BTC-USDT")
+
+    def update():
+        for _ in range(20000):
+            price_book.update(symbol_id, 100.0, 101.0)
+
+    def invalidate():
+        for _ in range(20000):
+            price_book.invalidate([symbol_id])
+
+    threads = [threading.Thread(target=update), threading.Thread(target=invalidate)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert price_book.version[symbol_id] == 4 * 20000
+
+
+def test_torn_snapshot_gives_up_with_the_symbol_not_operational(monkeypatch):
+    monkeypatch.setattr("services.price_book.SNAPSHOT_MAX_RETRIES", 10)
+    price_book = PriceBook()
+    first, second = price_book.add_symbol("BTC-USDT"), price_book.add_symbol("ETH-USDT")
+    price_book.update(first, 100.0, 101.0)
+    price_book.update(second, 10.0, 10.1)
+    # A writer stopped in the middle of an update
+    price_book.version[first] += 1
+
+    bid, ask = price_book.snapshot()
+
+    np.testing.assert_array_equal(bid, [0.0, 10.0])
+    np.testing.assert_array_equal(ask, [0.0, 10.1])
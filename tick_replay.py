@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import logging
+from services.candle_builder import CandleBuilder, DEFAULT_LIVE_STORE_DIRECTORY, LIVE_INTERVALS
+from services.config import configure_logging
+from services.tick_recorder import TickRecorder, ReplayDriver
+from services.websocket_management import WebSocketSymbol, SubscriptionManager
+from strategies.triangular_arbitrage import TriangularArbitrage
+from strategies.triangle_scanner import TriangleScanner
+from strategies.sharded_scanner import ShardedScanner
+from utils.kline_store import KlineStore, DEFAULT_STORE_DIRECTORY
+from utils.latency import latency_metrics
+
+DEFAULT_TICK_LOG = "ticks.bin"
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Records live ticker events into a tick log, or replays a tick log through the strategies "
+                                                 "to benchmark the evaluation path without network.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="Record the tickers of symbols")
+    record_parser.add_argument("symbols", nargs="+", help="Spot or futures symbols (e.g., BTC-USDT ETH-BTC ETH-USDT XBTUSDTM)")
+    record_parser.add_argument("--output", default=DEFAULT_TICK_LOG, help="Tick log file, appended to")
+    record_parser.add_argument("--l2", action="store_true", help="Also record the level-2 updates of the spot symbols")
+    record_parser.add_argument("--duration", type=float, default=None, help="Seconds to record, until interrupted by default")
+    record_parser.add_argument("--candles", nargs="+", default=None, choices=LIVE_INTERVALS,
+                               help="Also build the live candles of the spot symbols in these intervals (e.g., 1min 1hour)")
+    record_parser.add_argument("--candles-dir", default=DEFAULT_LIVE_STORE_DIRECTORY, help="Kline store the closed live candles are flushed to")
+    record_parser.add_argument("--seed-dir", default=DEFAULT_STORE_DIRECTORY, help="Kline store whose last candles seed the live candles (see download_history.py)")
+
+    replay_parser = subparsers.add_parser("replay", help="Replay a tick log through a strategy")
+    replay_parser.add_argument("--input", default=DEFAULT_TICK_LOG, help="Tick log file")
+    replay_parser.add_argument("--speed", type=float, default=None, help="1.0 for the recorded pace, as fast as possible by default")
+    strategy_group = replay_parser.add_mutually_exclusive_group(required=True)
+    strategy_group.add_argument("--triangle", nargs=3, metavar=("FIRST", "INTERMEDIARY", "LAST"), help="Replay through TriangularArbitrage")
+    strategy_group.add_argument("--scanner", nargs="+", metavar="SYMBOL", help="Replay through TriangleScanner over these spot symbols")
+    replay_parser.add_argument("--threshold", type=float, default=0.3, help="Percentage threshold of the strategy")
+    replay_parser.add_argument("--workers", type=int, default=None, help="Replay --scanner through ShardedScanner with this many worker processes")
+    replay_parser.add_argument("--metrics-port", type=int, default=None, help="Serve the latency metrics on this port during the replay")
+    return parser.parse_args()
+
+
+async def record(symbols: list, output: str, l2: bool, duration: float, candle_intervals: list = None, candles_dir: str = None,
+                 seed_dir: str = None):
+    recorder = TickRecorder(output)
+    subscription_manager = SubscriptionManager(recorder=recorder)
+    websocket_symbols = [WebSocketSymbol(symbol) for symbol in symbols]
+    candle_builder = None
+    try:
+        if candle_intervals:
+            candle_builder = CandleBuilder(websocket_symbols, candle_intervals, seed_store=KlineStore(seed_dir), flush_store=KlineStore(candles_dir))
+            flusher = asyncio.create_task(candle_builder.run_flush())
+        subscription_manager.subscribe(websocket_symbols)
+        if l2:
+            from services.config import get_kucoin_client, get_market_api
+            from services.order_book import OrderBookManager
+            order_book_manager = OrderBookManager(get_market_api(get_kucoin_client()), subscription_manager, recorder=recorder)
+            order_book_manager.subscribe([symbol for symbol in symbols if "-" in symbol])
+        await asyncio.wait_for(subscription_manager.run(), duration)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        subscription_manager.stop()
+        recorder.close()
+        if candle_builder is not None:
+            flusher.cancel()
+            logging.info(f"[CANDLES] Flushed {candle_builder.flush()} live candles to {candles_dir}")
+
+
+async def replay(input_file: str, speed: float, triangle: list, scanner_symbols: list, threshold: float, metrics_port: int = None,
+                 workers: int = None):
+    latency_metrics.enable()
+    if metrics_port is not None:
+        latency_metrics.start_server(metrics_port)
+    driver = ReplayDriver(input_file)
+    if scanner_symbols and workers:
+        await replay_sharded(driver, speed, scanner_symbols, threshold, workers)
+        return
+    if triangle:
+        strategy = TriangularArbitrage(*triangle, type="spot", threshold=threshold)
+        driver.add_symbols([strategy.first_symbol, strategy.intermediary_symbol, strategy.last_symbol])
+        evaluator = asyncio.create_task(strategy.manage_triangular_abritrage())
+    else:
+        strategy = TriangleScanner(scanner_symbols, threshold=threshold)
+        driver.add_symbols(strategy.websocket_symbols)
+        evaluator = asyncio.create_task(strategy.manage_scanner())
+
+    # Let the evaluator register its event loop before the first event
+    await asyncio.sleep(0)
+    try:
+        await driver.run(speed)
+    finally:
+        evaluator.cancel()
+    logging.info(latency_metrics.summary())
+
+
+async def replay_sharded(driver: ReplayDriver, speed: float, scanner_symbols: list, threshold: float, workers: int):
+    """
+    Replays into the shared price book of a ShardedScanner : the workers evaluate in their own processes,
+    so the driver only measures the ingestion, and the evaluation capacity is reported by the shards.
+    """
+    scanner = ShardedScanner(scanner_symbols, workers, threshold)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, scanner.start_workers)
+    driver.add_symbols(scanner.websocket_symbols)
+    reporter = asyncio.create_task(scanner.report())
+    try:
+        await driver.run(speed)
+    finally:
+        reporter.cancel()
+        await loop.run_in_executor(None, scanner.stop_workers)
+    logging.info(scanner.summary())
+
+
+if __name__ == "__main__":
+    configure_logging()
+    try:
+        arguments = parse_arguments()
+        if arguments.command == "record":
+            asyncio.run(record(arguments.symbols, arguments.output, arguments.l2, arguments.duration, arguments.candles, arguments.candles_dir,
+                               arguments.seed_dir))
+        else:
+            asyncio.run(replay(arguments.input, arguments.speed, arguments.triangle, arguments.scanner, arguments.threshold, arguments.metrics_port,
+                              arguments.workers))
+
+    except KeyboardInterrupt:
+        logging.info("Interrupted by user.")
+    except Exception as e:
+        logging.error(f"Error: {e}")
@@ -0,0 +1,175 @@
+import numpy as np
+from utils.candles import Candles
+
+# Taker fee of a spot order (VIP 0, fee category 1), charged on each change of position
+DEFAULT_FEE_RATE = 0.001
+YEAR_SECONDS = 365 * 24 * 3600
+
+# Closed trades, one row each
+TRADE_DTYPE = np.dtype([
+    ("entry_time", np.int64),
+    ("exit_time", np.int64),
+    ("side", np.int8),
+    ("entry_price", np.float64),
+    ("exit_price", np.float64),
+    ("bars", np.int64),
+    ("net_return", np.float64),
+])
+
+
+def sma(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Simple moving average of the last `window` values, NaN until `window` values are available.
+    Computed from a cumulative sum, in one pass whatever the window.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    averages = np.full(len(values), np.nan)
+    if window <= 0 or window > len(values):
+        return averages
+    cumulative = np.cumsum(values)
+    averages[window - 1] = cumulative[window - 1]
+    averages[window:] = cumulative[window:] - cumulative[:-window]
+    averages[window - 1:] /= window
+    return averages
+
+
+def crossover_positions(close: np.ndarray, fast_window: int, slow_window: int, allow_short: bool = False) -> np.ndarray:
+    """
+    Positions of a moving average crossover : long while the fast average is above the slow one,
+    short (or flat if `allow_short` is False) while it is below, flat until both averages are defined.
+
+    Returns:
+        np.ndarray: int8 position held from the close of each candle, in {-1, 0, 1}.
+    """
+    fast = sma(close, fast_window)
+    slow = sma(close, slow_window)
+    with np.errstate(invalid="ignore"):
+        positions = np.where(fast > slow, 1, -1 if allow_short else 0).astype(np.int8)
+    positions[np.isnan(fast) | np.isnan(slow)] = 0
+    return positions
+
+
+class BacktestResult:
+    """
+    Equity curve, trades and statistics of a backtest.
+
+    Attributes:
+        time (np.ndarray): Candle times (seconds).
+        positions (np.ndarray): Position held from the close of each candle.
+        equity (np.ndarray): Equity at the close of each candle, net of fees, starting at 1.
+        trades (np.ndarray): Closed trades, see TRADE_DTYPE.
+        stats (dict): Statistics by name, see backtest.
+    """
+    __slots__ = ("time", "positions", "equity", "trades", "stats")
+
+    def __init__(self, time: np.ndarray, positions: np.ndarray, equity: np.ndarray, trades: np.ndarray, stats: dict):
+        self.time = time
+        self.positions = positions
+        self.equity = equity
+        self.trades = trades
+        self.stats = stats
+
+    def summary(self) -> str:
+        stats = self.stats
+        return "\n".join([
+            f"candles: {stats['candles']} | exposure {stats['exposure'] * 100:.1f}%",
+            f"total return: {stats['total_return'] * 100:.2f}% (buy and hold {stats['buy_and_hold_return'] * 100:.2f}%) | "
+            f"annualized {stats['annualized_return'] * 100:.2f}% | sharpe {stats['sharpe']:.2f}",
+            f"max drawdown: {stats['max_drawdown'] * 100:.2f}% | fees paid {stats['fees'] * 100:.2f}% of equity",
+            f"trades: {stats['trades']} | win rate {stats['win_rate'] * 100:.1f}% | average {stats['average_trade'] * 100:.3f}% | "
+            f"profit factor {stats['profit_factor']:.2f} | average duration {stats['average_bars']:.1f} candles",
+        ])
+
+
+def backtest(candles: Candles, positions: np.ndarray, fee_rate: float = DEFAULT_FEE_RATE) -> BacktestResult:
+    """
+    Simulates holding `positions` over candles, with whole-array operations only.
+
+    The position of a candle is taken at its close and held until the next close, so a signal computed on a candle
+    never sees its future. Each change of position pays `fee_rate` on the traded size, a flip paying twice.
+    The last position is closed at the last close. Returns are compounded : position 1 is the whole equity.
+
+    Args:
+        candles (Candles): Candles ordered by ascending time.
+        positions (np.ndarray): Position held from the close of each candle (1 long, -1 short, 0 flat).
+        fee_rate (float): Fee rate of an order.
+
+    Returns:
+        BacktestResult: The equity curve, trades and statistics.
+    """
+    close = np.asarray(candles.close, dtype=np.float64)
+    times = np.asarray(candles.time)
+    candle_count = len(close)
+    positions = np.asarray(positions, dtype=np.int8).copy()
+    if candle_count < 2:
+        raise ValueError(f"At least 2 candles are needed to backtest, got {candle_count}")
+    if len(positions) != candle_count:
+        raise ValueError(f"Got {len(positions)} positions for {candle_count} candles")
+    positions[-1] = 0
+
+    # Log returns keep the compounding of millions of candles exact and the cumulative sums cheap
+    candle_returns = np.empty(candle_count)
+    candle_returns[0] = 0.0
+    candle_returns[1:] = close[1:] / close[:-1] - 1
+    held = np.empty(candle_count, dtype=np.int8)
+    held[0] = 0
+    held[1:] = positions[:-1]
+    market_log_returns = np.log1p(held * candle_returns)
+    traded = np.abs(np.diff(positions, prepend=np.int8(0)).astype(np.int64))
+    fee_log_returns = np.log1p(-fee_rate * traded)
+    log_equity = np.cumsum(market_log_returns + fee_log_returns)
+    equity = np.exp(log_equity)
+
+    # Trades are the runs of a same non-zero position, entered at the close of their first candle
+    changes = np.flatnonzero(np.diff(positions, prepend=np.int8(0)))
+    run_starts = changes[:-1]
+    run_ends = changes[1:]
+    in_position = positions[run_starts] != 0
+    entries, exits = run_starts[in_position], run_ends[in_position]
+    cumulative_market = np.cumsum(market_log_returns)
+    trade_log_returns = cumulative_market[exits] - cumulative_market[entries] + 2 * np.log1p(-fee_rate)
+    trades = np.empty(len(entries), dtype=TRADE_DTYPE)
+    trades["entry_time"] = times[entries]
+    trades["exit_time"] = times[exits]
+    trades["side"] = positions[entries]
+    trades["entry_price"] = close[entries]
+    trades["exit_price"] = close[exits]
+    trades["bars"] = exits - entries
+    trades["net_return"] = np.expm1(trade_log_returns)
+
+    return BacktestResult(times, positions, equity, trades, _compute_stats(times, close, positions, equity, log_equity, fee_log_returns, trades))
+
+
+def _compute_stats(times: np.ndarray, close: np.ndarray, positions: np.ndarray, equity: np.ndarray, log_equity: np.ndarray,
+                   fee_log_returns: np.ndarray, trades: np.ndarray) -> dict:
+    duration = max(int(times[-1] - times[0]), 1)
+    candle_seconds = max(float(np.median(np.diff(times))), 1.0)
+    candle_log_returns = np.diff(log_equity, prepend=0.0)
+    running_max = np.maximum.accumulate(np.maximum(equity, 1.0))
+    returns = trades["net_return"]
+    gains = returns[returns > 0].sum()
+    losses = -returns[returns < 0].sum()
+    standard_deviation = candle_log_returns.std()
+    return {
+        "candles": len(close),
+        "total_return": float(equity[-1] - 1),
+        "buy_and_hold_return": float(close[-1] / close[0] - 1),
+        "annualized_return": float(np.expm1(log_equity[-1] * YEAR_SECONDS / duration)),
+        "sharpe": float(candle_log_returns.mean() / standard_deviation * np.sqrt(YEAR_SECONDS / candle_seconds)) if standard_deviation else 0.0,
+        "max_drawdown": float(1 - (equity / running_max).min()),
+        "fees": float(-np.expm1(fee_log_returns.sum())),
+        "exposure": float(np.count_nonzero(positions) / len(positions)),
+        "trades": len(trades),
+        "win_rate": float((returns > 0).mean()) if len(trades) else 0.0,
+        "average_trade": float(returns.mean()) if len(trades) else 0.0,
+        "profit_factor": float(gains / losses) if losses else float("inf") if gains else 0.0,
+        "average_bars": float(trades["bars"].mean()) if len(trades) else 0.0,
+    }
+
+
+def backtest_sma_crossover(candles: Candles, fast_window: int, slow_window: int, fee_rate: float = DEFAULT_FEE_RATE,
+                           allow_short: bool = False) -> BacktestResult:
+    """
+    Backtests a moving average crossover, see crossover_positions and backtest.
+    """
+    return backtest(candles, crossover_positions(candles.close, fast_window, slow_window, allow_short), fee_rate)
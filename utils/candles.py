@@ -0,0 +1,212 @@
+import fcntl
+import logging
+import os
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+
+# Column order of a KuCoin kline row
+CANDLE_COLUMNS = ("time", "open", "close", "high", "low", "volume", "turnover")
+CANDLE_DTYPES = {column: np.int64 if column == "time" else np.float64 for column in CANDLE_COLUMNS}
+
+PENDING_EXTENSION = "pending"
+LOCK_FILE_NAME = ".lock"
+
+
+class Candles:
+    """
+    Typed columnar candles ordered by ascending time.
+    time is an int64 array of seconds, the other columns are float64 arrays.
+    Columns can be in-memory arrays or read-only memory maps of .npy files.
+    """
+    __slots__ = CANDLE_COLUMNS
+
+    def __init__(self, **columns):
+        for column in CANDLE_COLUMNS:
+            setattr(self, column, columns[column])
+
+    def __len__(self):
+        return len(self.time)
+
+    def __getitem__(self, index):
+        return Candles(**{column: getattr(self, column)[index] for column in CANDLE_COLUMNS})
+
+    def columns(self) -> dict:
+        return {column: getattr(self, column) for column in CANDLE_COLUMNS}
+
+    def slice(self, start_time=None, end_time=None):
+        """
+        Returns the candles in [start_time, end_time) without copying the data.
+
+        Args:
+            start_time (datetime | int): Start time (inclusive), in seconds if an int. None for no bound.
+            end_time (datetime | int): End time (exclusive), in seconds if an int. None for no bound.
+
+        Returns:
+            Candles: A view on the selected candles.
+        """
+        start_index = 0 if start_time is None else int(np.searchsorted(self.time, _to_seconds(start_time), side="left"))
+        end_index = len(self) if end_time is None else int(np.searchsorted(self.time, _to_seconds(end_time), side="left"))
+        return self[start_index:end_index]
+
+    @classmethod
+    def empty(cls):
+        return cls(**{column: np.empty(0, dtype=CANDLE_DTYPES[column]) for column in CANDLE_COLUMNS})
+
+
+def _to_seconds(value) -> int:
+    return int(value.timestamp()) if isinstance(value, datetime) else int(value)
+
+
+def parse_klines(data) -> Candles:
+    """
+    Parses raw kline rows (lists of str, newest first) into typed columns ordered by ascending time.
+
+    Args:
+        data (list): List of kline data as returned by the klines endpoint.
+
+    Returns:
+        Candles: The parsed candles, duplicated timestamps removed.
+    """
+    if len(data) == 0:
+        return Candles.empty()
+
+    table = np.asarray(data, dtype=np.float64)
+    times = table[:, 0].astype(np.int64)
+    times, unique_indexes = np.unique(times, return_index=True)
+    table = table[unique_indexes]
+
+    columns = {"time": times}
+    for index, column in enumerate(CANDLE_COLUMNS[1:], start=1):
+        columns[column] = np.ascontiguousarray(table[:, index])
+    return Candles(**columns)
+
+
+def read_candles_csv(filename: str) -> Candles:
+    """
+    Reads kline rows saved as CSV (see utils.statistics.save_data_to_csv : a header line, then the raw rows newest first)
+    into typed columns ordered by ascending time. The text is parsed once, by NumPy's C reader.
+
+    Args:
+        filename (str): The CSV file.
+
+    Returns:
+        Candles: The parsed candles, duplicated timestamps removed.
+    """
+    table = np.loadtxt(filename, delimiter=",", skiprows=1, usecols=range(len(CANDLE_COLUMNS)), dtype=np.float64, ndmin=2)
+    return parse_klines(table)
+
+
+def _column_path(directory: str, column: str, extension: str = "npy") -> str:
+    return os.path.join(directory, f"{column}.{extension}")
+
+
+@contextmanager
+def _series_lock(directory: str):
+    """
+    Holds an exclusive lock on a series, across processes, while its pending segment is appended to or compacted.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, LOCK_FILE_NAME), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def save_candles(candles: Candles, directory: str) -> None:
+    """
+    Writes candles as one .npy file per column.
+
+    Args:
+        candles (Candles): The candles to write.
+        directory (str): The directory of the series.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    # Every column is fully written before any of them replaces the previous version
+    for column in CANDLE_COLUMNS:
+        with open(_column_path(directory, column, "npy.tmp"), "wb") as file:
+            np.save(file, np.asarray(getattr(candles, column), dtype=CANDLE_DTYPES[column]))
+    for column in CANDLE_COLUMNS:
+        os.replace(_column_path(directory, column, "npy.tmp"), _column_path(directory, column))
+
+    logging.info(f"Saved {len(candles)} candles to {directory}")
+
+
+def append_candles(candles: Candles, directory: str) -> None:
+    """
+    Appends candles to the pending segment of a series, without rewriting the existing columns.
+    Pending candles are merged into the .npy columns by compact_candles.
+
+    Args:
+        candles (Candles): The candles to append.
+        directory (str): The directory of the series.
+    """
+    if len(candles) == 0:
+        return
+    # Locked, so a compaction never sees the columns of a row partially appended, nor removes rows appended meanwhile
+    with _series_lock(directory):
+        for column in CANDLE_COLUMNS:
+            with open(_column_path(directory, column, PENDING_EXTENSION), "ab") as file:
+                np.asarray(getattr(candles, column), dtype=CANDLE_DTYPES[column]).tofile(file)
+
+
+def has_pending_candles(directory: str) -> bool:
+    return os.path.exists(_column_path(directory, "time", PENDING_EXTENSION))
+
+
+def compact_candles(directory: str) -> None:
+    """
+    Merges the pending segment into the .npy columns, sorting by time and removing duplicates.
+    Appends to the series wait until the compaction is done.
+    When a timestamp appears several times, the last appended candle wins.
+
+    Args:
+        directory (str): The directory of the series.
+    """
+    if not has_pending_candles(directory):
+        return
+
+    with _series_lock(directory):
+        # Another process may have compacted the series while waiting for the lock
+        if not has_pending_candles(directory):
+            return
+        pending = {column: np.fromfile(_column_path(directory, column, PENDING_EXTENSION), dtype=CANDLE_DTYPES[column])
+                   for column in CANDLE_COLUMNS}
+        # An interrupted append can leave columns of different lengths : only complete rows are kept
+        pending_length = min(len(values) for values in pending.values())
+
+        existing = load_candles(directory, mmap=False, compact=False) if os.path.exists(_column_path(directory, "time")) else Candles.empty()
+        merged = {column: np.concatenate((getattr(existing, column), pending[column][:pending_length])) for column in CANDLE_COLUMNS}
+
+        order = np.argsort(merged["time"], kind="stable")
+        times = merged["time"][order]
+        keep_last = np.append(times[1:] != times[:-1], True) if len(times) else np.empty(0, dtype=bool)
+        selected = order[keep_last]
+
+        save_candles(Candles(**{column: merged[column][selected] for column in CANDLE_COLUMNS}), directory)
+        for column in CANDLE_COLUMNS:
+            os.remove(_column_path(directory, column, PENDING_EXTENSION))
+
+
+def load_candles(directory: str, mmap: bool = True, compact: bool = True) -> Candles:
+    """
+    Loads the candles of a series.
+
+    Args:
+        directory (str): The directory of the series.
+        mmap (bool): Memory-map the columns (read-only, zero-copy) instead of reading them into memory.
+        compact (bool): Merge the pending segment first, if any.
+
+    Returns:
+        Candles: The candles ordered by ascending time.
+    """
+    if compact:
+        compact_candles(directory)
+    if not os.path.exists(_column_path(directory, "time")):
+        return Candles.empty()
+
+    mmap_mode = "r" if mmap else None
+    return Candles(**{column: np.load(_column_path(directory, column), mmap_mode=mmap_mode) for column in CANDLE_COLUMNS})
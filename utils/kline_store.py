@@ -0,0 +1,120 @@
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from utils.candles import Candles, parse_klines, append_candles, load_candles
+
+DEFAULT_STORE_DIRECTORY = "data/klines"
+
+
+class KlineStore:
+    """
+    Local candle store keyed by (symbol, interval).
+    Candles are appended to one file per series, and a manifest records the time ranges already held,
+    so that only the missing ranges have to be requested from the exchange.
+
+    Layout : <root_dir>/<symbol>/<interval>/ for the candles (one typed .npy file per column, see utils.candles),
+             <root_dir>/<symbol>/<interval>.json for the covered ranges (seconds, end exclusive).
+    """
+    def __init__(self, root_dir: str = DEFAULT_STORE_DIRECTORY):
+        self.root_dir = root_dir
+
+    def _series_path(self, symbol: str, interval: str, extension: str) -> str:
+        return os.path.join(self.root_dir, symbol, f"{interval}.{extension}")
+
+    def series_directory(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.root_dir, symbol, interval)
+
+    def get_covered_ranges(self, symbol: str, interval: str) -> list:
+        """
+        Returns the time ranges already held for a series.
+
+        Returns:
+            list: Sorted, non-overlapping list of [start, end) ranges in seconds.
+        """
+        manifest_path = self._series_path(symbol, interval, "json")
+        if not os.path.exists(manifest_path):
+            return []
+        with open(manifest_path, "r") as file:
+            return [tuple(covered_range) for covered_range in json.load(file)["ranges"]]
+
+    def _save_covered_ranges(self, symbol: str, interval: str, ranges: list) -> None:
+        manifest_path = self._series_path(symbol, interval, "json")
+        temporary_path = f"{manifest_path}.tmp"
+        with open(temporary_path, "w") as file:
+            json.dump({"symbol": symbol, "interval": interval, "ranges": ranges}, file)
+        # Atomic replace so an interruption never leaves a corrupted manifest
+        os.replace(temporary_path, manifest_path)
+
+    def missing_ranges(self, symbol: str, interval: str, start_time: datetime, end_time: datetime) -> list:
+        """
+        Computes the parts of [start_time, end_time) that are not held yet.
+
+        Returns:
+            list: List of (range_start, range_end) datetime tuples, range_end being exclusive.
+        """
+        start = int(start_time.timestamp())
+        end = int(end_time.timestamp())
+
+        missing = []
+        cursor = start
+        for covered_start, covered_end in self.get_covered_ranges(symbol, interval):
+            if covered_end <= cursor:
+                continue
+            if covered_start >= end:
+                break
+            if covered_start > cursor:
+                missing.append((cursor, covered_start))
+            cursor = max(cursor, covered_end)
+        if cursor < end:
+            missing.append((cursor, end))
+
+        return [(datetime.fromtimestamp(range_start, tz=timezone.utc), datetime.fromtimestamp(range_end, tz=timezone.utc))
+                for range_start, range_end in missing]
+
+    def append(self, symbol: str, interval: str, candles: list, range_start: datetime, range_end: datetime) -> None:
+        """
+        Appends candles to a series and marks [range_start, range_end) as held.
+        Candles are written before the manifest, so an interruption can only cause a range to be fetched twice.
+
+        Args:
+            symbol (str): The trading pair symbol (e.g., 'BTC-USDT').
+            interval (str): The kline interval (e.g., '1hour').
+            candles (list): List of kline data as returned by the klines endpoint.
+            range_start (datetime): Start of the range the candles were requested for.
+            range_end (datetime): End of the range the candles were requested for (exclusive).
+        """
+        os.makedirs(os.path.join(self.root_dir, symbol), exist_ok=True)
+
+        # Appended to the pending segment, merged into the columns on the next load
+        append_candles(parse_klines(candles), self.series_directory(symbol, interval))
+
+        start = int(range_start.timestamp())
+        end = int(range_end.timestamp())
+        if end <= start:
+            return
+
+        ranges = sorted(self.get_covered_ranges(symbol, interval) + [(start, end)])
+        merged_ranges = [list(ranges[0])]
+        for covered_start, covered_end in ranges[1:]:
+            if covered_start <= merged_ranges[-1][1]:
+                merged_ranges[-1][1] = max(merged_ranges[-1][1], covered_end)
+            else:
+                merged_ranges.append([covered_start, covered_end])
+        self._save_covered_ranges(symbol, interval, merged_ranges)
+
+    def load(self, symbol: str, interval: str, mmap: bool = True) -> Candles:
+        """
+        Loads every candle held for a series.
+
+        Args:
+            symbol (str): The trading pair symbol (e.g., 'BTC-USDT').
+            interval (str): The kline interval (e.g., '1hour').
+            mmap (bool): Memory-map the columns instead of reading them into memory.
+
+        Returns:
+            Candles: The candles ordered by ascending time.
+        """
+        candles = load_candles(self.series_directory(symbol, interval), mmap=mmap)
+        logging.debug(f"Loaded {len(candles)} candles for {symbol} {interval}")
+        return candles
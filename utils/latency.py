@@ -0,0 +1,259 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+import numpy as np
+
+# Histogram precision : values are grouped in buckets of 2^(SUB_BUCKET_BITS - 1) linear sub-buckets per power of two,
+# so any recorded value is known within 1 / 2^(SUB_BUCKET_BITS - 1) (under 2%) whatever its magnitude
+SUB_BUCKET_BITS = 7
+SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+SUB_BUCKET_HALF_COUNT = SUB_BUCKET_COUNT >> 1
+HISTOGRAM_SIZE = SUB_BUCKET_COUNT + (64 - SUB_BUCKET_BITS) * SUB_BUCKET_HALF_COUNT
+
+# Latency stages of a price update, from the exchange to the arbitrage decision, then of the orders it sends
+LATENCY_STAGES = (
+    "exchange_to_receive",   # exchange timestamp -> SDK callback
+    "receive_to_book",       # SDK callback -> price book updated
+    "book_to_wake",          # price book updated -> evaluator woken
+    "wake_to_decision",      # evaluator woken -> decision taken
+    "exchange_to_decision",  # exchange timestamp -> decision taken
+    "decision_to_send",      # decision taken -> order handed to the HTTP client
+    "send_to_ack",           # order sent -> order accepted by the exchange
+    "send_to_fill",          # order sent -> order done, from the private order events
+)
+REPORTED_PERCENTILES = (50, 90, 99, 99.9)
+DEFAULT_METRICS_PORT = 9108
+METRICS_DUMP_INTERVAL = 30
+
+
+def _bucket_index(value: int) -> int:
+    if value < SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return SUB_BUCKET_COUNT + (shift - 1) * SUB_BUCKET_HALF_COUNT + (value >> shift) - SUB_BUCKET_HALF_COUNT
+
+
+def _bucket_values() -> np.ndarray:
+    # Highest value of each bucket, so percentiles are never under-reported
+    values = np.arange(HISTOGRAM_SIZE, dtype=np.float64)
+    shifts = np.maximum((np.arange(HISTOGRAM_SIZE) - SUB_BUCKET_COUNT) // SUB_BUCKET_HALF_COUNT + 1, 0)
+    mantissas = (np.arange(HISTOGRAM_SIZE) - SUB_BUCKET_COUNT) % SUB_BUCKET_HALF_COUNT + SUB_BUCKET_HALF_COUNT
+    high = (mantissas + 1) * np.exp2(shifts) - 1
+    return np.where(np.arange(HISTOGRAM_SIZE) < SUB_BUCKET_COUNT, values, high)
+
+
+BUCKET_VALUES = _bucket_values()
+
+
+class LatencyHistogram:
+    """
+    HDR-style histogram of latencies in nanoseconds : fixed log-linear buckets, so recording is constant time
+    with no allocation, tail percentiles keep a bounded relative error, and histograms can be merged.
+    A histogram is expected to be recorded by a single thread, other threads only read it.
+    """
+    __slots__ = ("counts", "total", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * HISTOGRAM_SIZE
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    def record(self, value: int) -> None:
+        if value < 0:
+            value = 0
+        self.counts[_bucket_index(value)] += 1
+        self.total += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def reset(self) -> None:
+        self.counts = [0] * HISTOGRAM_SIZE
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else 0.0
+
+    def percentiles(self, percentiles=REPORTED_PERCENTILES) -> list:
+        """
+        Returns the values (ns) under which the given percentages of the recorded values are.
+        """
+        if not self.total:
+            return [0.0 for _ in percentiles]
+        cumulative_counts = np.cumsum(self.counts)
+        indexes = np.searchsorted(cumulative_counts, [self.total * percentile / 100 for percentile in percentiles])
+        return [min(float(BUCKET_VALUES[index]), float(self.max)) for index in np.minimum(indexes, HISTOGRAM_SIZE - 1)]
+
+
+class LatencyMetrics:
+    """
+    Latency histograms of each stage of a price update, and message counts per symbol.
+    Disabled by default : the hot path only checks `enabled` until enable() is called.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {stage: LatencyHistogram() for stage in LATENCY_STAGES}
+        self.symbol_messages = {}
+        self.start_time = time.time()
+        self._previous_messages = {}
+        self._previous_dump_time = self.start_time
+
+    def enable(self) -> None:
+        self.reset()
+        self.enabled = True
+
+    def reset(self) -> None:
+        for histogram in self.histograms.values():
+            histogram.reset()
+        self.symbol_messages = {}
+        self._previous_messages = {}
+        self.start_time = self._previous_dump_time = time.time()
+
+    def record_update(self, symbol: str, receive_time: int, exchange_time: int) -> None:
+        """
+        Records a price update once written in the price book (called on the WebSocket thread).
+
+        Args:
+            symbol (str): The updated symbol.
+            receive_time (int): time.time_ns() when the SDK callback was called.
+            exchange_time (int): Exchange timestamp of the event, in milliseconds (0 if unknown).
+        """
+        self.symbol_messages[symbol] = self.symbol_messages.get(symbol, 0) + 1
+        if exchange_time:
+            self.histograms["exchange_to_receive"].record(receive_time - exchange_time * 1_000_000)
+        self.histograms["receive_to_book"].record(time.time_ns() - receive_time)
+
+    def record_decision(self, wake_requested_time: int, wake_time: int, exchange_time: int) -> None:
+        """
+        Records an evaluation once its decision is taken (called on the event loop).
+
+        Args:
+            wake_requested_time (int): time.time_ns() when the price update woke the evaluator.
+            wake_time (int): time.time_ns() when the evaluator started running.
+            exchange_time (int): Exchange timestamp of the update that woke the evaluator, in milliseconds.
+        """
+        decision_time = time.time_ns()
+        self.histograms["book_to_wake"].record(wake_time - wake_requested_time)
+        self.histograms["wake_to_decision"].record(decision_time - wake_time)
+        if exchange_time:
+            self.histograms["exchange_to_decision"].record(decision_time - exchange_time * 1_000_000)
+
+    def record_order(self, decision_time: int, send_time: int, ack_time: int = None, fill_time: int = None) -> None:
+        """
+        Records an order of the execution engine (called on the event loop), times being time.time_ns().
+        The decision time is None for the orders sent after a previous fill (later sequential legs, unwinds),
+        and the acknowledgement and fill times are None when the order was rejected or its fill is unknown.
+        """
+        if decision_time is not None:
+            self.histograms["decision_to_send"].record(send_time - decision_time)
+        if ack_time is not None:
+            self.histograms["send_to_ack"].record(ack_time - send_time)
+        if fill_time is not None:
+            self.histograms["send_to_fill"].record(fill_time - send_time)
+
+    def to_dict(self) -> dict:
+        elapsed = max(time.time() - self.start_time, 1e-9)
+        stages = {}
+        for stage, histogram in self.histograms.items():
+            stages[stage] = {"count": histogram.total, "mean_us": histogram.mean() / 1000, "max_us": histogram.max / 1000}
+            for percentile, value in zip(REPORTED_PERCENTILES, histogram.percentiles()):
+                stages[stage][f"p{percentile}_us"] = value / 1000
+        return {
+            "uptime": elapsed,
+            "stages": stages,
+            "symbols": {symbol: {"messages": messages, "rate": messages / elapsed} for symbol, messages in sorted(self.symbol_messages.items())},
+        }
+
+    def summary(self, top_symbols: int = 10) -> str:
+        """
+        Returns a text report of the stage percentiles, and of the busiest symbols since the previous summary.
+        """
+        now = time.time()
+        elapsed = max(now - self._previous_dump_time, 1e-9)
+        lines = []
+        for stage, histogram in self.histograms.items():
+            if histogram.total:
+                percentiles = ", ".join(f"p{percentile} {value / 1000:.1f}us" for percentile, value in zip(REPORTED_PERCENTILES, histogram.percentiles()))
+                lines.append(f"{stage}: {histogram.total} events, {percentiles}, max {histogram.max / 1000:.1f}us")
+
+        symbol_messages = dict(self.symbol_messages)
+        rates = {symbol: (messages - self._previous_messages.get(symbol, 0)) / elapsed for symbol, messages in symbol_messages.items()}
+        busiest = sorted(rates.items(), key=lambda item: item[1], reverse=True)[:top_symbols]
+        if busiest:
+            lines.append(f"messages: {sum(rates.values()):.0f}/s | " + ", ".join(f"{symbol} {rate:.1f}/s" for symbol, rate in busiest))
+        self._previous_messages = symbol_messages
+        self._previous_dump_time = now
+        return "\n".join(lines) if lines else "no latency recorded"
+
+    def prometheus(self) -> str:
+        """
+        Returns the metrics in the Prometheus text format (stages as summaries, in seconds).
+        """
+        lines = ["# TYPE kucoinbot_latency_seconds summary"]
+        for stage, histogram in self.histograms.items():
+            for percentile, value in zip(REPORTED_PERCENTILES, histogram.percentiles()):
+                lines.append(f'kucoinbot_latency_seconds{{stage="{stage}",quantile="{percentile / 100:g}"}} {value / 1e9:.9f}')
+            lines.append(f'kucoinbot_latency_seconds_sum{{stage="{stage}"}} {histogram.sum / 1e9:.9f}')
+            lines.append(f'kucoinbot_latency_seconds_count{{stage="{stage}"}} {histogram.total}')
+        lines.append("# TYPE kucoinbot_messages_total counter")
+        for symbol, messages in sorted(self.symbol_messages.items()):
+            lines.append(f'kucoinbot_messages_total{{symbol="{symbol}"}} {messages}')
+        return "\n".join(lines) + "\n"
+
+    async def run_dump(self, interval: float = METRICS_DUMP_INTERVAL) -> None:
+        """
+        Logs the summary every `interval` seconds.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            logging.info("[LATENCY]\n" + self.summary())
+
+    def start_server(self, port: int = DEFAULT_METRICS_PORT, host: str = "127.0.0.1"):
+        """
+        Serves the metrics on http://host:port/metrics (Prometheus) and /metrics.json, on a background thread.
+
+        Returns:
+            ThreadingHTTPServer: The server, imported here so processes without it do not pay for http.server.
+        """
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path == "/metrics":
+                    content_type, payload = "text/plain; version=0.0.4", metrics.prometheus()
+                elif self.path == "/metrics.json":
+                    content_type, payload = "application/json", json.dumps(metrics.to_dict())
+                else:
+                    self.send_error(404)
+                    return
+                payload = payload.encode()
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        logging.info(f"Metrics served on http://{host}:{server.server_address[1]}/metrics")
+        return server
+
+
+# Metrics shared by the WebSocket callbacks and the strategies, see LatencyMetrics.enable
+latency_metrics = LatencyMetrics()
@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Asynchronous token bucket used to stay under KuCoin's REST rate limits.
+    Tokens are refilled continuously at `rate` per second, up to `capacity`.
+
+    Args:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum number of tokens the bucket can hold (burst size). Defaults to `rate`.
+    """
+    def __init__(self, rate: float, capacity: float = None):
+        if rate <= 0:
+            raise ValueError(f"Token bucket rate must be positive. Chosen : {rate}")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    async def acquire(self, tokens: float = 1):
+        """
+        Waits until `tokens` are available and consumes them.
+
+        Args:
+            tokens (float): The number of tokens (request weight) to consume.
+        """
+        if tokens > self.capacity:
+            raise ValueError(f"Cannot acquire {tokens} tokens from a bucket of capacity {self.capacity}")
+
+        # The lock keeps waiters in FIFO order so a heavy request is not starved by lighter ones
+        async with self._lock:
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
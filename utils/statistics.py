@@ -1,7 +1,8 @@
-import pandas as pd
 import logging
 
 def save_data_to_csv(data, filename):
+    # pandas takes half a second to import, only paid by the callers of this function
+    import pandas as pd
     df = pd.DataFrame(data)
     df.to_csv(filename, index=False)
     logging.info(f"Data saved to {filename}")
@@ -0,0 +1,186 @@
+import hashlib
+import itertools
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from utils.backtest import backtest_sma_crossover
+from utils.candles import Candles, load_candles
+from utils.kline_store import KlineStore, DEFAULT_STORE_DIRECTORY
+
+DEFAULT_CACHE_DIRECTORY = "data/sweeps"
+# Statistics by which a report can be ranked, the higher the better (drawdowns are ranked on their opposite)
+RANKING_STATS = ("sharpe", "total_return", "annualized_return", "profit_factor", "win_rate", "max_drawdown")
+PROGRESS_LOG_INTERVAL = 10
+
+# Candles memory-mapped by each worker process, by series directory : every configuration of a series reads the same
+# pages of the page cache, shared with the other workers, instead of receiving a pickled copy
+_worker_candles = {}
+
+
+def expand_grid(grid: dict) -> list:
+    """
+    Returns every combination of a parameter grid.
+
+    Args:
+        grid (dict): List of values by parameter name (e.g. {"fast_window": [10, 20], "slow_window": [50, 100]}).
+
+    Returns:
+        list: One dict of parameters per combination.
+    """
+    names = sorted(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+def config_key(config: dict) -> str:
+    """
+    Returns the hash identifying a configuration in the results cache.
+    """
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()[:24]
+
+
+class SweepCache:
+    """
+    Results of the configurations already run, one JSON file per configuration key,
+    so an interrupted or extended sweep only runs the missing configurations.
+    """
+    def __init__(self, directory: str = DEFAULT_CACHE_DIRECTORY):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str):
+        try:
+            with open(self._path(key), "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key: str, result: dict) -> None:
+        # Written aside then renamed, so a reader never sees a partial file
+        with open(self._path(key) + ".tmp", "w") as file:
+            json.dump(result, file)
+        os.replace(self._path(key) + ".tmp", self._path(key))
+
+
+def _load_worker_candles(series_directory: str) -> Candles:
+    candles = _worker_candles.get(series_directory)
+    if candles is None:
+        # The parent compacted the series before the sweep, workers only map it read-only
+        candles = _worker_candles[series_directory] = load_candles(series_directory, mmap=True, compact=False)
+    return candles
+
+
+def run_sma_crossover_config(series_directory: str, config: dict) -> dict:
+    """
+    Entry point of a worker process : backtests one moving average crossover configuration, see backtest_sma_crossover.
+
+    Args:
+        series_directory (str): Directory of the candle series, see KlineStore.series_directory.
+        config (dict): symbol, interval, start and end (seconds or None), fast_window, slow_window, fee_rate, allow_short.
+
+    Returns:
+        dict: The statistics of the backtest.
+    """
+    candles = _load_worker_candles(series_directory).slice(config["start"], config["end"])
+    result = backtest_sma_crossover(candles, config["fast_window"], config["slow_window"], config["fee_rate"], config["allow_short"])
+    return result.stats
+
+
+def run_sweep(symbols: list, interval: str, grid: dict, workers: int = None, store_dir: str = DEFAULT_STORE_DIRECTORY,
+              cache_dir: str = DEFAULT_CACHE_DIRECTORY, start: int = None, end: int = None) -> list:
+    """
+    Backtests every moving average crossover configuration of a grid over every symbol, on a process pool.
+
+    The candles are never sent to the workers : each one memory-maps the .npy columns of the kline store, so the
+    dataset is held once in the page cache whatever the number of workers. Results are cached on disk by
+    configuration hash, the hash covering the parameters and the extent of the data they ran on.
+
+    Args:
+        symbols (list): Trading pair symbols of the kline store.
+        interval (str): Kline interval (e.g., '1hour').
+        grid (dict): Values by parameter : fast_window, slow_window, fee_rate and allow_short.
+        workers (int): Number of worker processes, one per core by default.
+        store_dir (str): Directory of the kline store.
+        cache_dir (str): Directory of the results cache.
+        start (int): Start time of the backtests (seconds, inclusive), the first candle if None.
+        end (int): End time of the backtests (seconds, exclusive), the last candle if None.
+
+    Returns:
+        list: One dict per configuration, its parameters and statistics.
+    """
+    store = KlineStore(store_dir)
+    cache = SweepCache(cache_dir)
+    workers = workers or os.cpu_count() or 1
+
+    tasks = []
+    rows = []
+    for symbol in symbols:
+        # Compacts the pending candles once, before the workers map the columns
+        candles = store.load(symbol, interval)
+        if len(candles) < 2:
+            logging.warning(f"[SWEEP] Skipping {symbol} {interval}: {len(candles)} candles stored")
+            continue
+        # The extent of the data is part of the key, so results are recomputed once more history is downloaded
+        data_extent = [len(candles), int(candles.time[0]), int(candles.time[-1])]
+        for parameters in expand_grid(grid):
+            if parameters["fast_window"] >= parameters["slow_window"]:
+                continue
+            config = {"symbol": symbol, "interval": interval, "start": start, "end": end, **parameters}
+            key = config_key({"strategy": "sma_crossover", "data": data_extent, **config})
+            cached = cache.get(key)
+            if cached is not None:
+                rows.append({**config, **cached})
+            else:
+                tasks.append((key, store.series_directory(symbol, interval), config))
+
+    logging.info(f"[SWEEP] {len(rows) + len(tasks)} configurations, {len(rows)} cached, running {len(tasks)} on {workers} workers")
+    if not tasks:
+        return rows
+
+    start_time = time.monotonic()
+    next_progress_log = start_time + PROGRESS_LOG_INTERVAL
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_sma_crossover_config, series_directory, config): (key, config)
+                   for key, series_directory, config in tasks}
+        for done, future in enumerate(as_completed(futures), start=1):
+            key, config = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                logging.error(f"[SWEEP] Error running {config}: {e}")
+                continue
+            cache.put(key, stats)
+            rows.append({**config, **stats})
+            if time.monotonic() >= next_progress_log:
+                next_progress_log = time.monotonic() + PROGRESS_LOG_INTERVAL
+                logging.info(f"[SWEEP] {done}/{len(tasks)} configurations run ({done / (time.monotonic() - start_time):.1f}/s)")
+
+    logging.info(f"[SWEEP] Ran {len(tasks)} configurations in {time.monotonic() - start_time:.1f}s")
+    return rows
+
+
+def rank_results(rows: list, rank_by: str = "sharpe") -> list:
+    """
+    Returns the results ordered from the best to the worst on a statistic of RANKING_STATS.
+    """
+    if rank_by not in RANKING_STATS:
+        raise ValueError(f"Cannot rank by {rank_by}, expected one of {', '.join(RANKING_STATS)}")
+    sign = 1 if rank_by == "max_drawdown" else -1
+    return sorted(rows, key=lambda row: sign * row[rank_by])
+
+
+def format_report(rows: list, rank_by: str = "sharpe", top: int = 20) -> str:
+    """
+    Returns a table of the best configurations.
+    """
+    lines = [f"{'symbol':<12} {'fast':>5} {'slow':>5} {'fee':>7} {'short':>5} | {'sharpe':>7} {'return':>9} {'annual':>8} "
+             f"{'drawdown':>8} {'trades':>6} {'win':>6} {'pf':>5}"]
+    for row in rank_results(rows, rank_by)[:top]:
+        lines.append(f"{row['symbol']:<12} {row['fast_window']:>5} {row['slow_window']:>5} {row['fee_rate']:>7.4f} {str(row['allow_short']):>5} | "
+                     f"{row['sharpe']:>7.2f} {row['total_return'] * 100:>8.1f}% {row['annualized_return'] * 100:>7.1f}% "
+                     f"{row['max_drawdown'] * 100:>7.1f}% {row['trades']:>6} {row['win_rate'] * 100:>5.1f}% {row['profit_factor']:>5.2f}")
+    return "\n".join(lines)
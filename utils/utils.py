@@ -1,5 +1,9 @@
-from kucoin_universal_sdk.generate.spot.market.model_get_ticker_req import GetTickerReqBuilder
 from datetime import datetime
+import atexit
+import threading
+import time
+
+SIGNAL_FILE_FLUSH_INTERVAL = 1
 
 # Specific Log
 def log_to_file(message: str, file_name: str) -> None:
@@ -18,6 +22,86 @@ def log_to_file(message: str, file_name: str) -> None:
     except Exception as e:
         print(f"Error writing to file: {e}")
 
+class SignalFileWriter:
+    """
+    Appends timestamped messages to a file kept open with a buffer, unlike log_to_file which opens
+    and closes the file for each message. A message stays in the buffer at most `flush_interval` seconds :
+    the first write after a flush starts a timer flushing the buffer, so writing a signal almost never waits for the disk.
+    The buffer is also flushed when the program exits.
+
+    Args:
+        file_name (str): The name of the file to write into.
+        flush_interval (float): Maximum number of seconds a message stays in the buffer.
+    """
+    def __init__(self, file_name: str, flush_interval: float = SIGNAL_FILE_FLUSH_INTERVAL):
+        self.file_name = file_name
+        self.flush_interval = flush_interval
+        self._file = open(file_name, "a", buffering=64 * 1024)
+        self._flush_timer = None
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def write(self, message: str) -> None:
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        with self._lock:
+            try:
+                self._file.write(f"{timestamp} - {message}\n")
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(self.flush_interval, self.flush)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+            except Exception as e:
+                print(f"Error writing to file: {e}")
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._file.closed:
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._file.closed:
+                self._file.close()
+
+
+_signal_writers = {}
+
+def get_signal_writer(file_name: str) -> SignalFileWriter:
+    """
+    Returns the shared SignalFileWriter of a file, creating it on first use.
+    """
+    writer = _signal_writers.get(file_name)
+    if writer is None:
+        writer = _signal_writers.setdefault(file_name, SignalFileWriter(file_name))
+    return writer
+
+
+class LogSampler:
+    """
+    Rate limits per-tick diagnostics : ready() returns True at most once every `interval` seconds.
+    Callers check it before logging, so skipped diagnostics are never formatted.
+
+    Args:
+        interval (float): Minimum number of seconds between two sampled logs. 0 logs everything.
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next_sample = 0.0
+
+    def ready(self) -> bool:
+        now = time.monotonic()
+        if now < self._next_sample:
+            return False
+        self._next_sample = now + self.interval
+        return True
+
+
 def get_current_market_price(market_api, symbol):
     """
     Fetches the current price of a specified trading pair.
@@ -29,6 +113,7 @@ def get_current_market_price(market_api, symbol):
     Returns:
         float: The current price of the specified trading pair.
     """
+    from kucoin_universal_sdk.generate.spot.market.model_get_ticker_req import GetTickerReqBuilder
     try:
         # Build the request to fetch the ticker for the specified symbol
         ticker_req = GetTickerReqBuilder().set_symbol(symbol).build()